@@ -0,0 +1,117 @@
+"""
+Materialized count / value / weighted-value totals for one CRM table.
+
+An ``Aggregates`` keeps running sums for a fixed set of groupings (for example
+``()``, ``("stage",)`` and ``("stage", "owner")``). Each write adds the new
+record to, and subtracts the old record from, one cell per grouping, so
+maintaining it costs O(number of groupings) per write whatever the table size.
+Queries roll up the cells of the narrowest grouping that covers the requested
+fields, so they cost O(distinct groups) instead of O(rows).
+"""
+
+from datetime import date, timedelta
+
+
+def close_month(record: dict) -> str:
+    """``YYYY-MM`` of an opportunity's close date ("" when it has none)"""
+    return (record.get("close_date") or "")[:7]
+
+
+def whole_months(lo: str, hi: str):
+    """``YYYY-MM`` keys for an inclusive date window that starts and ends on month
+    boundaries, or None when either bound is open or falls mid-month"""
+    if not lo or not hi:
+        return None
+    start, end = date.fromisoformat(lo), date.fromisoformat(hi)
+    if start.day != 1 or (end + timedelta(days=1)).day != 1 or start > end:
+        return None
+    months = []
+    while start <= end:
+        months.append(start.isoformat()[:7])
+        start = (start + timedelta(days=32)).replace(day=1)
+    return months
+
+
+class Aggregates:
+    """Running totals of ``value_field`` (and ``value * weight_field``) per group"""
+
+    def __init__(self, value_field: str, weight_field: str = None, groupings=((),), derived=None):
+        self.value_field = value_field
+        self.weight_field = weight_field
+        # Derived fields are computed from the record, e.g. close_month
+        self.derived = dict(derived or {})
+        self.groupings = [tuple(grouping) for grouping in groupings]
+        self.cells = {grouping: {} for grouping in self.groupings}
+
+    def _field(self, record: dict, field: str):
+        compute = self.derived.get(field)
+        return compute(record) if compute else record.get(field)
+
+    def _add(self, record: dict, sign: int):
+        value = record.get(self.value_field) or 0
+        weighted = value * (record.get(self.weight_field) or 0) if self.weight_field else 0
+        for grouping, cells in self.cells.items():
+            key = tuple(self._field(record, field) for field in grouping)
+            cell = cells.get(key)
+            if cell is None:
+                cell = cells[key] = [0, 0, 0]
+            cell[0] += sign
+            cell[1] += sign * value
+            cell[2] += sign * weighted
+            if not cell[0]:
+                del cells[key]
+
+    def load(self, records):
+        """Add every record of an iterable"""
+        for record in records:
+            self._add(record, 1)
+        return self
+
+    def apply(self, old: dict, new: dict):
+        """Account for one write: ``old`` is None for inserts, ``new`` is None for deletes"""
+        if old is not None:
+            self._add(old, -1)
+        if new is not None:
+            self._add(new, 1)
+
+    def _grouping_for(self, fields) -> tuple:
+        fields = set(fields)
+        candidates = [grouping for grouping in self.groupings if fields.issubset(grouping)]
+        if not candidates:
+            raise KeyError(f"No aggregate grouping covers {sorted(fields)}")
+        return min(candidates, key=len)
+
+    def totals(self, group_by=None, exclude=None, within=None, **equals) -> dict:
+        """``count``, ``value`` and ``weighted`` sums, optionally per group - same shape as a backend's totals
+
+        ``equals`` and ``exclude`` work like the backend filters (falsy values
+        are ignored); ``within`` maps a field to the collection of keys to keep.
+        ``group_by`` is one field, or a tuple of fields for tuple-keyed groups.
+        """
+        equals = {field: value for field, value in equals.items() if value}
+        exclude, within = exclude or {}, within or {}
+        group_fields = (group_by,) if isinstance(group_by, str) else tuple(group_by or ())
+        grouping = self._grouping_for(set(equals) | set(exclude) | set(within) | set(group_fields))
+        position = {field: i for i, field in enumerate(grouping)}
+        group_positions = [position[field] for field in group_fields]
+        groups = {}
+        for key, (count, value, weighted) in self.cells[grouping].items():
+            if any(key[position[field]] != wanted for field, wanted in equals.items()):
+                continue
+            if any(key[position[field]] in values for field, values in exclude.items()):
+                continue
+            if any(key[position[field]] not in keys for field, keys in within.items()):
+                continue
+            if isinstance(group_by, str):
+                group = key[group_positions[0]]
+            else:
+                group = tuple(key[i] for i in group_positions) if group_by else None
+            total = groups.setdefault(group, [0, 0, 0])
+            total[0] += count
+            total[1] += value
+            total[2] += weighted
+        results = {group: {"count": count, "value": value, "weighted": weighted}
+                   for group, (count, value, weighted) in groups.items()}
+        if group_by:
+            return results
+        return results.get(None, {"count": 0, "value": 0, "weighted": 0})
@@ -1,14 +1,41 @@
+import asyncio
 import json
-from openai import OpenAI
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+from functools import partial
+from openai import AsyncOpenAI, OpenAI
+from openai.types.chat import ChatCompletionMessage
 from cleanlab_codex.client import Client as CleanlabClient
 
 from tools import tools, TOOL_FUNCTIONS
+from history_manager import HistoryManager
+from tool_encoding import encode_tool_result
+from validation_policy import ASYNC, SKIP, SYNC, ValidationPolicy
+
+# Seconds a tool call may take before it is answered with a timeout error
+DEFAULT_TOOL_TIMEOUT = 15.0
+TOOL_TIMEOUTS = {
+    "get_pipeline_report": 30.0,
+    "get_sales_analytics": 30.0,
+}
+
+# Validation of tool-call steps runs here, alongside the tools and the next LLM call
+_validation_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="cleanlab-validate")
+
+SAFETY_ALERT = "🛡️ **Safety Alert**: I cannot provide a response to this request as it has been flagged by our safety systems."
 
 class SalesAgent:
-    def __init__(self, openai_api_key: str, cleanlab_project=None):
+    def __init__(self, openai_api_key: str, cleanlab_project=None, validation_policy: ValidationPolicy = None,
+                 history_manager: HistoryManager = None):
         self.openai_api_key = openai_api_key
         self.cleanlab_project = cleanlab_project
+        # Decides per step whether Cleanlab validation runs before the answer, in the background, or not at all
+        self.validation_policy = validation_policy or ValidationPolicy()
+        # Keeps the history resent on every LLM call within a token budget
+        self.history_manager = history_manager or HistoryManager()
         self.llm_client = OpenAI(api_key=openai_api_key)
+        # Background validations of tool-call steps not yet checked, per thread
+        self.pending_validations = {}
         
         # Simplified system prompt for the agent
         self.system_prompt = {
@@ -36,6 +63,7 @@ Instructions:
 3. Focus on the specific information requested
 4. Be concise but thorough in your responses
 5. Always include relevant metrics and next steps when appropriate
+6. When a question covers several customers or searches, pass them all in one call (customer_ids / queries) instead of calling the tool repeatedly
 
 Example responses:
 - For customer closed reports: Include total customers, revenue, and breakdown
@@ -59,6 +87,52 @@ Use a professional, helpful tone. Focus on driving sales insights and actionable
         except Exception as e:
             raise Exception(f"OpenAI API Error: {str(e)}")
     
+    def stream_openai(self, messages: list, on_delta=None, **kwargs):
+        """Streaming version of call_openai: content deltas go to ``on_delta`` as they arrive,
+        tool-call fragments are assembled, and the complete message is returned"""
+        content = []
+        tool_calls = {}
+        try:
+            stream = self.llm_client.chat.completions.create(
+                model="gpt-4o",
+                messages=messages,
+                tools=tools,
+                stream=True,
+                **kwargs
+            )
+            for chunk in stream:
+                self._add_chunk(chunk, content, tool_calls, on_delta)
+        except Exception as e:
+            raise Exception(f"OpenAI API Error: {str(e)}")
+        return self._assemble_message(content, tool_calls)
+    
+    @staticmethod
+    def _add_chunk(chunk, content: list, tool_calls: dict, on_delta=None):
+        """Fold one streamed chunk into the content deltas and tool calls seen so far"""
+        if not chunk.choices:
+            return
+        delta = chunk.choices[0].delta
+        if delta.content:
+            content.append(delta.content)
+            if on_delta:
+                on_delta(delta.content)
+        # Tool calls arrive in fragments keyed by index: the id and name once, the arguments in pieces
+        for fragment in delta.tool_calls or ():
+            call = tool_calls.setdefault(fragment.index, {"id": "", "type": "function", "function": {"name": "", "arguments": ""}})
+            if fragment.id:
+                call["id"] = fragment.id
+            if fragment.function:
+                call["function"]["name"] += fragment.function.name or ""
+                call["function"]["arguments"] += fragment.function.arguments or ""
+    
+    @staticmethod
+    def _assemble_message(content: list, tool_calls: dict) -> ChatCompletionMessage:
+        return ChatCompletionMessage(
+            role="assistant",
+            content="".join(content) or None,
+            tool_calls=[tool_calls[index] for index in sorted(tool_calls)] or None
+        )
+    
     def run_cleanlab_validation(self, query: str, messages: list, response, thread_id: str, tools=None, metadata=None):
         """Run Cleanlab validation if available"""
         if not self.cleanlab_project:
@@ -81,76 +155,369 @@ Use a professional, helpful tone. Focus on driving sales insights and actionable
         except Exception as e:
             return {"should_guardrail": False, "expert_answer": None, "error": str(e)}
     
-    def process_message(self, user_input: str, history: list, thread_id: str):
-        """Process a user message and return response - simplified per-turn logic"""
-        
-        # Add user input to history
-        if not history or not (history[-1].get("role") == "user" and history[-1].get("content") == user_input):
-            history.append({"role": "user", "content": user_input})
-        
-        # Make LLM call
-        try:
-            response = self.call_openai(history, temperature=0.7)
-        except Exception as e:
-            raise e
-        
-        # Cleanlab validation
+    def validate_step(self, user_input: str, messages: list, response, thread_id: str):
+        """run_cleanlab_validation for one agent step, never raising; the outcome feeds the validation policy"""
+        started = time.monotonic()
         try:
             validation_result = self.run_cleanlab_validation(
                 query=user_input,
-                messages=history,
+                messages=messages,
                 response=response,
                 tools=tools,
                 thread_id=thread_id
             )
         except Exception as e:
             validation_result = {"should_guardrail": False, "expert_answer": None, "error": str(e)}
+        if self.cleanlab_project:
+            self.validation_policy.record(thread_id, self._flagged(validation_result), time.monotonic() - started)
+        return validation_result
+    
+    def validation_decision(self, user_input: str, history: list, response, thread_id: str) -> str:
+        """The validation policy's sync / async / skip decision for this step"""
+        if not self.cleanlab_project:
+            # Nothing to validate against: no background work for tool steps, and a final
+            # answer gets validate_step's immediate "Cleanlab not available"
+            return SKIP if response.tool_calls else SYNC
+        return self.validation_policy.decide(
+            thread_id, user_input, response.content or "", self._turn_tools(history), final=not response.tool_calls
+        )
+    
+    def holds_answer(self, user_input: str, history: list, thread_id: str) -> bool:
+        """Whether an answer at this step would wait for Cleanlab validation, so it must not be streamed first"""
+        return bool(self.cleanlab_project) and self.validation_policy.gates_answer(
+            thread_id, user_input, self._turn_tools(history)
+        )
+    
+    def settle_validations(self, history: list, thread_id: str, timeout: float = None):
+        """Wait for the thread's background tool-step validations; if one flags the turn, retract the last answer
+        
+        Returns ``(replacement content, validation result)`` when the answer was retracted, else None.
+        Validations still running after ``timeout`` stay pending for the next check.
+        """
+        pending = self.pending_validations.pop(thread_id, [])
+        done, not_done = wait(pending, timeout) if pending else ((), ())
+        if not_done:
+            self.pending_validations.setdefault(thread_id, []).extend(not_done)
+        for validation in done:
+            validation_result = validation.result()
+            if self._flagged(validation_result):
+                return self._retract(history, validation_result), validation_result
+        return None
+    
+    def run_tool(self, name: str, args: dict):
+        """Call one tool from the registry"""
+        if name not in TOOL_FUNCTIONS:
+            return {"error": f"Tool {name} not implemented yet"}
+        return TOOL_FUNCTIONS[name](**args)
+    
+    @staticmethod
+    def _timeout_error(name: str, timeout: float) -> dict:
+        return {"error": f"Tool {name} timed out after {timeout:g}s"}
+    
+    @staticmethod
+    def _tool_error(name: str, error: Exception) -> dict:
+        return {"error": f"Tool {name} failed: {error}"}
+    
+    @staticmethod
+    def _tool_pool(calls: list) -> ThreadPoolExecutor:
+        """A pool for one step's tool calls, one thread each
+        
+        A thread running a tool cannot be stopped, so a tool past its deadline keeps its thread
+        until it returns; with a pool per step it holds only that thread and later steps still
+        get workers. Shut the pool down without waiting once the step has its results.
+        """
+        return ThreadPoolExecutor(max_workers=max(1, len(calls)), thread_name_prefix="sales-tool")
+    
+    def execute_tools(self, tool_calls) -> list:
+        """Run a step's tool calls concurrently; returns (name, args, response) in call order
+        
+        A tool that fails or misses its deadline is answered with an ``{"error": ...}`` response;
+        one that overran is left to finish on its own thread.
+        """
+        calls = [(tool_call.function.name, json.loads(tool_call.function.arguments)) for tool_call in tool_calls]
+        pool = self._tool_pool(calls)
+        started = time.monotonic()
+        try:
+            futures = [pool.submit(self.run_tool, name, args) for name, args in calls]
+            results = []
+            for (name, args), future in zip(calls, futures):
+                timeout = TOOL_TIMEOUTS.get(name, DEFAULT_TOOL_TIMEOUT)
+                try:
+                    # Every deadline counts from dispatch, so the step waits for the slowest tool only
+                    response = future.result(timeout=max(0.0, started + timeout - time.monotonic()))
+                except FutureTimeout:
+                    response = self._timeout_error(name, timeout)
+                except Exception as e:
+                    response = self._tool_error(name, e)
+                results.append((name, args, response))
+            return results
+        finally:
+            pool.shutdown(wait=False)
+    
+    def process_message(self, user_input: str, history: list, thread_id: str, on_delta=None):
+        """Process a user message and return response - simplified per-turn logic
+        
+        With ``on_delta``, the LLM response is streamed and each content delta is passed to it, unless
+        the answer has to pass Cleanlab validation first: then it is only returned once validated.
+        """
+        self._add_user_input(history, user_input)
+        self.history_manager.compact(history, thread_id)
         
-        # Apply guardrail if needed
-        if hasattr(validation_result, 'should_guardrail') and validation_result.should_guardrail:
-            if hasattr(validation_result, 'expert_answer') and validation_result.expert_answer:
-                response_content = validation_result.expert_answer
+        # Make LLM call
+        try:
+            if on_delta and not self.holds_answer(user_input, history, thread_id):
+                response = self.stream_openai(history, on_delta, temperature=0.7)
             else:
-                response_content = "🛡️ **Safety Alert**: I cannot provide a response to this request as it has been flagged by our safety systems."
+                response = self.call_openai(history, temperature=0.7)
+        except Exception as e:
+            raise e
+        
+        decision = self.validation_decision(user_input, history, response, thread_id)
+        
+        # Check if tools needed
+        if not response.tool_calls:
+            # No tools - a final answer the policy marks as risky waits for Cleanlab validation;
+            # an async one is validated in the background for the record only
+            if decision == SYNC:
+                validation_result = self.validate_step(user_input, history, response, thread_id)
+            else:
+                if decision == ASYNC:
+                    _validation_executor.submit(self.validate_step, user_input, list(history), response, thread_id)
+                validation_result = self._unvalidated(decision)
+            response_content = self._add_response(history, response, validation_result)
+            return history, False, response_content, validation_result
+        else:
+            # Tool selection only: validate in the background (on a snapshot of the history) while
+            # the tools and the next LLM call run; settle_validations checks the result
+            if decision != SKIP:
+                validation = _validation_executor.submit(self.validate_step, user_input, list(history), response, thread_id)
+                self.pending_validations.setdefault(thread_id, []).append(validation)
+            validation_result = self._unvalidated(decision)
+            self._add_response(history, response, validation_result)
+            
+            # Execute tools (concurrently), then record the results in the order they were requested
+            results = self.execute_tools(response.tool_calls)
+            return self._add_tool_results(history, response, results, validation_result)
+    
+    @staticmethod
+    def _unvalidated(decision: str) -> dict:
+        """Stand-in validation result for a step that is validated in the background or skipped"""
+        return {"should_guardrail": False, "expert_answer": None, "validation": ASYNC if decision == SYNC else decision}
+    
+    @staticmethod
+    def _turn_tools(history: list) -> list:
+        """Names of the tools called since the last final answer"""
+        names = []
+        for message in reversed(history):
+            if message.get("role") != "assistant":
+                continue
+            if not message.get("tool_calls"):
+                break
+            names.extend(tool_call.function.name for tool_call in message["tool_calls"])
+        return names
+    
+    @staticmethod
+    def _flagged(validation_result) -> bool:
+        return bool(getattr(validation_result, 'should_guardrail', False))
+    
+    @staticmethod
+    def _guarded_content(validation_result) -> str:
+        """What to show instead of a flagged response"""
+        if hasattr(validation_result, 'expert_answer') and validation_result.expert_answer:
+            return validation_result.expert_answer
+        return SAFETY_ALERT
+    
+    def _retract(self, history: list, validation_result) -> str:
+        """Replace the last answer in history after a late guardrail flag"""
+        content = self._guarded_content(validation_result)
+        for message in reversed(history):
+            if message.get("role") == "assistant":
+                message["content"] = content
+                break
+        return content
+    
+    @staticmethod
+    def _add_user_input(history: list, user_input: str):
+        """Add the user input to history (once, even when a turn takes several steps)"""
+        if not history or not (history[-1].get("role") == "user" and history[-1].get("content") == user_input):
+            history.append({"role": "user", "content": user_input})
+    
+    @staticmethod
+    def _add_response(history: list, response, validation_result) -> str:
+        """Apply the guardrail to the LLM response and add it to history; returns the content shown"""
+        if SalesAgent._flagged(validation_result):
+            response_content = SalesAgent._guarded_content(validation_result)
         else:
             response_content = response.content
         
-        # Add response to history
         history.append({
             "role": "assistant",
             "content": response_content,
             "tool_calls": getattr(response, 'tool_calls', None)
         })
+        return response_content
+    
+    @staticmethod
+    def _add_tool_results(history: list, response, results: list, validation_result):
+        """Add executed tool results to history; returns process_message's continue tuple"""
+        tools_for_print = []
+        tool_calls_info = []
         
-        # Check if tools needed
+        for tool_call, (name, args, tool_response) in zip(response.tool_calls, results):
+            # Capture tool info for frontend
+            tool_call_info = {
+                "tool_name": name,
+                "arguments": args,
+                "response": tool_response
+            }
+            tool_calls_info.append(tool_call_info)
+            
+            # Add tool response to history
+            tool_dict = {
+                "role": "tool",
+                "tool_call_id": tool_call.id,
+                "content": encode_tool_result(name, tool_response),
+            }
+            history.append(tool_dict)
+            tools_for_print.append(tool_dict)
+        
+        # Return with continue=True to indicate tools were executed
+        return history, True, f"🔧 Executed tools: {tools_for_print}", validation_result, tool_calls_info
+
+
+class AsyncSalesAgent:
+    """asyncio front end to a SalesAgent, for serving many sessions from one event loop
+    
+    The wrapped agent supplies the prompt, validation policy, history manager and
+    step bookkeeping; LLM calls go through AsyncOpenAI. The Cleanlab client and the
+    tools are synchronous, so validation runs on a worker thread and tools on the
+    shared tool pool; no session holds a thread while it waits on the LLM.
+    """
+    
+    def __init__(self, agent: SalesAgent, llm_client=None):
+        self.agent = agent
+        self.llm_client = llm_client or AsyncOpenAI(api_key=agent.openai_api_key)
+        # Background validations of tool-call steps (asyncio tasks) not yet checked, per thread
+        self.pending_validations = {}
+        self.background_validations = set()
+    
+    async def acall_openai(self, messages: list, **kwargs):
+        """Async SalesAgent.call_openai"""
+        try:
+            resp = await self.llm_client.chat.completions.create(
+                model="gpt-4o",
+                messages=messages,
+                tools=tools,
+                **kwargs
+            )
+            return resp.choices[0].message
+        except Exception as e:
+            raise Exception(f"OpenAI API Error: {str(e)}")
+    
+    async def astream_openai(self, messages: list, on_delta=None, **kwargs):
+        """Async SalesAgent.stream_openai: content deltas go to ``on_delta``, the complete message is returned"""
+        content = []
+        tool_calls = {}
+        try:
+            stream = await self.llm_client.chat.completions.create(
+                model="gpt-4o",
+                messages=messages,
+                tools=tools,
+                stream=True,
+                **kwargs
+            )
+            async for chunk in stream:
+                SalesAgent._add_chunk(chunk, content, tool_calls, on_delta)
+        except Exception as e:
+            raise Exception(f"OpenAI API Error: {str(e)}")
+        return SalesAgent._assemble_message(content, tool_calls)
+    
+    async def avalidate_step(self, user_input: str, messages: list, response, thread_id: str):
+        """SalesAgent.validate_step off the event loop (the Cleanlab client is synchronous)"""
+        return await asyncio.to_thread(self.agent.validate_step, user_input, messages, response, thread_id)
+    
+    async def asettle_validations(self, history: list, thread_id: str, timeout: float = None):
+        """Async SalesAgent.settle_validations"""
+        pending = self.pending_validations.pop(thread_id, [])
+        done, not_done = await asyncio.wait(pending, timeout=timeout) if pending else ((), ())
+        if not_done:
+            self.pending_validations.setdefault(thread_id, []).extend(not_done)
+        for validation in done:
+            validation_result = validation.result()
+            if SalesAgent._flagged(validation_result):
+                return self.agent._retract(history, validation_result), validation_result
+        return None
+    
+    async def aexecute_tools(self, tool_calls) -> list:
+        """Async SalesAgent.execute_tools: concurrent, (name, args, response) in call order"""
+        loop = asyncio.get_running_loop()
+        calls = [(tool_call.function.name, json.loads(tool_call.function.arguments)) for tool_call in tool_calls]
+        pool = SalesAgent._tool_pool(calls)
+        
+        async def run(name: str, args: dict):
+            timeout = TOOL_TIMEOUTS.get(name, DEFAULT_TOOL_TIMEOUT)
+            try:
+                response = await asyncio.wait_for(loop.run_in_executor(pool, partial(self.agent.run_tool, name, args)), timeout)
+            except asyncio.TimeoutError:
+                response = SalesAgent._timeout_error(name, timeout)
+            except Exception as e:
+                response = SalesAgent._tool_error(name, e)
+            return name, args, response
+        
+        try:
+            return await asyncio.gather(*(run(name, args) for name, args in calls))
+        finally:
+            pool.shutdown(wait=False)
+    
+    async def aprocess_message(self, user_input: str, history: list, thread_id: str, on_delta=None):
+        """Process one agent step; same inputs and return tuple as SalesAgent.process_message"""
+        agent = self.agent
+        agent._add_user_input(history, user_input)
+        agent.history_manager.compact(history, thread_id)
+        
+        if on_delta and not agent.holds_answer(user_input, history, thread_id):
+            response = await self.astream_openai(history, on_delta, temperature=0.7)
+        else:
+            response = await self.acall_openai(history, temperature=0.7)
+        
+        decision = agent.validation_decision(user_input, history, response, thread_id)
         if not response.tool_calls:
-            # No tools - conversation complete
+            if decision == SYNC:
+                validation_result = await self.avalidate_step(user_input, history, response, thread_id)
+            else:
+                if decision == ASYNC:
+                    # Logged only; keep a reference so the task is not collected mid-flight
+                    validation = asyncio.create_task(self.avalidate_step(user_input, list(history), response, thread_id))
+                    self.background_validations.add(validation)
+                    validation.add_done_callback(self.background_validations.discard)
+                validation_result = agent._unvalidated(decision)
+            response_content = agent._add_response(history, response, validation_result)
             return history, False, response_content, validation_result
-        else:
-            # Execute tools
-            tools_for_print = []
-            tool_calls_info = []
-            
-            for tool_call in response.tool_calls:
-                args = json.loads(tool_call.function.arguments)
-                tool_response = TOOL_FUNCTIONS[tool_call.function.name](**args) if tool_call.function.name in TOOL_FUNCTIONS else {"error": f"Tool {tool_call.function.name} not implemented yet"}
-                
-                # Capture tool info for frontend
-                tool_call_info = {
-                    "tool_name": tool_call.function.name,
-                    "arguments": args,
-                    "response": tool_response
-                }
-                tool_calls_info.append(tool_call_info)
-                
-                # Add tool response to history
-                tool_dict = {
-                    "role": "tool",
-                    "tool_call_id": tool_call.id,
-                    "content": str(tool_response),
-                }
-                history.append(tool_dict)
-                tools_for_print.append(tool_dict)
-            
-            # Return with continue=True to indicate tools were executed
-            return history, True, f"🔧 Executed tools: {tools_for_print}", validation_result, tool_calls_info
+        
+        # Tool-selection step: validation runs as a task alongside the tools and the next LLM call
+        if decision != SKIP:
+            validation = asyncio.create_task(self.avalidate_step(user_input, list(history), response, thread_id))
+            self.pending_validations.setdefault(thread_id, []).append(validation)
+        validation_result = agent._unvalidated(decision)
+        agent._add_response(history, response, validation_result)
+        results = await self.aexecute_tools(response.tool_calls)
+        return agent._add_tool_results(history, response, results, validation_result)
+    
+    async def run(self, user_input: str, history: list, thread_id: str, max_iterations: int = 5, on_delta=None):
+        """Run a whole turn, tool steps included; returns (history, response, validation_result, tool steps)
+        
+        The response is only returned once the turn's background validations have finished.
+        """
+        steps = []
+        response = validation_result = None
+        for _ in range(max_iterations):
+            result = await self.aprocess_message(user_input, history, thread_id, on_delta)
+            history, continue_loop, response, validation_result = result[:4]
+            if not continue_loop:
+                break
+            steps.append(result[4])
+        # A tool step flagged in the background retracts the answer
+        retracted = await self.asettle_validations(history, thread_id)
+        if retracted is not None:
+            response, validation_result = retracted
+        return history, response, validation_result, steps
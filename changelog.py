@@ -0,0 +1,68 @@
+"""
+Version counters and a bounded change log for the CRM store.
+
+Every write bumps a store-wide monotonic version and the version of the table
+it touched, and appends ``(version, table, record_id)`` to a ring buffer. A
+cache remembers the version it was computed at; ``changed(version, tables)``
+tells it whether to recompute, and ``since(version)`` lists the records to
+patch. Once the ring buffer has dropped entries a caller still needs,
+``since`` returns None and the caller rebuilds from scratch.
+"""
+
+from collections import deque
+
+DEFAULT_CAPACITY = 10000
+
+
+class ChangeLog:
+    """Store and per-table versions plus the most recent record-level changes"""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.version = 0
+        self.table_versions = {}
+        self.entries = deque(maxlen=capacity)
+        # Oldest version from which ``entries`` is complete
+        self.floor = 0
+
+    def record(self, table: str, record_id: str) -> int:
+        """Note a write to one record; returns the new store version"""
+        self.version += 1
+        self.table_versions[table] = self.version
+        if len(self.entries) == self.entries.maxlen:
+            self.floor = self.entries[0][0]
+        self.entries.append((self.version, table, record_id))
+        return self.version
+
+    def reset(self, tables=()) -> int:
+        """Note a wholesale replacement of ``tables``: the log restarts from the new version"""
+        self.version += 1
+        for table in tables:
+            self.table_versions[table] = self.version
+        self.entries.clear()
+        self.floor = self.version
+        return self.version
+
+    def table_version(self, table: str) -> int:
+        return self.table_versions.get(table, 0)
+
+    def changed(self, version: int, tables=None) -> bool:
+        """Whether anything (or anything in ``tables``) changed after ``version``"""
+        if tables is None:
+            return self.version > version
+        return any(self.table_versions.get(table, 0) > version for table in tables)
+
+    def since(self, version: int, tables=None):
+        """``(version, table, record_id)`` entries after ``version``, oldest first
+
+        Returns None when the log no longer reaches back that far.
+        """
+        if version < self.floor:
+            return None
+        entries = []
+        for entry in reversed(self.entries):
+            if entry[0] <= version:
+                break
+            if tables is None or entry[1] in tables:
+                entries.append(entry)
+        entries.reverse()
+        return entries
@@ -0,0 +1,464 @@
+"""
+Columnar, typed storage for the mock CRM tables.
+
+Each table keeps one typed array per field: integers in ``array('q')``, dates as
+ordinal day numbers in ``array('l')`` and low-cardinality strings (stage, status,
+owner, industry, ...) dictionary-encoded into small integer codes. Filters and
+sums run as ``map``/``compress`` passes over those arrays instead of per-row dict
+lookups, and ``TableView`` exposes each table as a dict of dicts so the existing
+``sales_db`` helpers and ``TOOL_FUNCTIONS`` keep working unchanged.
+
+Columns may also be backed by read-only buffers (see ``snapshot.py``); they
+are copied into writable arrays the first time they are modified.
+"""
+
+import operator
+from array import array
+from collections.abc import MutableMapping
+from datetime import date
+from itertools import compress, repeat
+
+INT = "int"
+DATE = "date"
+CATEGORY = "category"
+TEXT = "text"
+
+# Field types per table - anything not listed is stored as plain text
+TABLE_SCHEMAS = {
+    "leads": {
+        "status": CATEGORY, "source": CATEGORY, "industry": CATEGORY,
+        "company_size": CATEGORY, "location": CATEGORY,
+        "value": INT, "created": DATE,
+    },
+    "opportunities": {
+        "stage": CATEGORY, "owner": CATEGORY,
+        "value": INT, "probability": INT,
+        "close_date": DATE, "created": DATE, "last_activity": DATE,
+    },
+    "customers": {
+        "status": CATEGORY, "industry": CATEGORY, "company_size": CATEGORY,
+        "location": CATEGORY, "account_manager": CATEGORY,
+        "revenue": INT,
+        "onboarding_date": DATE, "closed_date": DATE, "last_activity": DATE,
+    },
+    "tasks": {
+        "status": CATEGORY, "assigned_to": CATEGORY, "priority": CATEGORY,
+        "task_type": CATEGORY, "due_date": DATE,
+    },
+    "activities": {
+        "type": CATEGORY, "date": DATE,
+    },
+    "sales_team": {
+        "territory": CATEGORY, "specialization": CATEGORY,
+        "quota": INT, "ytd_sales": INT,
+    },
+}
+
+_MISSING = object()
+
+
+def to_day(value: str) -> int:
+    """Convert an ISO ``YYYY-MM-DD`` string to an ordinal day number"""
+    return date.fromisoformat(value).toordinal()
+
+
+def from_day(day: int) -> str:
+    """Convert an ordinal day number back to an ISO ``YYYY-MM-DD`` string"""
+    return date.fromordinal(day).isoformat()
+
+
+class IntColumn:
+    """64-bit integer column; missing values are stored as 0 and tracked separately
+
+    None counts as missing, so such a field reads back absent (as it does from
+    the SQLite backend). Values must be integral: ``2.0`` is stored as 2,
+    ``2.5`` raises ValueError instead of being truncated.
+    """
+
+    typecode = "q"
+
+    def __init__(self):
+        self.data = array(self.typecode)
+        self.missing = set()
+
+    def encode(self, value):
+        number = int(value)
+        if number != value and not isinstance(value, str):
+            raise ValueError(f"{value!r} is not an integer")
+        return number
+
+    def decode(self, raw):
+        return raw
+
+    def _writable(self):
+        if not isinstance(self.data, array):
+            self.data = array(self.typecode, self.data)
+
+    def append(self, value):
+        self._writable()
+        if value is _MISSING or value is None:
+            self.missing.add(len(self.data))
+            self.data.append(0)
+        else:
+            self.data.append(self.encode(value))
+
+    def set(self, pos: int, value):
+        self._writable()
+        if value is _MISSING or value is None:
+            self.missing.add(pos)
+            self.data[pos] = 0
+        else:
+            self.missing.discard(pos)
+            self.data[pos] = self.encode(value)
+
+    def get(self, pos: int):
+        if self.missing and pos in self.missing:
+            return _MISSING
+        return self.decode(self.data[pos])
+
+    def _clear_missing(self, mask: bytearray) -> bytearray:
+        for pos in self.missing:
+            mask[pos] = 0
+        return mask
+
+    def mask_equals(self, value) -> bytearray:
+        return self._clear_missing(bytearray(map(self.encode(value).__eq__, self.data)))
+
+    def mask_in(self, values) -> bytearray:
+        wanted = {self.encode(v) for v in values}
+        return self._clear_missing(bytearray(map(wanted.__contains__, self.data)))
+
+    def mask_range(self, lo=None, hi=None) -> bytearray:
+        """Mask of rows with ``lo <= value <= hi`` (either bound optional)"""
+        data = self.data
+        if lo is not None and hi is not None:
+            lo, hi = self.encode(lo), self.encode(hi)
+            mask = bytearray(map(operator.and_, map(lo.__le__, data), map(hi.__ge__, data)))
+        elif lo is not None:
+            mask = bytearray(map(self.encode(lo).__le__, data))
+        elif hi is not None:
+            mask = bytearray(map(self.encode(hi).__ge__, data))
+        else:
+            mask = bytearray(b"\x01") * len(data)
+        return self._clear_missing(mask)
+
+
+class DateColumn(IntColumn):
+    """Dates stored as ordinal day numbers; bounds accept ISO strings or day numbers"""
+
+    typecode = "l"
+
+    def encode(self, value):
+        return to_day(value) if isinstance(value, str) else super().encode(value)
+
+    def decode(self, raw):
+        return from_day(raw)
+
+
+class CategoryColumn:
+    """Dictionary-encoded strings; code 0 is reserved for a missing value"""
+
+    def __init__(self):
+        self.codes = array("H")
+        self.values = [_MISSING]
+        self.lookup = {}
+
+    def code_for(self, value, create: bool = False):
+        code = self.lookup.get(value)
+        if code is None and create:
+            self._writable()
+            code = len(self.values)
+            if code > 0xFFFF and self.codes.typecode == "H":
+                self.codes = array("L", self.codes)
+            self.values.append(value)
+            self.lookup[value] = code
+        return code
+
+    def _writable(self):
+        if not isinstance(self.codes, array):
+            self.codes = array(self.codes.format, self.codes)
+
+    def append(self, value):
+        self._writable()
+        self.codes.append(0 if value is _MISSING else self.code_for(value, create=True))
+
+    def set(self, pos: int, value):
+        self._writable()
+        self.codes[pos] = 0 if value is _MISSING else self.code_for(value, create=True)
+
+    def get(self, pos: int):
+        return self.values[self.codes[pos]]
+
+    def mask_equals(self, value) -> bytearray:
+        code = self.code_for(value)
+        if code is None:
+            return bytearray(len(self.codes))
+        return bytearray(map(code.__eq__, self.codes))
+
+    def mask_in(self, values) -> bytearray:
+        codes = {self.code_for(v) for v in values} - {None}
+        return bytearray(map(codes.__contains__, self.codes))
+
+
+class TextColumn:
+    """Free-text column kept as a plain Python list"""
+
+    def __init__(self):
+        self.data = []
+
+    def _writable(self):
+        if not isinstance(self.data, list):
+            self.data = list(self.data)
+
+    def append(self, value):
+        self._writable()
+        self.data.append(value)
+
+    def set(self, pos: int, value):
+        self._writable()
+        self.data[pos] = value
+
+    def get(self, pos: int):
+        return self.data[pos]
+
+    def mask_equals(self, value) -> bytearray:
+        return bytearray(map(operator.eq, self.data, repeat(value, len(self.data))))
+
+    def mask_in(self, values) -> bytearray:
+        wanted = set(values)
+        return bytearray(map(wanted.__contains__, self.data))
+
+
+_COLUMN_TYPES = {INT: IntColumn, DATE: DateColumn, CATEGORY: CategoryColumn, TEXT: TextColumn}
+_INVERT = bytes([1, 0]) + bytes(254)
+
+
+def and_masks(*masks) -> bytearray:
+    """Combine several row masks with a logical AND"""
+    result = masks[0]
+    for mask in masks[1:]:
+        result = bytearray(map(operator.and_, result, mask))
+    return result
+
+
+def invert_mask(mask: bytearray) -> bytearray:
+    """Flip every 0/1 byte of a row mask"""
+    return bytearray(mask.translate(_INVERT))
+
+
+class ColumnTable:
+    """One CRM table stored column by column, addressed by record id"""
+
+    def __init__(self, schema: dict = None):
+        self.schema = schema or {}
+        self.ids = []
+        self.live = bytearray()
+        self.row_count = 0
+        self.fields = []
+        self.columns = {}
+        self._positions = {}
+
+    def __len__(self):
+        return self.row_count
+
+    @property
+    def positions(self) -> dict:
+        """record id -> slot; built on first use for tables loaded from a snapshot"""
+        if self._positions is None:
+            self._positions = {record_id: pos for pos, record_id in enumerate(self.ids) if self.live[pos]}
+        return self._positions
+
+    def _column(self, field: str):
+        column = self.columns.get(field)
+        if column is None:
+            column = _COLUMN_TYPES[self.schema.get(field, TEXT)]()
+            for _ in range(len(self.ids)):
+                column.append(_MISSING)
+            self.columns[field] = column
+            self.fields.append(field)
+        return column
+
+    def upsert(self, record_id: str, record: dict):
+        """Insert a new record or replace an existing one"""
+        for field, value in record.items():
+            column = self._column(field)
+            # Reject bad values before any column is written, so a failed upsert changes nothing
+            if isinstance(column, IntColumn) and value is not None:
+                column.encode(value)
+        pos = self.positions.get(record_id)
+        if pos is None:
+            if not isinstance(self.ids, list):
+                self.ids = list(self.ids)
+            self.positions[record_id] = len(self.ids)
+            self.ids.append(record_id)
+            self.live.append(1)
+            self.row_count += 1
+            for field, column in self.columns.items():
+                column.append(record.get(field, _MISSING))
+        else:
+            for field, column in self.columns.items():
+                column.set(pos, record.get(field, _MISSING))
+
+    def delete(self, record_id: str):
+        """Tombstone a record; its slot stays allocated but is masked out"""
+        pos = self.positions.pop(record_id)
+        self.live[pos] = 0
+        self.row_count -= 1
+
+    def row(self, pos: int) -> dict:
+        """Materialize one row as a plain dict with the original field order"""
+        row = {}
+        for field in self.fields:
+            value = self.columns[field].get(pos)
+            if value is not _MISSING:
+                row[field] = value
+        return row
+
+    def get(self, record_id: str):
+        pos = self.positions.get(record_id)
+        return None if pos is None else self.row(pos)
+
+    # Vectorized operations - every mask is a bytearray with one byte per slot
+    def mask_all(self) -> bytearray:
+        return bytearray(self.live)
+
+    def mask_equals(self, field: str, value) -> bytearray:
+        if field not in self.columns:
+            return bytearray(len(self.ids))
+        return and_masks(self.live, self.columns[field].mask_equals(value))
+
+    def mask_in(self, field: str, values) -> bytearray:
+        if field not in self.columns:
+            return bytearray(len(self.ids))
+        return and_masks(self.live, self.columns[field].mask_in(values))
+
+    def mask_not_in(self, field: str, values) -> bytearray:
+        if field not in self.columns:
+            return self.mask_all()
+        return and_masks(self.live, invert_mask(self.columns[field].mask_in(values)))
+
+    def mask_range(self, field: str, lo=None, hi=None) -> bytearray:
+        if field not in self.columns:
+            return bytearray(len(self.ids))
+        return and_masks(self.live, self.columns[field].mask_range(lo, hi))
+
+    def count(self, mask: bytearray = None) -> int:
+        return (mask if mask is not None else self.live).count(1)
+
+    def sum(self, field: str, mask: bytearray = None) -> int:
+        if field not in self.columns:
+            return 0
+        return sum(compress(self.columns[field].data, mask if mask is not None else self.live))
+
+    def dot(self, field: str, weight_field: str, mask: bytearray = None) -> int:
+        """Sum of ``field * weight_field`` over the masked rows"""
+        if field not in self.columns or weight_field not in self.columns:
+            return 0
+        mask = mask if mask is not None else self.live
+        return sum(map(operator.mul,
+                       compress(self.columns[field].data, mask),
+                       compress(self.columns[weight_field].data, mask)))
+
+    def group_totals(self, group_field: str, field: str, weight_field: str = None, mask: bytearray = None) -> dict:
+        """Per-category ``count``, ``value`` and ``weighted`` (value * weight) in one pass"""
+        mask = mask if mask is not None else self.live
+        column = self.columns[group_field]
+        if not isinstance(column, CategoryColumn):
+            raise TypeError(f"Cannot group by '{group_field}': not a category field")
+        values = self.columns[field].data
+        weights = self.columns[weight_field].data if weight_field else None
+        totals = {}
+        if weights is None:
+            rows = zip(compress(column.codes, mask), compress(values, mask))
+            for code, value in rows:
+                entry = totals.get(code)
+                if entry is None:
+                    entry = totals[code] = [0, 0, 0]
+                entry[0] += 1
+                entry[1] += value
+        else:
+            rows = zip(compress(column.codes, mask), compress(values, mask), compress(weights, mask))
+            for code, value, weight in rows:
+                entry = totals.get(code)
+                if entry is None:
+                    entry = totals[code] = [0, 0, 0]
+                entry[0] += 1
+                entry[1] += value
+                entry[2] += value * weight
+        return {column.values[code]: {"count": c, "value": v, "weighted": w}
+                for code, (c, v, w) in totals.items()}
+
+    def select_ids(self, mask: bytearray = None) -> list:
+        return list(compress(self.ids, mask if mask is not None else self.live))
+
+    def select_rows(self, mask: bytearray = None):
+        """Yield ``(record_id, row)`` for every masked row"""
+        mask = mask if mask is not None else self.live
+        for pos in compress(range(len(self.ids)), mask):
+            yield self.ids[pos], self.row(pos)
+
+
+class TableView(MutableMapping):
+    """Dict-of-dicts view over a ColumnTable so existing code can read it unchanged"""
+
+    def __init__(self, table: ColumnTable):
+        self.table = table
+
+    def __getitem__(self, record_id):
+        pos = self.table.positions.get(record_id)
+        if pos is None:
+            raise KeyError(record_id)
+        return self.table.row(pos)
+
+    def __setitem__(self, record_id, record):
+        self.table.upsert(record_id, record)
+
+    def __delitem__(self, record_id):
+        if record_id not in self.table.positions:
+            raise KeyError(record_id)
+        self.table.delete(record_id)
+
+    def __contains__(self, record_id):
+        return record_id in self.table.positions
+
+    def __iter__(self):
+        return iter(compress(self.table.ids, self.table.live))
+
+    def __len__(self):
+        return len(self.table)
+
+    def items(self):
+        return self.table.select_rows()
+
+    def values(self):
+        return (row for _, row in self.table.select_rows())
+
+    def __repr__(self):
+        return f"TableView({len(self)} rows, fields={self.table.fields})"
+
+
+class ColumnStore:
+    """All CRM tables held as ColumnTables"""
+
+    def __init__(self, schemas: dict = None):
+        self.schemas = TABLE_SCHEMAS if schemas is None else schemas
+        self.tables = {}
+
+    def table(self, name: str) -> ColumnTable:
+        if name not in self.tables:
+            self.tables[name] = ColumnTable(self.schemas.get(name))
+        return self.tables[name]
+
+    @classmethod
+    def from_sales_data(cls, data: dict, schemas: dict = None) -> "ColumnStore":
+        """Build a store from a ``sales_data``-shaped dict of dicts"""
+        store = cls(schemas)
+        for name, records in data.items():
+            table = store.table(name)
+            for record_id, record in records.items():
+                table.upsert(record_id, record)
+        return store
+
+    def views(self) -> dict:
+        """Read-compatible ``{table_name: TableView}`` mapping"""
+        return {name: TableView(table) for name, table in self.tables.items()}
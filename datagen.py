@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Seeded synthetic CRM data for scale testing.
+
+``iter_records`` streams ``(table, record_id, record)`` triples shaped exactly
+like ``sales_db.sales_data``: a sales team, then one lead at a time followed by
+its customer record (if it converted), opportunities, tasks and activities. Only
+the current lead is held in memory, so 10M-opportunity datasets can be written
+to JSONL or loaded into SQLite without materializing them. The same seed and
+``as_of`` date always produce the same data.
+
+Usage:
+    python datagen.py --opportunities 1000000 --seed 7 --jsonl crm.jsonl
+    python datagen.py --opportunities 1000000 --sqlite crm.db
+"""
+
+import argparse
+import itertools
+import json
+import random
+from datetime import date, timedelta
+
+import sales_db
+
+STAGES = ["Discovery", "Qualification", "Proposal", "Negotiation", "Closed Won", "Closed Lost"]
+STAGE_WEIGHTS = [26, 20, 17, 12, 15, 10]
+STAGE_PROBABILITY = {"Discovery": (10, 30), "Qualification": (20, 45), "Proposal": (40, 70),
+                     "Negotiation": (60, 90), "Closed Won": (100, 100), "Closed Lost": (0, 0)}
+LEAD_STATUSES = ["New", "Contacted", "Qualified", "Proposal Sent"]
+LEAD_STATUS_WEIGHTS = [30, 30, 25, 15]
+SOURCES = ["Website", "LinkedIn", "Referral", "Trade Show", "Cold Call"]
+SOURCE_WEIGHTS = [35, 25, 20, 12, 8]
+INDUSTRIES = ["Technology", "SaaS", "Healthcare", "Financial Services", "Manufacturing", "Retail",
+              "Consulting", "Education", "Real Estate", "Logistics", "Insurance", "Media", "Energy"]
+COMPANY_SIZES = ["10-50", "50-200", "200-500", "500-1000", "1000+"]
+LOCATIONS = ["San Francisco, CA", "New York, NY", "Austin, TX", "Boston, MA", "Chicago, IL",
+             "Los Angeles, CA", "Seattle, WA", "Denver, CO", "Atlanta, GA", "Miami, FL"]
+TERRITORIES = ["West Coast", "Northeast", "Central", "Southeast", "Southwest"]
+TITLES = ["CEO", "CTO", "VP of Engineering", "Director of Operations", "Head of IT", "CFO", "Procurement Manager"]
+TASK_TYPES = ["Follow-up Call", "Demo", "Proposal Review", "Email Follow-up", "Contract Negotiation"]
+ACTIVITY_TYPES = ["Call", "Email", "Meeting"]
+ACTIVITY_WEIGHTS = [40, 40, 20]
+FIRST_NAMES = ["James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael", "Linda", "David",
+               "Elizabeth", "William", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas",
+               "Sarah", "Priya", "Wei", "Carlos", "Fatima", "Kenji", "Olga", "Ahmed", "Lucia"]
+LAST_NAMES = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez",
+              "Martinez", "Chen", "Kim", "Patel", "Nguyen", "Wang", "Lopez", "Lee", "Walker", "Hall", "Young"]
+COMPANY_PREFIXES = ["Tech", "Global", "Data", "Cloud", "Green", "Blue", "Smart", "Prime", "Apex", "Nova",
+                    "Quantum", "Bright", "Core", "Metro", "Summit", "Pioneer", "Vertex", "Atlas", "Fusion", "Omni"]
+COMPANY_SUFFIXES = ["Corp", "Solutions", "Systems", "Labs", "Industries", "Partners", "Group", "Networks",
+                    "Dynamics", "Works", "Logistics", "Health", "Capital", "Media", "Energy"]
+PRODUCTS = ["Software License", "Implementation", "Support Contract", "Platform Upgrade", "Analytics Suite",
+            "Cloud Migration", "Training Package", "Security Add-on"]
+
+
+def _company_name(index: int) -> str:
+    """Unique, deterministic company name for the ``index``-th lead"""
+    prefix = COMPANY_PREFIXES[index % len(COMPANY_PREFIXES)]
+    suffix = COMPANY_SUFFIXES[(index // len(COMPANY_PREFIXES)) % len(COMPANY_SUFFIXES)]
+    block = index // (len(COMPANY_PREFIXES) * len(COMPANY_SUFFIXES))
+    return f"{prefix}{suffix}" if block == 0 else f"{prefix}{suffix} {block + 1}"
+
+
+def _zipf_weights(n: int, s: float = 1.1) -> list:
+    """Cumulative Zipf weights so a few reps own most of the pipeline"""
+    return list(itertools.accumulate(1 / (rank + 1) ** s for rank in range(n)))
+
+
+def _recent_day(rng: random.Random, as_of: date, mean_days: int, max_days: int) -> date:
+    """A date before ``as_of``, exponentially skewed towards recent days"""
+    return as_of - timedelta(days=min(int(rng.expovariate(1 / mean_days)), max_days))
+
+
+def iter_sales_team(opportunities: int, seed: int = 42):
+    """Stream ``(record_id, record)`` pairs for the sales team (one rep per ~2,500 opportunities)"""
+    rng = random.Random(f"{seed}-team")
+    size = max(4, opportunities // 2500)
+    used = set()
+    for i in range(size):
+        name = f"{FIRST_NAMES[i % len(FIRST_NAMES)]} {LAST_NAMES[(i // len(FIRST_NAMES) + i) % len(LAST_NAMES)]}"
+        if name in used:
+            name = f"{name} {i}"
+        used.add(name)
+        quota = rng.randrange(400_000, 1_500_001, 50_000)
+        yield name, {
+            "name": name,
+            "title": rng.choice(["Account Executive", "Senior Sales Executive", "Sales Manager"]),
+            "email": f"{name.lower().replace(' ', '.')}@company.com",
+            "phone": f"+1-555-{1000 + i % 9000:04d}",
+            "territory": TERRITORIES[i % len(TERRITORIES)],
+            "quota": quota,
+            "ytd_sales": int(quota * rng.uniform(0.2, 1.1)),
+            "specialization": rng.choice(["Enterprise Sales", "SMB Sales", "Healthcare Sales", "Technical Sales"]),
+        }
+
+
+def iter_records(opportunities: int = 10_000, seed: int = 42, as_of: date = None):
+    """Stream ``(table, record_id, record)`` triples for a referentially consistent dataset
+
+    Every opportunity, task and activity points at an emitted lead, every owner
+    is a member of the emitted sales team, and converted leads get a customer
+    record whose name equals the lead's company.
+    """
+    as_of = as_of or date.today()
+    rng = random.Random(seed)
+    team = list(iter_sales_team(opportunities, seed))
+    for rep_id, rep in team:
+        yield "sales_team", rep_id, rep
+    owners = [rep_id for rep_id, _ in team]
+    owner_weights = _zipf_weights(len(owners))
+    stage_weights = list(itertools.accumulate(STAGE_WEIGHTS))
+    width = max(6, len(str(opportunities)))
+
+    emitted = lead_no = customer_no = task_no = activity_no = 0
+    while emitted < opportunities:
+        lead_no += 1
+        lead_id = f"LEAD{lead_no:0{width}d}"
+        company = _company_name(lead_no - 1)
+        contact = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        domain = company.lower().replace(" ", "")
+        created = _recent_day(rng, as_of, 180, 720)
+        industry = rng.choice(INDUSTRIES)
+        company_size = rng.choice(COMPANY_SIZES)
+        location = rng.choice(LOCATIONS)
+        owner = rng.choices(owners, cum_weights=owner_weights)[0]
+        yield "leads", lead_id, {
+            "name": contact,
+            "company": company,
+            "email": f"{contact.split()[0].lower()}@{domain}.com",
+            "phone": f"+1-555-{rng.randint(1000, 9999)}",
+            "status": rng.choices(LEAD_STATUSES, weights=LEAD_STATUS_WEIGHTS)[0],
+            "value": int(round(rng.lognormvariate(11, 0.8), -3)),
+            "source": rng.choices(SOURCES, weights=SOURCE_WEIGHTS)[0],
+            "created": created.isoformat(),
+            "industry": industry,
+            "company_size": company_size,
+            "location": location,
+            "title": rng.choice(TITLES),
+            "notes": f"Lead generated for scale testing (seed {seed})",
+        }
+
+        # 0-3 opportunities per lead, most leads have one
+        won = False
+        for _ in range(min(rng.choices([0, 1, 2, 3], weights=[15, 55, 22, 8])[0], opportunities - emitted)):
+            emitted += 1
+            stage = rng.choices(STAGES, cum_weights=stage_weights)[0]
+            low, high = STAGE_PROBABILITY[stage]
+            opp_created = min(created + timedelta(days=rng.randint(0, 30)), as_of)
+            if stage in ("Closed Won", "Closed Lost"):
+                close_date = min(opp_created + timedelta(days=rng.randint(20, 150)), as_of)
+            else:
+                close_date = as_of + timedelta(days=int(rng.triangular(-15, 180, 20)))
+            won = won or stage == "Closed Won"
+            yield "opportunities", f"OPP{emitted:0{width}d}", {
+                "lead_id": lead_id,
+                "name": f"{company} {rng.choice(PRODUCTS)}",
+                "stage": stage,
+                "value": int(round(rng.lognormvariate(11, 0.9), -3)) or 1000,
+                "probability": rng.randint(low, high),
+                "close_date": close_date.isoformat(),
+                "owner": owner,
+                "created": opp_created.isoformat(),
+                "last_activity": min(opp_created + timedelta(days=rng.randint(0, 60)), as_of).isoformat(),
+                "notes": f"{stage} stage opportunity",
+            }
+
+        if won:
+            customer_no += 1
+            closed = _recent_day(rng, as_of, 120, 700)
+            yield "customers", f"CUST{customer_no:0{width}d}", {
+                "name": company,
+                "contact": contact,
+                "email": f"{contact.split()[0].lower()}@{domain}.com",
+                "phone": f"+1-555-{rng.randint(1000, 9999)}",
+                "status": rng.choices(["Active", "Inactive", "Churned"], weights=[80, 12, 8])[0],
+                "revenue": int(round(rng.lognormvariate(11.5, 0.9), -3)),
+                "onboarding_date": (closed + timedelta(days=rng.randint(7, 45))).isoformat(),
+                "closed_date": closed.isoformat(),
+                "industry": industry,
+                "company_size": company_size,
+                "location": location,
+                "account_manager": owner,
+                "last_activity": _recent_day(rng, as_of, 30, 365).isoformat(),
+                "notes": "Converted customer",
+            }
+
+        for _ in range(rng.choices([0, 1, 2], weights=[40, 45, 15])[0]):
+            task_no += 1
+            task_id = f"TASK{task_no:0{width}d}"
+            yield "tasks", task_id, {
+                "task_id": task_id,
+                "lead_id": lead_id,
+                "lead_name": contact,
+                "company": company,
+                "task_type": rng.choice(TASK_TYPES),
+                "due_date": (as_of + timedelta(days=rng.randint(-30, 45))).isoformat(),
+                "status": rng.choices(["Pending", "Completed"], weights=[60, 40])[0],
+                "notes": "Generated task",
+                "assigned_to": owner,
+                "priority": rng.choices(["High", "Medium", "Low"], weights=[25, 50, 25])[0],
+            }
+
+        for _ in range(rng.choices([0, 1, 2, 3], weights=[30, 35, 25, 10])[0]):
+            activity_no += 1
+            activity_id = f"ACT{activity_no:0{width}d}"
+            yield "activities", activity_id, {
+                "activity_id": activity_id,
+                "lead_id": lead_id,
+                "type": rng.choices(ACTIVITY_TYPES, weights=ACTIVITY_WEIGHTS)[0],
+                "date": _recent_day(rng, as_of, 45, 365).isoformat(),
+                "duration": f"{rng.choice([15, 30, 45, 60])} minutes",
+                "notes": "Generated activity",
+                "outcome": rng.choice(["Positive", "Neutral", "Needs follow-up"]),
+            }
+
+
+def build_sales_data(opportunities: int = 10_000, seed: int = 42, as_of: date = None) -> dict:
+    """Materialize a generated dataset as a ``sales_data``-shaped dict of dicts"""
+    data = {table: {} for table in ("leads", "opportunities", "customers", "tasks", "activities", "sales_team")}
+    for table, record_id, record in iter_records(opportunities, seed, as_of):
+        data[table][record_id] = record
+    return data
+
+
+def write_jsonl(path: str, records) -> int:
+    """Stream ``(table, record_id, record)`` triples to a JSON Lines file; returns the line count"""
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for table, record_id, record in records:
+            f.write(json.dumps({"table": table, "id": record_id, "record": record}, separators=(",", ":")))
+            f.write("\n")
+            count += 1
+    return count
+
+
+def read_jsonl(path: str):
+    """Stream ``(table, record_id, record)`` triples back from a JSON Lines file"""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            row = json.loads(line)
+            yield row["table"], row["id"], row["record"]
+
+
+def load_into(backend, records, batch_size: int = 10_000) -> int:
+    """Bulk-load streamed records into a sales_db backend in per-table batches
+
+    Loads into the active backend go through ``sales_db.bulk_load`` so the
+    change log, cached tool results and derived indexes see the new rows.
+    """
+    insert_many = sales_db.bulk_load if backend is sales_db.get_backend() else backend.insert_many
+    batches = {}
+    count = 0
+    for table, record_id, record in records:
+        batch = batches.setdefault(table, [])
+        batch.append((record_id, record))
+        if len(batch) >= batch_size:
+            insert_many(table, batch)
+            batch.clear()
+        count += 1
+    for table, batch in batches.items():
+        if batch:
+            insert_many(table, batch)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a seeded synthetic CRM dataset")
+    parser.add_argument("--opportunities", type=int, default=10_000, help="Number of opportunities (10k-10M)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--as-of", type=date.fromisoformat, default=None, help="Reference 'today' (YYYY-MM-DD)")
+    parser.add_argument("--jsonl", help="Write JSON Lines to this path")
+    parser.add_argument("--sqlite", help="Load into this SQLite database")
+    args = parser.parse_args()
+    if not (args.jsonl or args.sqlite):
+        parser.error("pass --jsonl and/or --sqlite")
+
+    if args.jsonl:
+        count = write_jsonl(args.jsonl, iter_records(args.opportunities, args.seed, args.as_of))
+        print(f"✅ Wrote {count:,} records to {args.jsonl}")
+    if args.sqlite:
+        from sqlite_backend import SQLiteBackend
+        records = read_jsonl(args.jsonl) if args.jsonl else iter_records(args.opportunities, args.seed, args.as_of)
+        count = load_into(SQLiteBackend(args.sqlite), records)
+        print(f"✅ Loaded {count:,} records into {args.sqlite}")
+
+
+if __name__ == "__main__":
+    main()
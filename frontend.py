@@ -213,12 +213,25 @@ def main():
             st.rerun()
         
         st.caption(f"Thread: {st.session_state.thread_id[:8]}...")
+        history_report = agent.history_manager.report(st.session_state.thread_id)
+        if history_report:
+            st.caption(
+                f"History: {history_report['tokens_after']:,} tokens "
+                f"({history_report['total_tokens_saved']:,} saved per call by compaction)"
+            )
         
         # Status indicators (minimal)
         if not OPENAI_API_KEY:
             st.error("OpenAI API Key Missing")
         if not cl_project:
             st.caption("Cleanlab: Disabled")
+        else:
+            policy_stats = agent.validation_policy.stats()
+            decisions = policy_stats["decisions"]
+            st.caption(
+                f"Validation: {decisions['sync']} sync / {decisions['async']} async / {decisions['skip']} skipped, "
+                f"~{policy_stats['estimated_seconds_saved']:.1f}s saved"
+            )
         
         # Available tools
         st.header("Available Tools")
@@ -376,12 +389,21 @@ def main():
             
             max_iterations = 5
             current_history = st.session_state.history.copy()
+            # Background validations left over from a turn that never reached an answer
+            agent.pending_validations.pop(st.session_state.thread_id, None)
+            
+            # Render the answer token by token as the LLM streams it
+            streamed = []
+            def show_delta(text):
+                streamed.append(text)
+                message_placeholder.markdown("".join(streamed) + "▌")
             
             try:
                 for iteration in range(max_iterations):
+                    streamed.clear()
                     with st.spinner(f"🤔 Thinking... (Step {iteration + 1})"):
                         result = agent.process_message(
-                            user_input, current_history, st.session_state.thread_id
+                            user_input, current_history, st.session_state.thread_id, on_delta=show_delta
                         )
                         history, continue_loop, response, extra_info = result[:4]
                         tool_calls_info = result[4] if len(result) > 4 else []
@@ -415,26 +437,30 @@ def main():
                                 st.markdown("---")
                     
                     if continue_loop:
+                        # Text streamed alongside tool calls is not the answer; clear it for the next step
+                        if streamed:
+                            message_placeholder.empty()
                         # Show tool usage - match the working pattern
                         tool_placeholder.info(f"🔧 **Step {iteration + 1}:** {response}")
                         
-                        # Show validation for intermediate steps
-                        if isinstance(extra_info, dict):
-                            if extra_info.get("should_guardrail"):
-                                st.warning(f"🛡️ **Safety Alert (Step {iteration + 1}):** Tool selection was flagged by Cleanlab validation")
-                            
-                            with st.expander(f"🛡️ Cleanlab Validation (Step {iteration + 1})"):
-                                st.json(extra_info)
-                        elif isinstance(extra_info, str):
+                        # Tool steps are validated in the background; a flag retracts the final answer below
+                        if isinstance(extra_info, str):
                             with st.expander(f"Tool Result (Step {iteration + 1})"):
                                 st.code(extra_info, language="json")
                     else:
                         # Final response
                         message_placeholder.markdown(response)
                         
+                        # Tool steps were validated in the background; a late flag retracts the answer
+                        retracted = agent.settle_validations(current_history, st.session_state.thread_id)
+                        if retracted is not None:
+                            response, extra_info = retracted
+                            message_placeholder.markdown(response)
+                            st.warning("🛡️ **Safety Alert:** Tool selection for this answer was flagged by Cleanlab validation; the answer was withdrawn")
+                        
                         # Show validation info - match the working pattern
                         if isinstance(extra_info, dict):
-                            if extra_info.get("should_guardrail"):
+                            if extra_info.get("should_guardrail") and retracted is None:
                                 st.warning("🛡️ **Safety Alert:** This response was flagged by Cleanlab validation")
                             
                             with st.expander("🛡️ Cleanlab Validation Results"):
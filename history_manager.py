@@ -0,0 +1,168 @@
+"""
+Token-budgeted compaction of the agent's conversation history.
+
+The history is resent to the LLM on every step, so it is kept within a token
+budget. System messages and the most recent ``keep_turns`` turns are never
+touched; older turns are compacted in three stages, stopping as soon as the
+history fits:
+
+1. their tool results are replaced by summaries (scalar fields kept, tables
+   and lists reduced to their sizes) and repeated copies of the user message
+   are dropped;
+2. the oldest turns are collapsed to the user question and the final answer;
+3. the oldest turns are dropped.
+
+If the protected part alone is over budget, the history is left over budget
+rather than losing the latest turns.
+
+Assistant tool calls and their tool results are only ever removed together,
+so every ``tool_call_id`` in what remains still has its tool call. Each
+compaction is reported per thread (tokens before/after, saved).
+"""
+
+import json
+import threading
+
+from tool_encoding import estimate_tokens
+
+DEFAULT_BUDGET = 8000
+DEFAULT_KEEP_TURNS = 3
+# Per-message overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD = 4
+COMPACTED = '{"compacted":true'
+
+
+def _tool_call_parts(tool_call):
+    function = tool_call["function"] if isinstance(tool_call, dict) else tool_call.function
+    if isinstance(function, dict):
+        return function.get("name") or "", function.get("arguments") or ""
+    return function.name or "", function.arguments or ""
+
+
+def message_tokens(message: dict) -> int:
+    """Approximate prompt tokens of one chat message"""
+    text = str(message.get("content") or "")
+    for tool_call in message.get("tool_calls") or ():
+        name, arguments = _tool_call_parts(tool_call)
+        text += name + arguments
+    return estimate_tokens(text) + MESSAGE_OVERHEAD
+
+
+def history_tokens(history: list) -> int:
+    return sum(message_tokens(message) for message in history)
+
+
+def summarize_tool_result(content: str, limit: int = 300) -> str:
+    """Short stand-in for a tool result: scalar fields kept, tables and lists reduced to their sizes"""
+    if content.startswith(COMPACTED):
+        return content
+    try:
+        result = json.loads(content)
+    except (TypeError, ValueError):
+        result = None
+    summary = {}
+    if isinstance(result, dict):
+        for key, value in result.items():
+            if isinstance(value, dict) and "rows" in value and "columns" in value:
+                summary[key] = f"{value.get('total_rows', len(value['rows']))} rows"
+            elif isinstance(value, (list, dict)):
+                text = json.dumps(value, separators=(",", ":"))
+                summary[key] = value if len(text) <= 80 else f"{len(value)} items"
+            else:
+                summary[key] = value
+    else:
+        summary = content[:limit]
+    text = json.dumps(summary, separators=(",", ":"), ensure_ascii=False, default=str)
+    if len(text) > limit:
+        text = json.dumps(text[:limit], ensure_ascii=False)
+    return f'{COMPACTED},"summary":{text}}}'
+
+
+def split_turns(history: list):
+    """``(system messages, turns)``: a turn runs from a user message to the assistant's final answer"""
+    system = [message for message in history if message.get("role") == "system"]
+    turns = []
+    current = None
+    for message in history:
+        role = message.get("role")
+        if role == "system":
+            continue
+        if current is None or (role == "user" and current["done"]):
+            current = {"messages": [], "done": False}
+            turns.append(current)
+        current["messages"].append(message)
+        if role == "assistant" and not message.get("tool_calls"):
+            current["done"] = True
+    return system, [turn["messages"] for turn in turns]
+
+
+class HistoryManager:
+    """Keeps a conversation history within a token budget and reports what it saved"""
+
+    def __init__(self, budget: int = DEFAULT_BUDGET, keep_turns: int = DEFAULT_KEEP_TURNS):
+        self.budget = budget
+        self.keep_turns = max(1, keep_turns)
+        self.lock = threading.Lock()
+        self.reports = {}
+
+    @staticmethod
+    def _summarize_turn(turn: list) -> list:
+        compacted = []
+        for message in turn:
+            if message.get("role") == "user" and compacted and any(
+                    m.get("role") == "user" and m.get("content") == message.get("content") for m in compacted):
+                continue  # the same question repeated after a tool step
+            if message.get("role") == "tool":
+                message = {**message, "content": summarize_tool_result(str(message.get("content") or ""))}
+            compacted.append(message)
+        return compacted
+
+    @staticmethod
+    def _collapse_turn(turn: list) -> list:
+        """The turn's first user message and final answer, without the tool calls in between"""
+        question = next((message for message in turn if message.get("role") == "user"), None)
+        answer = turn[-1] if turn[-1].get("role") == "assistant" and not turn[-1].get("tool_calls") else None
+        return [message for message in (question, answer) if message is not None]
+
+    def compact(self, history: list, thread_id: str = None) -> dict:
+        """Compact ``history`` in place to fit the budget; returns this compaction's report"""
+        before = history_tokens(history)
+        report = {"tokens_before": before, "tokens_after": before, "tokens_saved": 0,
+                  "summarized": 0, "collapsed": 0, "dropped": 0}
+        if before > self.budget:
+            system, turns = split_turns(history)
+            old = max(0, len(turns) - self.keep_turns)
+            total = lambda: history_tokens(system) + sum(history_tokens(turn) for turn in turns)
+            for i in range(old):
+                if total() <= self.budget:
+                    break
+                compacted = self._summarize_turn(turns[i])
+                if compacted != turns[i]:
+                    turns[i] = compacted
+                    report["summarized"] += 1
+            for i in range(old):
+                if total() <= self.budget:
+                    break
+                collapsed = self._collapse_turn(turns[i])
+                if len(collapsed) < len(turns[i]):
+                    turns[i] = collapsed
+                    report["collapsed"] += 1
+            dropped = 0
+            while dropped < old and total() > self.budget:
+                turns[dropped] = []
+                dropped += 1
+            report["dropped"] = dropped
+            history[:] = system + [message for turn in turns for message in turn]
+            report["tokens_after"] = history_tokens(history)
+            report["tokens_saved"] = before - report["tokens_after"]
+        with self.lock:
+            previous = self.reports.get(thread_id, {})
+            # Tokens no longer sent on every LLM call, summed over this thread's compactions
+            report["total_tokens_saved"] = previous.get("total_tokens_saved", 0) + report["tokens_saved"]
+            self.reports[thread_id] = report
+        return report
+
+    def report(self, thread_id: str = None) -> dict:
+        """The latest compaction report for a thread"""
+        with self.lock:
+            return dict(self.reports.get(thread_id, {}))
@@ -0,0 +1,264 @@
+"""
+Secondary indexes for the CRM tables.
+
+A ``TableIndex`` maps ``field -> value -> set of row ids`` for a fixed list of
+equality fields, and keeps a sorted ``DateIndex`` of ordinal day numbers for
+each date field. Row ids are small integers handed out in insertion order, so
+sorting a match set gives back the table's natural order. Dates are parsed
+once, when a record is indexed, and any date range resolves with two bisects
+plus a slice. ``sales_db.MemoryBackend`` keeps the indexes in step with every
+write.
+
+An ``AccountIndex`` joins the tables on normalized company names and lead ids,
+so everything belonging to one account is reachable without a table scan.
+"""
+
+from bisect import bisect_left, insort
+from datetime import date
+
+# Equality fields with a secondary index, per table
+INDEXED_FIELDS = {
+    "leads": ("status", "source", "industry"),
+    "opportunities": ("stage", "owner", "lead_id"),
+    "customers": ("status", "industry"),
+    "tasks": ("status", "assigned_to", "lead_id"),
+    "activities": ("lead_id", "type"),
+}
+
+# Date fields with a sorted day-number index, per table
+DATE_FIELDS = {
+    "leads": ("created",),
+    "opportunities": ("close_date", "created", "last_activity"),
+    "customers": ("closed_date", "last_activity"),
+    "tasks": ("due_date",),
+    "activities": ("date",),
+}
+
+
+def parse_day(value):
+    """Ordinal day number for an ISO date string (or day number); None if it does not parse"""
+    if isinstance(value, int):
+        return value
+    try:
+        return date.fromisoformat(value[:10]).toordinal()
+    except (TypeError, ValueError):
+        return None
+
+
+class DateIndex:
+    """Sorted ``(day number, row id)`` pairs for one date field"""
+
+    def __init__(self):
+        self.keys = []
+        self.days = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, row_id: int, value, keep_sorted: bool = True):
+        day = parse_day(value)
+        if day is None:
+            return
+        self.days[row_id] = day
+        if keep_sorted:
+            insort(self.keys, (day, row_id))
+        else:
+            self.keys.append((day, row_id))
+
+    def remove(self, row_id: int):
+        day = self.days.pop(row_id, None)
+        if day is not None:
+            del self.keys[bisect_left(self.keys, (day, row_id))]
+
+    def between(self, lo=None, hi=None) -> list:
+        """Row ids whose day falls in ``[lo, hi]``; bounds are optional ISO strings or day numbers"""
+        keys = self.keys
+        start = 0 if lo is None else bisect_left(keys, (parse_day(lo),))
+        end = len(keys) if hi is None else bisect_left(keys, (parse_day(hi) + 1,))
+        return [row_id for _, row_id in keys[start:end]]
+
+
+class TableIndex:
+    """Equality and date-range indexes over selected fields of one table"""
+
+    def __init__(self, fields, records=None, date_fields=()):
+        self.fields = tuple(fields)
+        self.postings = {field: {} for field in self.fields}
+        self.dates = {field: DateIndex() for field in date_fields}
+        self.row_ids = {}
+        self.record_ids = []
+        for record_id, record in (records or {}).items():
+            self.add(record_id, record, keep_sorted=False)
+        for index in self.dates.values():
+            index.keys.sort()
+
+    def __len__(self):
+        return len(self.row_ids)
+
+    def add(self, record_id: str, record: dict, keep_sorted: bool = True):
+        """Index a new record (or re-index an existing one under its old row id)"""
+        row_id = self.row_ids.get(record_id)
+        if row_id is None:
+            row_id = len(self.record_ids)
+            self.row_ids[record_id] = row_id
+            self.record_ids.append(record_id)
+        for field in self.fields:
+            value = record.get(field)
+            if value is not None:
+                self.postings[field].setdefault(value, set()).add(row_id)
+        for field, index in self.dates.items():
+            index.add(row_id, record.get(field), keep_sorted)
+
+    def _unlink(self, field: str, value, row_id: int):
+        rows = self.postings[field].get(value)
+        if rows is not None:
+            rows.discard(row_id)
+            if not rows:
+                del self.postings[field][value]
+
+    def update(self, record_id: str, old: dict, new: dict):
+        """Move a record's postings from its old field values to the new ones"""
+        row_id = self.row_ids.get(record_id)
+        if row_id is None:
+            self.add(record_id, new)
+            return
+        for field in self.fields:
+            if old.get(field) == new.get(field):
+                continue
+            self._unlink(field, old.get(field), row_id)
+            value = new.get(field)
+            if value is not None:
+                self.postings[field].setdefault(value, set()).add(row_id)
+        for field, index in self.dates.items():
+            if old.get(field) != new.get(field):
+                index.remove(row_id)
+                index.add(row_id, new.get(field))
+
+    def remove(self, record_id: str, record: dict):
+        """Drop a record from every posting list and date index"""
+        row_id = self.row_ids.pop(record_id, None)
+        if row_id is None:
+            return
+        for field in self.fields:
+            self._unlink(field, record.get(field), row_id)
+        for index in self.dates.values():
+            index.remove(row_id)
+        self.record_ids[row_id] = None
+
+    def values(self, field: str) -> list:
+        """Distinct indexed values of a field"""
+        return list(self.postings[field])
+
+    def match_count(self, field: str, value) -> int:
+        return len(self.postings[field].get(value, ()))
+
+    def lookup(self, ranges=None, **filters) -> list:
+        """Record ids matching every non-empty equality filter and date range, in insertion order
+
+        ``ranges`` maps an indexed date field to inclusive ``(lo, hi)`` bounds.
+        Candidate sets are intersected smallest first, so the cost is bounded by
+        the most selective filter rather than by the table size.
+        """
+        sets = []
+        for field, value in filters.items():
+            if not value:
+                continue
+            if field not in self.postings:
+                raise KeyError(f"Field '{field}' is not indexed")
+            rows = self.postings[field].get(value)
+            if not rows:
+                return []
+            sets.append(rows)
+        for field, (lo, hi) in (ranges or {}).items():
+            if field not in self.dates:
+                raise KeyError(f"Date field '{field}' is not indexed")
+            rows = self.dates[field].between(lo, hi)
+            if not rows:
+                return []
+            sets.append(set(rows))
+        if not sets:
+            return [record_id for record_id in self.record_ids if record_id is not None]
+        sets.sort(key=len)
+        matches = sets[0]
+        for rows in sets[1:]:
+            matches = matches & rows
+            if not matches:
+                return []
+        record_ids = self.record_ids
+        return [record_ids[row_id] for row_id in sorted(matches)]
+
+
+# Legal-form suffixes ignored when matching company names
+COMPANY_SUFFIXES = {"inc", "incorporated", "llc", "ltd", "limited", "corp", "corporation", "co", "company", "gmbh", "plc"}
+
+# Tables linked to an account through their lead_id
+LEAD_CHILD_TABLES = ("opportunities", "tasks", "activities")
+
+
+def company_key(name) -> str:
+    """Normalized company name: case-folded, punctuation and legal suffixes dropped"""
+    words = "".join(ch if ch.isalnum() else " " for ch in str(name or "").casefold()).split()
+    while len(words) > 1 and words[-1] in COMPANY_SUFFIXES:
+        words.pop()
+    return " ".join(words)
+
+
+class AccountIndex:
+    """Join index from a normalized company name to its customers, leads and their child records
+
+    Leads are keyed by ``company`` and customers by ``name``; opportunities,
+    tasks and activities hang off their ``lead_id``. Every lookup costs
+    O(records for that account), and writes are applied one record at a time.
+    """
+
+    def __init__(self):
+        self.customers = {}
+        self.leads = {}
+        self.lead_keys = {}
+        self.children = {table: {} for table in LEAD_CHILD_TABLES}
+
+    def add(self, table: str, record_id: str, record: dict):
+        if table == "customers":
+            self.customers.setdefault(company_key(record.get("name")), {})[record_id] = None
+        elif table == "leads":
+            key = company_key(record.get("company"))
+            self.leads.setdefault(key, {})[record_id] = None
+            self.lead_keys[record_id] = key
+        elif table in self.children and record.get("lead_id"):
+            self.children[table].setdefault(record["lead_id"], {})[record_id] = None
+
+    def remove(self, table: str, record_id: str, record: dict):
+        if table == "customers":
+            postings, key = self.customers, company_key(record.get("name"))
+        elif table == "leads":
+            postings, key = self.leads, self.lead_keys.pop(record_id, None)
+        elif table in self.children:
+            postings, key = self.children[table], record.get("lead_id")
+        else:
+            return
+        ids = postings.get(key)
+        if ids is not None:
+            ids.pop(record_id, None)
+            if not ids:
+                del postings[key]
+
+    def apply(self, table: str, record_id: str, old: dict, new: dict):
+        """Account for one write: ``old`` is None for inserts, ``new`` is None for deletes"""
+        if old is not None:
+            self.remove(table, record_id, old)
+        if new is not None:
+            self.add(table, record_id, new)
+
+    def customer_ids(self, company) -> list:
+        return list(self.customers.get(company_key(company), ()))
+
+    def lead_ids(self, company) -> list:
+        return list(self.leads.get(company_key(company), ()))
+
+    def related(self, company, table: str) -> list:
+        """Record ids in ``table`` belonging to the company's leads, grouped by lead"""
+        if table == "leads":
+            return self.lead_ids(company)
+        children = self.children[table]
+        return [record_id for lead_id in self.leads.get(company_key(company), ())
+                for record_id in children.get(lead_id, ())]
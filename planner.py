@@ -0,0 +1,204 @@
+"""
+Composable queries over the CRM tables.
+
+A ``Query`` describes a table, its equality predicates, inclusive ranges,
+exclusions, grouping, ordering and paging. It is built up by chaining and
+never mutated, so a base query can be shared between several tool outputs.
+Running it goes through a small planner that picks the cheapest source able
+to answer it:
+
+1. the materialized pipeline aggregates (``sales_db.get_pipeline_aggregates``)
+   for opportunity totals filtered or grouped by stage, owner and whole
+   close months - O(groups), no rows touched (in-memory backend only);
+2. otherwise the active backend, which resolves the indexed predicates
+   through its hash/date indexes (or columnar masks, or SQL), applies every
+   other predicate in the same pass and accumulates totals as it goes.
+
+``explain`` reports which plan was picked.
+
+``cube`` groups by several dimensions at once - plain fields, derived ones
+(close month, value band) and lead attributes joined through ``lead_id``
+(industry, source) - computing every cell in the same single pass.
+"""
+
+from aggregates import close_month, whole_months
+from records import RecordView
+from sales_db import MemoryBackend, get_backend, get_pipeline_aggregates
+
+# Filters/groupings the materialized opportunity aggregates can answer
+AGGREGATE_FIELDS = {"stage", "owner"}
+AGGREGATE_MEASURES = {("value", "probability"), ("value", None)}
+
+# Deal-size bands as (exclusive upper bound, label); the last band is open-ended
+VALUE_BANDS = ((25000, "<25k"), (50000, "25k-50k"), (100000, "50k-100k"), (250000, "100k-250k"), (None, "250k+"))
+VALUE_BAND_ORDER = {label: i for i, (_, label) in enumerate(VALUE_BANDS)}
+
+
+def value_band(record: dict):
+    value = record.get("value")
+    if value is None:
+        return None
+    return next(label for bound, label in VALUE_BANDS if bound is None or value < bound)
+
+
+# Dimensions computed from the record rather than read from one field
+DERIVED_DIMENSIONS = {"close_month": close_month, "value_band": value_band}
+# Lead attributes reachable from a record's lead_id
+LEAD_DIMENSIONS = {"industry": "industry", "source": "source", "lead_source": "source"}
+
+
+class Query:
+    """Immutable, chainable description of a CRM query"""
+
+    def __init__(self, table: str):
+        self.table = table
+        self.equals = {}
+        self.ranges = {}
+        self.excluded = {}
+        self.group = None
+        self.order = None
+        self.descending = False
+        self.page = (None, 0)
+
+    def _with(self, **changes) -> "Query":
+        query = Query.__new__(Query)
+        query.__dict__.update(self.__dict__, **changes)
+        return query
+
+    def where(self, **equals) -> "Query":
+        """Add equality predicates; falsy values are ignored, like the helpers' optional filters"""
+        return self._with(equals={**self.equals, **{field: value for field, value in equals.items() if value}})
+
+    def between(self, field: str, lo=None, hi=None) -> "Query":
+        """Add an inclusive range; a second range on the same field narrows the first"""
+        if field in self.ranges:
+            old_lo, old_hi = self.ranges[field]
+            lo = old_lo if lo is None else lo if old_lo is None else max(lo, old_lo)
+            hi = old_hi if hi is None else hi if old_hi is None else min(hi, old_hi)
+        return self._with(ranges={**self.ranges, field: (lo, hi)})
+
+    def excluding(self, field: str, values) -> "Query":
+        """Drop rows whose ``field`` is one of ``values``"""
+        return self._with(excluded={**self.excluded, field: tuple(self.excluded.get(field, ())) + tuple(values)})
+
+    def group_by(self, field: str) -> "Query":
+        return self._with(group=field)
+
+    def order_by(self, field: str, descending: bool = False) -> "Query":
+        return self._with(order=field, descending=descending)
+
+    def limit(self, limit: int, offset: int = 0) -> "Query":
+        return self._with(page=(limit, offset))
+
+    # Planning
+    def _aggregate_plan(self, value_field: str, weight_field: str):
+        """Arguments for the materialized aggregates, or None when they cannot answer this query
+
+        Only the in-memory backend qualifies: other backends can be written by other
+        processes or connections the in-process aggregates never hear about.
+        """
+        if self.table != "opportunities" or (value_field, weight_field) not in AGGREGATE_MEASURES:
+            return None
+        if not isinstance(get_backend(), MemoryBackend):
+            return None
+        fields = set(self.equals) | set(self.excluded) | ({self.group} if self.group else set())
+        if not fields <= AGGREGATE_FIELDS or set(self.ranges) - {"close_date"}:
+            return None
+        within = None
+        if "close_date" in self.ranges:
+            months = whole_months(*self.ranges["close_date"])
+            if months is None:
+                return None
+            within = {"close_month": months}
+        return {"group_by": self.group, "exclude": self.excluded, "within": within, **self.equals}
+
+    def explain(self, value_field: str = None, weight_field: str = None) -> str:
+        """Which source would answer ``totals(value_field, weight_field)`` (or the row query)"""
+        if value_field and self._aggregate_plan(value_field, weight_field) is not None:
+            return "materialized pipeline aggregates"
+        backend = get_backend()
+        if not hasattr(backend, "explain"):
+            return f"{backend.name} backend"
+        return backend.explain(self.table, self.ranges, self.excluded, aggregate=bool(value_field), **self.equals)
+
+    # Execution
+    def rows(self):
+        """Lazily yield matching ``(record_id, record)`` pairs"""
+        limit, offset = self.page
+        return get_backend().iterate(self.table, self.ranges, self.excluded, self.order, self.descending,
+                                     limit, offset, **self.equals)
+
+    def records(self) -> list:
+        return [record for _, record in self.rows()]
+
+    def views(self, id_field: str) -> list:
+        """Matching records as read-only views carrying their id"""
+        return [RecordView(id_field, record_id, record) for record_id, record in self.rows()]
+
+    def count(self) -> int:
+        plan = self._aggregate_plan("value", None) if self.group is None else None
+        if plan is not None:
+            return get_pipeline_aggregates().totals(**plan)["count"]
+        return get_backend().count(self.table, self.ranges, self.excluded, **self.equals)
+
+    def _dimension(self, name: str, leads: dict):
+        """Function extracting one cube dimension from a record"""
+        if name in DERIVED_DIMENSIONS:
+            return DERIVED_DIMENSIONS[name]
+        if name in LEAD_DIMENSIONS and self.table != "leads":
+            field = LEAD_DIMENSIONS[name]
+            return lambda record: (leads.get(record.get("lead_id")) or {}).get(field)
+        return lambda record: record.get(name)
+
+    def cube(self, dimensions, value_field: str, weight_field: str = None) -> dict:
+        """Totals for every combination of ``dimensions``, keyed by tuples of dimension values
+
+        Stage/owner/close-month cubes over whole months come straight from the
+        materialized aggregates; anything else is accumulated in one pass over
+        the matching rows (lead attributes are joined by fetching only the leads
+        those rows reference).
+        """
+        dimensions = tuple(dimensions)
+        if not dimensions:
+            raise ValueError("cube() needs at least one dimension")
+        plan = self.group_by(None)._aggregate_plan(value_field, weight_field)
+        if plan is not None and set(dimensions) <= AGGREGATE_FIELDS | {"close_month"}:
+            cells = get_pipeline_aggregates().totals(**{**plan, "group_by": dimensions})
+            if weight_field is None:
+                for entry in cells.values():
+                    entry["weighted"] = 0
+            return cells
+        rows = self.rows()
+        leads = {}
+        if self.table != "leads" and any(name in LEAD_DIMENSIONS for name in dimensions):
+            # Only the leads the matching rows point at, each fetched once
+            rows = list(rows)
+            backend = get_backend()
+            lead_ids = {record.get("lead_id") for _, record in rows} - {None}
+            leads = {lead_id: backend.get("leads", lead_id) for lead_id in lead_ids}
+        extract = [self._dimension(name, leads) for name in dimensions]
+        cells = {}
+        for _, record in rows:
+            key = tuple(dimension(record) for dimension in extract)
+            cell = cells.get(key)
+            if cell is None:
+                cell = cells[key] = {"count": 0, "value": 0, "weighted": 0}
+            value = record.get(value_field) or 0
+            cell["count"] += 1
+            cell["value"] += value
+            if weight_field:
+                cell["weighted"] += value * (record.get(weight_field) or 0)
+        return cells
+
+    def totals(self, value_field: str, weight_field: str = None) -> dict:
+        """``count``, ``value`` and ``weighted`` sums (per group when grouped), computed in one pass"""
+        plan = self._aggregate_plan(value_field, weight_field)
+        if plan is not None:
+            totals = get_pipeline_aggregates().totals(**plan)
+            if weight_field is None:
+                # The backend reports no weighted sum without a weight field
+                for entry in (totals.values() if self.group else (totals,)):
+                    entry["weighted"] = 0
+            return totals
+        return get_backend().totals(self.table, value_field, weight_field, group_by=self.group,
+                                    ranges=self.ranges, exclude=self.excluded, **self.equals)
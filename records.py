@@ -0,0 +1,194 @@
+"""
+Read-only record views for sales_db query results.
+
+The helpers used to return ``{"customer_id": id, **customer}`` for every hit,
+copying each field of each row. A ``RecordView`` instead holds the id and a
+reference to the stored record (three slots, whatever the record size), reads
+through to it, and is only turned into a dict when it is serialized.
+
+The stored records themselves can be compacted too: ``Lead``, ``Opportunity``,
+``Customer``, ``Task`` and ``Activity`` keep their fields in ``__slots__``
+instead of a per-record dict, intern categorical strings (stage, status,
+owner, ...) so every record shares one copy, and hold dates as shared ordinal
+day numbers. They still read like the original dicts.
+"""
+
+import sys
+from collections.abc import Mapping
+
+from columnar import CATEGORY, DATE, TABLE_SCHEMAS, _MISSING, from_day, to_day
+from schema import TABLE_FIELDS
+
+
+class RecordView(Mapping):
+    """Read-only mapping of ``{id_field: record_id, **record}`` that copies nothing"""
+
+    __slots__ = ("id_field", "record_id", "record")
+
+    def __init__(self, id_field: str, record_id: str, record: Mapping):
+        self.id_field = id_field
+        self.record_id = record_id
+        self.record = record
+
+    def __getitem__(self, key):
+        if key == self.id_field:
+            return self.record_id
+        return self.record[key]
+
+    def __contains__(self, key):
+        return key == self.id_field or key in self.record
+
+    def __iter__(self):
+        yield self.id_field
+        for key in self.record:
+            if key != self.id_field:
+                yield key
+
+    def __len__(self):
+        return len(self.record) + (self.id_field not in self.record)
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+    def to_dict(self) -> dict:
+        """Materialize a plain dict (id first, like the old helper output)"""
+        return {self.id_field: self.record_id, **self.record}
+
+
+def view_rows(id_field: str, rows) -> list:
+    """Wrap ``(record_id, record)`` pairs from a backend in RecordViews"""
+    return [RecordView(id_field, record_id, record) for record_id, record in rows]
+
+
+def to_json(obj):
+    """``json.dumps`` default hook: materialize record views (and any other mapping)"""
+    if isinstance(obj, RecordView):
+        return obj.to_dict()
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+# Shared day-number <-> ISO string objects, so equal dates are stored once
+_DAYS = {}
+_DAY_STRINGS = {}
+
+
+def _encode_day(value):
+    day = _DAYS.get(value)
+    if day is None:
+        try:
+            day = to_day(value)
+        except (TypeError, ValueError):
+            return value
+        if from_day(day) != value:
+            return value  # keep anything that would not round-trip exactly
+        day = _DAYS.setdefault(value, day)
+        _DAY_STRINGS.setdefault(day, value)
+    return day
+
+
+class Record(Mapping):
+    """Compact, read-only CRM record with a dict-style interface
+
+    Subclasses set ``table``; their slots are the table's fields, in the same
+    order as the original dict keys. Keys outside the schema go to ``_extra``.
+    """
+
+    __slots__ = ("_extra",)
+    table = None
+    fields = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        schema = TABLE_SCHEMAS.get(cls.table, {})
+        cls.fields = TABLE_FIELDS[cls.table]
+        cls.field_set = frozenset(cls.fields)
+        cls.categories = frozenset(f for f, kind in schema.items() if kind == CATEGORY)
+        cls.dates = frozenset(f for f, kind in schema.items() if kind == DATE)
+
+    def __init__(self, data: Mapping):
+        extra = None
+        fields, categories, dates = self.field_set, self.categories, self.dates
+        for key, value in data.items():
+            if key not in fields:
+                extra = extra or {}
+                extra[key] = value
+                continue
+            if key in categories and type(value) is str:
+                value = sys.intern(value)
+            elif key in dates and type(value) is str:
+                value = _encode_day(value)
+            setattr(self, key, value)
+        self._extra = extra
+
+    def __getitem__(self, key):
+        if key in self.field_set:
+            value = getattr(self, key, _MISSING)
+            if value is _MISSING:
+                raise KeyError(key)
+            if key in self.dates and type(value) is int:
+                return _DAY_STRINGS.get(value) or from_day(value)
+            return value
+        if self._extra is not None:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        if key in self.field_set:
+            return hasattr(self, key)
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self):
+        for field in self.fields:
+            if hasattr(self, field):
+                yield field
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class Lead(Record):
+    __slots__ = TABLE_FIELDS["leads"]
+    table = "leads"
+
+
+class Opportunity(Record):
+    __slots__ = TABLE_FIELDS["opportunities"]
+    table = "opportunities"
+
+
+class Customer(Record):
+    __slots__ = TABLE_FIELDS["customers"]
+    table = "customers"
+
+
+class Task(Record):
+    __slots__ = TABLE_FIELDS["tasks"]
+    table = "tasks"
+
+
+class Activity(Record):
+    __slots__ = TABLE_FIELDS["activities"]
+    table = "activities"
+
+
+class SalesRep(Record):
+    __slots__ = TABLE_FIELDS["sales_team"]
+    table = "sales_team"
+
+
+RECORD_TYPES = {cls.table: cls for cls in (Lead, Opportunity, Customer, Task, Activity, SalesRep)}
+
+
+def compact(table: str, record: Mapping):
+    """The record as its table's slotted Record type (unchanged if the table has none)"""
+    record_type = RECORD_TYPES.get(table)
+    if record_type is None or isinstance(record, record_type):
+        return record
+    return record_type(record)
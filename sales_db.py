@@ -1,6 +1,18 @@
+import os
 import json
 import random
 from datetime import datetime, timedelta
+from heapq import nlargest, nsmallest
+from itertools import islice
+
+from aggregates import Aggregates, close_month
+from changelog import ChangeLog
+from columnar import ColumnStore, TableView, and_masks
+from records import RecordView, view_rows, compact
+import snapshot
+from indexes import INDEXED_FIELDS, DATE_FIELDS, TableIndex, AccountIndex, LEAD_CHILD_TABLES, company_key
+from sqlite_backend import SQLiteBackend
+from text_index import TextIndex, FuzzyIndex
 
 # Comprehensive Mock CRM Database for Sales Data
 sales_data = {
@@ -580,92 +592,616 @@ sales_data = {
     }
 }
 
+CLOSED_STAGES = ("Closed Won", "Closed Lost")
+
+# Optional columnar storage - populated by enable_columnar_store()
+column_store = None
+
+def enable_columnar_store() -> ColumnStore:
+    """Move every table into a typed ColumnStore, leaving read-compatible views in sales_data"""
+    global column_store
+    if column_store is None:
+        column_store = ColumnStore.from_sales_data(sales_data)
+        sales_data.update(column_store.views())
+    return column_store
+
+def enable_compact_records(backend=None):
+    """Store the in-memory records as slotted Lead/Opportunity/... objects instead of dicts"""
+    backend = backend or _backend
+    backend.compact_records = True
+    for table, records in backend.data.items():
+        if not isinstance(records, TableView):
+            for record_id, record in records.items():
+                records[record_id] = compact(table, record)
+    return backend
+
+def get_column_table(table: str):
+    """Return the ColumnTable backing a table, or None when it is a plain dict"""
+    records = sales_data.get(table)
+    return records.table if isinstance(records, TableView) else None
+
+def save_snapshot(path: str):
+    """Write the columnar tables to a binary snapshot file (enables the column store if needed)"""
+    snapshot.save(enable_columnar_store(), path)
+
+def load_snapshot(path: str) -> ColumnStore:
+    """Replace the in-memory tables with a memory-mapped snapshot"""
+    global column_store
+    column_store = snapshot.load(path)
+    sales_data.update(column_store.views())
+    if isinstance(_backend, MemoryBackend):
+        _backend.rebuild_indexes()
+    _reset_derived()
+    return column_store
+
+def ordered_rows(rows, field: str, descending: bool = False, top: int = None):
+    """Sort ``(record_id, record)`` pairs by a field, missing values last and ties in table order
+
+    With ``top`` only that many rows are kept, using a bounded heap instead of a full sort.
+    """
+    def key(row):
+        value = row[1].get(field)
+        return (value is None) != descending, 0 if value is None else value
+    if top is None:
+        return sorted(rows, key=key, reverse=descending)
+    return (nlargest if descending else nsmallest)(top, rows, key=key)
+
+def _matches(record: dict, ranges: dict, exclude: dict, equals: dict) -> bool:
+    for field, value in equals.items():
+        if record.get(field) != value:
+            return False
+    for field, (lo, hi) in ranges.items():
+        value = record.get(field)
+        if value is None or (lo is not None and value < lo) or (hi is not None and value > hi):
+            return False
+    for field, values in exclude.items():
+        if record.get(field) in values:
+            return False
+    return True
+
+class MemoryBackend:
+    """Default backend - the sales_data dict of dicts, with hash indexes on the equality fields
+
+    Filters are ``**equals`` (falsy values are ignored, like the helpers'
+    optional arguments), ``ranges={field: (lo, hi)}`` with inclusive, optional
+    bounds, and ``exclude={field: values}``.
+    """
+
+    name = "memory"
+
+    def __init__(self, data: dict):
+        self.data = data
+        self.indexes = {}
+        # Store records as slotted Record objects instead of dicts (see enable_compact_records)
+        self.compact_records = False
+
+    def table_index(self, table: str) -> TableIndex:
+        """Return the secondary index for a table, building it on first use"""
+        index = self.indexes.get(table)
+        if index is None:
+            index = self.indexes[table] = TableIndex(INDEXED_FIELDS.get(table, ()), self.data[table],
+                                                     DATE_FIELDS.get(table, ()))
+        return index
+
+    def rebuild_indexes(self):
+        """Drop every index so the next lookup rebuilds it (use after bulk edits to sales_data)"""
+        self.indexes.clear()
+
+    def _column_table(self, table: str):
+        records = self.data[table]
+        return records.table if isinstance(records, TableView) else None
+
+    def _mask(self, column_table, ranges: dict, exclude: dict, equals: dict):
+        masks = [column_table.mask_all()]
+        masks += [column_table.mask_equals(field, value) for field, value in equals.items()]
+        masks += [column_table.mask_range(field, lo, hi) for field, (lo, hi) in ranges.items()]
+        masks += [column_table.mask_not_in(field, values) for field, values in exclude.items()]
+        return and_masks(*masks)
+
+    def _rows(self, table: str, ranges=None, exclude=None, equals=None):
+        """Iterate ``(record_id, record)`` pairs matching the filters"""
+        ranges, exclude = ranges or {}, exclude or {}
+        equals = {field: value for field, value in (equals or {}).items() if value}
+        records = self.data[table]
+        indexed = {field: value for field, value in equals.items() if field in INDEXED_FIELDS.get(table, ())}
+        dated = {field: bounds for field, bounds in ranges.items() if field in DATE_FIELDS.get(table, ())}
+        if indexed or dated:
+            record_ids = self.table_index(table).lookup(ranges=dated, **indexed)
+            rows = ((record_id, records[record_id]) for record_id in record_ids)
+            rest = {field: value for field, value in equals.items() if field not in indexed}
+            rest_ranges = {field: bounds for field, bounds in ranges.items() if field not in dated}
+            if not (rest or rest_ranges or exclude):
+                return rows
+            return (row for row in rows if _matches(row[1], rest_ranges, exclude, rest))
+        column_table = self._column_table(table)
+        if column_table is not None:
+            return column_table.select_rows(self._mask(column_table, ranges, exclude, equals))
+        if not (ranges or exclude or equals):
+            return iter(records.items())
+        return ((rid, rec) for rid, rec in records.items() if _matches(rec, ranges, exclude, equals))
+
+    def get(self, table: str, record_id: str):
+        return self.data[table].get(record_id)
+
+    def save(self, table: str, record_id: str, record: dict):
+        """Insert or replace a record; returns the previous version or None"""
+        records = self.data[table]
+        old = records.get(record_id)
+        records[record_id] = compact(table, record) if self.compact_records else record
+        index = self.indexes.get(table)
+        if index is not None:
+            if old is None:
+                index.add(record_id, record)
+            else:
+                index.update(record_id, old, record)
+        return old
+
+    def insert_many(self, table: str, items):
+        """Bulk-upsert ``(record_id, record)`` pairs; the table's index is rebuilt on next use"""
+        records = self.data.setdefault(table, {})
+        for record_id, record in items:
+            records[record_id] = compact(table, record) if self.compact_records else record
+        self.indexes.pop(table, None)
+
+    def update(self, table: str, record_id: str, **changes):
+        """Change some fields of a record; returns ``(old, new)``"""
+        old = self.data[table][record_id]
+        new = {**old, **changes}
+        self.save(table, record_id, new)
+        return old, new
+
+    def delete(self, table: str, record_id: str):
+        records = self.data[table]
+        old = records[record_id]
+        del records[record_id]
+        index = self.indexes.get(table)
+        if index is not None:
+            index.remove(record_id, old)
+        return old
+
+    def find(self, table: str, ranges=None, exclude=None, **equals) -> list:
+        """``(record_id, record)`` pairs matching every filter, in table order"""
+        return list(self._rows(table, ranges, exclude, equals))
+
+    def iterate(self, table: str, ranges=None, exclude=None, order_by: str = None, descending: bool = False,
+                limit: int = None, offset: int = 0, **equals):
+        """Lazily yield matching ``(record_id, record)`` pairs, optionally ordered and paged"""
+        stop = None if limit is None else offset + limit
+        rows = self._rows(table, ranges, exclude, equals)
+        if order_by is not None:
+            rows = ordered_rows(rows, order_by, descending, stop)
+        return islice(rows, offset, stop)
+
+    def data_version(self) -> int:
+        """Writes from outside this process (none for in-process dicts); in-process writes are in the change log"""
+        return 0
+
+    def count(self, table: str, ranges=None, exclude=None, **equals) -> int:
+        if not (ranges or exclude or any(equals.values())):
+            return len(self.data[table])
+        column_table = self._column_table(table)
+        if column_table is not None:
+            equals = {field: value for field, value in equals.items() if value}
+            return column_table.count(self._mask(column_table, ranges or {}, exclude or {}, equals))
+        return sum(1 for _ in self._rows(table, ranges, exclude, equals))
+
+    def totals(self, table: str, value_field: str, weight_field: str = None, group_by: str = None,
+               ranges=None, exclude=None, **equals) -> dict:
+        """``count``, ``value`` and ``weighted`` (value * weight) sums, optionally per group"""
+        column_table = self._column_table(table)
+        if column_table is not None:
+            equals = {field: value for field, value in equals.items() if value}
+            mask = self._mask(column_table, ranges or {}, exclude or {}, equals)
+            if group_by is not None:
+                return column_table.group_totals(group_by, value_field, weight_field, mask)
+            weighted = column_table.dot(value_field, weight_field, mask) if weight_field else 0
+            return {"count": column_table.count(mask), "value": column_table.sum(value_field, mask), "weighted": weighted}
+        groups = {}
+        for _, record in self._rows(table, ranges, exclude, equals):
+            key = record.get(group_by) if group_by is not None else None
+            entry = groups.get(key)
+            if entry is None:
+                entry = groups[key] = {"count": 0, "value": 0, "weighted": 0}
+            value = record[value_field]
+            entry["count"] += 1
+            entry["value"] += value
+            if weight_field:
+                entry["weighted"] += value * record[weight_field]
+        if group_by is not None:
+            return groups
+        return groups.get(None, {"count": 0, "value": 0, "weighted": 0})
+
+    def explain(self, table: str, ranges=None, exclude=None, aggregate: bool = False, **equals) -> str:
+        """Describe how these filters would be answered (``aggregate`` for ``count``/``totals``)"""
+        ranges, exclude = ranges or {}, exclude or {}
+        equals = {field: value for field, value in equals.items() if value}
+        column_table = self._column_table(table)
+        indexed = [field for field in equals if field in INDEXED_FIELDS.get(table, ())]
+        indexed += [field for field in ranges if field in DATE_FIELDS.get(table, ())]
+        if column_table is not None and (aggregate or not indexed):
+            return f"columnar masks over {table}"
+        residual = [field for field in list(equals) + list(ranges) + list(exclude) if field not in indexed]
+        plan = f"index lookup on {table}({', '.join(indexed)})" if indexed else f"full scan of {table}"
+        return plan + (f", filtering {', '.join(residual)} in the same pass" if residual else "")
+
+    def search(self, table: str, text: str, fields, limit: int = None, **equals) -> list:
+        """Case-insensitive substring search over the concatenated ``fields``"""
+        text = text.lower() if text else None
+        equals = {field: value.lower() for field, value in equals.items() if value}
+        results = []
+        for record_id, record in self.data[table].items():
+            if text and text not in " ".join(str(record.get(f, "")) for f in fields).lower():
+                continue
+            if any(str(record.get(f, "")).lower() != value for f, value in equals.items()):
+                continue
+            results.append((record_id, record))
+            if len(results) == limit:
+                break
+        return results
+
+# Active storage backend - the in-memory dict unless set_backend() (or SALES_DB_PATH) says otherwise
+_backend = MemoryBackend(sales_data)
+_change_listeners = []
+# Store and per-table versions, bumped by every write and by backend/snapshot swaps
+change_log = ChangeLog()
+
+def get_backend():
+    """Return the active storage backend"""
+    return _backend
+
+def set_backend(backend):
+    """Swap the storage backend used by the helpers and tools"""
+    global _backend
+    _backend = backend
+    _reset_derived()
+    return backend
+
+def use_sqlite(path: str, load_sample_data: bool = False):
+    """Switch to an SQLite file, optionally seeding it with the in-memory sample data"""
+    backend = SQLiteBackend(path)
+    if load_sample_data:
+        backend.load(sales_data)
+    return set_backend(backend)
+
+# Writes - always go through these so backend indexes and listeners stay consistent
+def add_change_listener(listener):
+    """Register listener(table, record_id, old_record, new_record), called after every write"""
+    _change_listeners.append(listener)
+
+def _notify(table: str, record_id: str, old: dict, new: dict):
+    change_log.record(table, record_id)
+    for listener in _change_listeners:
+        listener(table, record_id, old, new)
+
+def save_record(table: str, record_id: str, record: dict) -> dict:
+    """Insert or replace a record"""
+    old = _backend.save(table, record_id, record)
+    _notify(table, record_id, old, record)
+    return record
+
+def update_record(table: str, record_id: str, **changes) -> dict:
+    """Change some fields of an existing record"""
+    old, new = _backend.update(table, record_id, **changes)
+    _notify(table, record_id, old, new)
+    return new
+
+def delete_record(table: str, record_id: str) -> dict:
+    """Remove a record and return it"""
+    old = _backend.delete(table, record_id)
+    _notify(table, record_id, old, None)
+    return old
+
+def bulk_load(table: str, items):
+    """Bulk-upsert ``(record_id, record)`` pairs; bumps the table's version and rebuilds the derived structures"""
+    _backend.insert_many(table, items)
+    _reset_derived((table,))
+
+# Materialized pipeline totals - built on first use, then kept current by every write
+PIPELINE_GROUPINGS = (
+    (),
+    ("stage",),
+    ("owner",),
+    ("close_month",),
+    ("stage", "owner"),
+    ("stage", "close_month"),
+    ("stage", "owner", "close_month"),
+)
+_pipeline_aggregates = None
+
+def get_pipeline_aggregates() -> Aggregates:
+    """Opportunity count, value and weighted value per stage, owner and close month"""
+    global _pipeline_aggregates
+    if _pipeline_aggregates is None:
+        aggregates = Aggregates("value", "probability", PIPELINE_GROUPINGS, derived={"close_month": close_month})
+        _pipeline_aggregates = aggregates.load(record for _, record in _backend.find("opportunities"))
+    return _pipeline_aggregates
+
+def reset_aggregates():
+    """Drop the materialized totals so they are rebuilt (use after bulk edits that bypass save_record)"""
+    global _pipeline_aggregates
+    _pipeline_aggregates = None
+
+def _update_aggregates(table: str, record_id: str, old: dict, new: dict):
+    if table == "opportunities" and _pipeline_aggregates is not None:
+        _pipeline_aggregates.apply(old, new)
+
+add_change_listener(_update_aggregates)
+
+# Account join index - company -> customers / leads -> opportunities, tasks, activities
+ACCOUNT_TABLES = ("customers", "leads") + LEAD_CHILD_TABLES
+_account_index = None
+
+def get_account_index() -> AccountIndex:
+    """Join index over the account tables, built on first use and kept current by every write
+
+    Backends other than the in-memory one answer the join themselves, in their
+    own queries, so no table is loaded and other connections' writes are seen.
+    """
+    global _account_index
+    if not isinstance(_backend, MemoryBackend):
+        return _backend.account_index()
+    if _account_index is None:
+        index = AccountIndex()
+        for table in ACCOUNT_TABLES:
+            for record_id, record in _backend.find(table):
+                index.add(table, record_id, record)
+        _account_index = index
+    return _account_index
+
+def reset_account_index():
+    """Drop the account index so it is rebuilt (use after bulk edits that bypass save_record)"""
+    global _account_index
+    _account_index = None
+
+def _update_account_index(table: str, record_id: str, old: dict, new: dict):
+    if table in ACCOUNT_TABLES and _account_index is not None:
+        _account_index.apply(table, record_id, old, new)
+
+add_change_listener(_update_account_index)
+
+# Customer search index - tokens, prefixes and trigrams of the searchable fields
+CUSTOMER_SEARCH_FIELDS = {"name": 3, "contact": 2, "email": 1}
+_customer_search_index = None
+_customer_search_version = None
+
+def get_customer_search_index() -> TextIndex:
+    """Inverted index over customer names, contacts and emails, kept current by every write
+
+    Rebuilt when the backend's data version moves, i.e. after another
+    connection wrote to a shared database.
+    """
+    global _customer_search_index, _customer_search_version
+    version = _backend.data_version()
+    if _customer_search_index is None or version != _customer_search_version:
+        index = TextIndex(CUSTOMER_SEARCH_FIELDS)
+        for customer_id, customer in _backend.find("customers"):
+            index.add(customer_id, customer)
+        _customer_search_index, _customer_search_version = index, version
+    return _customer_search_index
+
+def reset_customer_search_index():
+    """Drop the customer search index so it is rebuilt (use after bulk edits that bypass save_record)"""
+    global _customer_search_index
+    _customer_search_index = None
+
+def _update_customer_search_index(table: str, record_id: str, old: dict, new: dict):
+    if table == "customers" and _customer_search_index is not None:
+        _customer_search_index.apply(record_id, old, new)
+
+add_change_listener(_update_customer_search_index)
+
+# Fuzzy customer resolver - customer names and contacts, lead companies and lead contacts,
+# each pointing at the normalized company key of the account they belong to
+_customer_resolver = None
+_customer_resolver_version = None
+
+def _resolver_aliases(table: str, record: dict) -> list:
+    if table == "customers":
+        company, names = record.get("name"), (record.get("name"), record.get("contact"))
+    else:
+        company, names = record.get("company"), (record.get("company"), record.get("name"))
+    key = company_key(company)
+    return [(company_key(name), key) for name in names if name] if key else []
+
+def get_customer_resolver() -> FuzzyIndex:
+    """Trigram index from names to company keys, kept current by every write
+
+    Like the customer search index, rebuilt when the backend's data version moves.
+    """
+    global _customer_resolver, _customer_resolver_version
+    version = _backend.data_version()
+    if _customer_resolver is None or version != _customer_resolver_version:
+        index = FuzzyIndex()
+        for table in ("customers", "leads"):
+            for _, record in _backend.find(table):
+                for alias, key in _resolver_aliases(table, record):
+                    index.add(alias, key)
+        _customer_resolver, _customer_resolver_version = index, version
+    return _customer_resolver
+
+def reset_customer_resolver():
+    """Drop the fuzzy resolver so it is rebuilt (use after bulk edits that bypass save_record)"""
+    global _customer_resolver
+    _customer_resolver = None
+
+def _update_customer_resolver(table: str, record_id: str, old: dict, new: dict):
+    if table in ("customers", "leads") and _customer_resolver is not None:
+        for alias, key in _resolver_aliases(table, old or {}):
+            _customer_resolver.remove(alias, key)
+        for alias, key in _resolver_aliases(table, new or {}):
+            _customer_resolver.add(alias, key)
+
+add_change_listener(_update_customer_resolver)
+
+# A fuzzy match only stands in for the customer asked for when it scores this high
+# and this far ahead of the next closest account
+RESOLVE_THRESHOLD = 0.85
+RESOLVE_MARGIN = 0.15
+
+def match_customers(text: str, limit: int = 3, threshold: float = 0.4) -> list:
+    """``(customer_id, score)`` for the customers whose name, contact or lead company/contact best match free text"""
+    if not text:
+        return []
+    if _backend.get("customers", text) is not None:
+        return [(text, 1.0)]
+    accounts = get_account_index()
+    resolver = get_customer_resolver()
+    key = company_key(text)
+    # Many close keys may belong to leads only; widen the lookup until enough map to customers
+    wanted = max(limit, 1) * 4
+    while True:
+        hits = resolver.lookup(key, wanted, threshold)
+        matches = {}
+        for hit_key, score in hits:
+            for customer_id in accounts.customer_ids(hit_key):
+                matches.setdefault(customer_id, score)
+        if len(matches) >= limit or len(hits) < wanted:
+            return list(matches.items())[:limit]
+        wanted *= 4
+
+def resolve_customers(text: str, limit: int = 3, threshold: float = 0.4) -> list:
+    """Candidate customer ids whose name, contact or lead company/contact best match free text"""
+    return [customer_id for customer_id, _ in match_customers(text, limit, threshold)]
+
+def resolve_customer(text: str, threshold: float = RESOLVE_THRESHOLD, margin: float = RESOLVE_MARGIN):
+    """The one customer id free text confidently names, or None when no match is close and unambiguous"""
+    if not text:
+        return None
+    if _backend.get("customers", text) is not None:
+        return text
+    hits = get_customer_resolver().lookup(company_key(text), 2, max(threshold - margin, 0.01))
+    if not hits or hits[0][1] < threshold:
+        return None
+    if len(hits) > 1 and hits[0][1] - hits[1][1] < margin:
+        return None
+    customer_ids = get_account_index().customer_ids(hits[0][0])
+    return customer_ids[0] if len(customer_ids) == 1 else None
+
+def get_version(table: str = None) -> int:
+    """Monotonic version of the whole store, or of one table"""
+    return change_log.version if table is None else change_log.table_version(table)
+
+def changes_since(version: int, tables=None):
+    """``(version, table, record_id)`` writes after ``version``; None if the log no longer reaches back"""
+    return change_log.since(version, tables)
+
+def _reset_derived(tables=None):
+    change_log.reset(sales_data if tables is None else tables)
+    reset_aggregates()
+    reset_account_index()
+    reset_customer_search_index()
+    reset_customer_resolver()
+
+def get_account_records(company: str, tables=LEAD_CHILD_TABLES) -> dict:
+    """Leads and their opportunities, tasks and activities for a company name (matched loosely)"""
+    index = get_account_index()
+    records = {"leads": view_rows("lead_id", ((lead_id, _backend.get("leads", lead_id)) for lead_id in index.lead_ids(company)))}
+    for table in tables:
+        rows = [(record_id, _backend.get(table, record_id)) for record_id in index.related(company, table)]
+        # Same shapes as the get_* helpers: opportunities gain their id, tasks and activities carry one
+        records[table] = view_rows("opportunity_id", rows) if table == "opportunities" else [record for _, record in rows]
+    return records
+
 # Helper functions for data access
 def get_leads_by_status(status=None, source=None, industry=None):
     """Get leads filtered by various criteria"""
-    filtered_leads = []
-    for lead_id, lead in sales_data["leads"].items():
-        if status and lead["status"] != status:
-            continue
-        if source and lead["source"] != source:
-            continue
-        if industry and lead["industry"] != industry:
-            continue
-        filtered_leads.append({"lead_id": lead_id, **lead})
-    return filtered_leads
+    return view_rows("lead_id", _backend.find("leads", status=status, source=source, industry=industry))
 
 def get_opportunities_by_stage(stage=None, owner=None):
     """Get opportunities filtered by stage or owner"""
-    filtered_opps = []
-    for opp_id, opp in sales_data["opportunities"].items():
-        if stage and opp["stage"] != stage:
-            continue
-        if owner and opp["owner"] != owner:
-            continue
-        filtered_opps.append({"opportunity_id": opp_id, **opp})
-    return filtered_opps
+    return view_rows("opportunity_id", _backend.find("opportunities", stage=stage, owner=owner))
 
 def get_tasks_by_status(status=None, assigned_to=None):
     """Get tasks filtered by status or assignee"""
-    filtered_tasks = []
-    for task_id, task in sales_data["tasks"].items():
-        if status and task["status"] != status:
-            continue
-        if assigned_to and task["assigned_to"] != assigned_to:
-            continue
-        filtered_tasks.append(task)
-    return filtered_tasks
+    return [task for _, task in _backend.find("tasks", status=status, assigned_to=assigned_to)]
 
 def get_customers_by_status(status=None, industry=None):
     """Get customers filtered by status or industry"""
-    filtered_customers = []
-    for cust_id, customer in sales_data["customers"].items():
-        if status and customer["status"] != status:
-            continue
-        if industry and customer["industry"] != industry:
-            continue
-        filtered_customers.append({"customer_id": cust_id, **customer})
-    return filtered_customers
+    return view_rows("customer_id", _backend.find("customers", status=status, industry=industry))
 
 def get_activities_by_lead(lead_id=None, activity_type=None):
     """Get activities filtered by lead or type"""
-    filtered_activities = []
-    for act_id, activity in sales_data["activities"].items():
-        if lead_id and activity["lead_id"] != lead_id:
-            continue
-        if activity_type and activity["type"] != activity_type:
-            continue
-        filtered_activities.append(activity)
-    return filtered_activities
-
-def get_customers_by_close_date(timeframe: str = "last_month") -> list:
-    """Get customers closed within a specific timeframe"""
-    from datetime import datetime, timedelta
-    
-    current_date = datetime.now()
-    filtered_customers = []
-    
-    for customer_id, customer in sales_data["customers"].items():
-        if "closed_date" not in customer:
-            continue
-            
-        close_date = datetime.strptime(customer["closed_date"], "%Y-%m-%d")
-        
-        if timeframe == "last_month":
-            last_month = current_date.replace(day=1) - timedelta(days=1)
-            last_month = last_month.replace(day=1)
-            if close_date >= last_month and close_date < current_date.replace(day=1):
-                filtered_customers.append({"customer_id": customer_id, **customer})
-        elif timeframe == "this_month":
-            if close_date >= current_date.replace(day=1):
-                filtered_customers.append({"customer_id": customer_id, **customer})
-        elif timeframe == "last_quarter":
-            quarter_start = current_date.replace(day=1)
-            while quarter_start.month % 3 != 1:
-                quarter_start = quarter_start.replace(day=1) - timedelta(days=1)
-                quarter_start = quarter_start.replace(day=1)
-            quarter_start = quarter_start.replace(month=quarter_start.month - 3)
-            if close_date >= quarter_start and close_date < current_date.replace(day=1):
-                filtered_customers.append({"customer_id": customer_id, **customer})
-    
-    return filtered_customers
+    return [activity for _, activity in _backend.find("activities", lead_id=lead_id, type=activity_type)]
+
+# Streaming variants - yield lazily, stop early, and page or order inside the backend
+def iter_records(table: str, id_field: str = None, order_by: str = None, descending: bool = False,
+                 limit: int = None, offset: int = 0, ranges=None, exclude=None, **equals):
+    """Lazily yield records matching the filters (as views carrying ``id_field`` when given)"""
+    rows = _backend.iterate(table, ranges, exclude, order_by, descending, limit, offset, **equals)
+    if id_field is None:
+        return (record for _, record in rows)
+    return (RecordView(id_field, record_id, record) for record_id, record in rows)
+
+def iter_leads_by_status(status=None, source=None, industry=None, order_by=None, descending=False, limit=None, offset=0):
+    """Stream leads filtered by various criteria"""
+    return iter_records("leads", "lead_id", order_by, descending, limit, offset,
+                        status=status, source=source, industry=industry)
+
+def iter_opportunities_by_stage(stage=None, owner=None, order_by=None, descending=False, limit=None, offset=0):
+    """Stream opportunities filtered by stage or owner"""
+    return iter_records("opportunities", "opportunity_id", order_by, descending, limit, offset, stage=stage, owner=owner)
+
+def iter_tasks_by_status(status=None, assigned_to=None, order_by=None, descending=False, limit=None, offset=0):
+    """Stream tasks filtered by status or assignee"""
+    return iter_records("tasks", None, order_by, descending, limit, offset, status=status, assigned_to=assigned_to)
+
+def iter_customers_by_status(status=None, industry=None, order_by=None, descending=False, limit=None, offset=0):
+    """Stream customers filtered by status or industry"""
+    return iter_records("customers", "customer_id", order_by, descending, limit, offset, status=status, industry=industry)
+
+def iter_activities_by_lead(lead_id=None, activity_type=None, order_by=None, descending=False, limit=None, offset=0):
+    """Stream activities filtered by lead or type"""
+    return iter_records("activities", None, order_by, descending, limit, offset, lead_id=lead_id, type=activity_type)
+
+def _month_start(day, months: int = 0):
+    """First day of the month ``months`` away from the month containing ``day``"""
+    year, month = divmod(day.year * 12 + day.month - 1 + months, 12)
+    return day.replace(year=year, month=month + 1, day=1)
+
+# Named timeframes as (first month, last month) offsets from the current month (or quarter/year start)
+TIMEFRAMES = {
+    "this_month": ("month", 0, 0),
+    "last_month": ("month", -1, -1),
+    "next_month": ("month", 1, 1),
+    "this_quarter": ("quarter", 0, 2),
+    "last_quarter": ("quarter", -3, -1),
+    "next_quarter": ("quarter", 3, 5),
+    "this_year": ("year", 0, 11),
+    "last_year": ("year", -12, -1),
+}
+
+def resolve_timeframe(timeframe: str = None, start_date: str = None, end_date: str = None, today=None):
+    """Resolve a named timeframe or explicit dates to inclusive ``(start, end)`` ISO date strings
+
+    Explicit ``start_date``/``end_date`` (YYYY-MM-DD) take precedence and may be
+    open-ended. Boundaries are computed once per call, never per row. Returns
+    None for an unknown timeframe name and raises ValueError for a bad date.
+    """
+    if start_date or end_date:
+        start = datetime.strptime(start_date, "%Y-%m-%d").date().isoformat() if start_date else None
+        end = datetime.strptime(end_date, "%Y-%m-%d").date().isoformat() if end_date else None
+        return start, end
+    if timeframe not in TIMEFRAMES:
+        return None
+    today = today or datetime.now().date()
+    unit, first, last = TIMEFRAMES[timeframe]
+    anchor = _month_start(today)
+    if unit == "quarter":
+        anchor = _month_start(anchor, -((anchor.month - 1) % 3))
+    elif unit == "year":
+        anchor = anchor.replace(month=1)
+    start = _month_start(anchor, first)
+    end = _month_start(anchor, last + 1) - timedelta(days=1)
+    return start.isoformat(), end.isoformat()
+
+def get_customers_by_close_date(timeframe: str = "last_month", start_date: str = None, end_date: str = None) -> list:
+    """Get customers closed within a named timeframe or an explicit date range"""
+    bounds = resolve_timeframe(timeframe, start_date, end_date)
+    if bounds is None:
+        return []
+    return view_rows("customer_id", _backend.find("customers", ranges={"closed_date": bounds}))
+
+if os.getenv("SALES_DB_PATH"):
+    use_sqlite(os.environ["SALES_DB_PATH"])
+elif os.getenv("SALES_DB_SNAPSHOT"):
+    load_snapshot(os.environ["SALES_DB_SNAPSHOT"])
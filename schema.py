@@ -0,0 +1,19 @@
+"""
+Field layout of the CRM tables, shared by the storage backends and record types.
+"""
+
+# Field order per table - matches the key order of the sales_data records
+TABLE_FIELDS = {
+    "leads": ("name", "company", "email", "phone", "status", "value", "source", "created",
+              "industry", "company_size", "location", "title", "notes"),
+    "opportunities": ("lead_id", "name", "stage", "value", "probability", "close_date", "owner",
+                      "created", "last_activity", "notes"),
+    "customers": ("name", "contact", "email", "phone", "status", "revenue", "onboarding_date",
+                  "closed_date", "industry", "company_size", "location", "account_manager",
+                  "last_activity", "notes"),
+    "tasks": ("task_id", "lead_id", "lead_name", "company", "task_type", "due_date", "status",
+              "notes", "assigned_to", "priority"),
+    "activities": ("activity_id", "lead_id", "type", "date", "duration", "notes", "outcome"),
+    "sales_team": ("name", "title", "email", "phone", "territory", "quota", "ytd_sales",
+                   "specialization"),
+}
@@ -0,0 +1,181 @@
+"""
+Binary, memory-mapped snapshots of a ColumnStore.
+
+A snapshot is one file: a magic tag, 8-byte aligned blocks holding the raw
+typed arrays (integers, day numbers, category codes) and string tables (an
+offsets array plus a UTF-8 blob) for ids and free text, then a JSON header
+describing every table and column, and finally the header's offset and length.
+``load`` maps the file read-only and wraps each block in a ``memoryview`` cast
+to its type, so opening a snapshot touches no row data: start-up cost is
+independent of dataset size, and every worker process mapping the same file
+shares the same physical pages. Columns are copied into private arrays only if
+they are written to.
+"""
+
+import json
+import mmap
+import sys
+from array import array
+from collections.abc import Sequence
+from itertools import compress
+
+from columnar import _MISSING, CategoryColumn, ColumnStore, ColumnTable, IntColumn, TextColumn, _COLUMN_TYPES
+
+MAGIC = b"CRMSNAP1"
+_ALIGN = 8
+
+
+class StringTable(Sequence):
+    """Read-only sequence of strings stored as UTF-8 bytes plus an offsets array"""
+
+    def __init__(self, offsets, blob, missing=()):
+        self.offsets = offsets
+        self.blob = blob
+        self.missing = set(missing)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, pos):
+        if isinstance(pos, slice):
+            return [self[i] for i in range(*pos.indices(len(self)))]
+        if pos < 0:
+            pos += len(self)
+        if self.missing and pos in self.missing:
+            return _MISSING
+        return str(self.blob[self.offsets[pos]:self.offsets[pos + 1]], "utf-8")
+
+    def __iter__(self):
+        blob, offsets, missing = self.blob, self.offsets, self.missing
+        for pos in range(len(offsets) - 1):
+            yield _MISSING if missing and pos in missing else str(blob[offsets[pos]:offsets[pos + 1]], "utf-8")
+
+
+class _Writer:
+    """Appends aligned blocks to the file and records where they landed"""
+
+    def __init__(self, f):
+        self.f = f
+        self.offset = f.tell()
+
+    def _pad(self):
+        padding = -self.offset % _ALIGN
+        if padding:
+            self.f.write(bytes(padding))
+            self.offset += padding
+
+    def block(self, data) -> dict:
+        """Write a bytes-like object (array, bytes, memoryview) as one block"""
+        self._pad()
+        data = memoryview(data).cast("B")
+        self.f.write(data)
+        start, self.offset = self.offset, self.offset + len(data)
+        return {"offset": start, "length": len(data)}
+
+    def strings(self, values) -> dict:
+        """Write a string table; missing values become empty strings listed in ``missing``"""
+        self._pad()
+        offsets = array("q", [0])
+        missing = []
+        start = self.offset
+        for pos, value in enumerate(values):
+            if value is _MISSING:
+                missing.append(pos)
+                value = ""
+            encoded = str(value).encode("utf-8")
+            self.f.write(encoded)
+            self.offset += len(encoded)
+            offsets.append(self.offset - start)
+        blob = {"offset": start, "length": self.offset - start}
+        return {"blob": blob, "offsets": self.block(offsets), "missing": missing}
+
+
+def save(store: ColumnStore, path: str):
+    """Write every table of ``store`` to a snapshot file, dropping deleted rows"""
+    tables = {}
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        writer = _Writer(f)
+        for name, table in store.tables.items():
+            live = table.live
+            compact = table.row_count != len(table.ids)
+            missing_at = _remap_missing(live) if compact else sorted
+            fields = []
+            for field in table.fields:
+                column = table.columns[field]
+                kind = next(k for k, cls in _COLUMN_TYPES.items() if type(column) is cls)
+                entry = {"name": field, "kind": kind}
+                if isinstance(column, IntColumn):
+                    values = array(column.typecode, compress(column.data, live)) if compact else column.data
+                    entry["data"] = writer.block(values)
+                    entry["missing"] = missing_at(column.missing)
+                elif isinstance(column, CategoryColumn):
+                    typecode = _codes_typecode(column)
+                    codes = array(typecode, compress(column.codes, live)) if compact else column.codes
+                    entry["data"] = writer.block(codes)
+                    entry["typecode"] = typecode
+                    entry["values"] = [None] + column.values[1:]
+                else:
+                    entry.update(writer.strings(compress(column.data, live) if compact else column.data))
+                fields.append(entry)
+            ids = compress(table.ids, live) if compact else table.ids
+            tables[name] = {"rows": table.row_count, "schema": table.schema, "ids": writer.strings(ids), "fields": fields}
+
+        header = json.dumps({"byteorder": sys.byteorder, "tables": tables}).encode("utf-8")
+        header_offset = f.tell()
+        f.write(header)
+        f.write(header_offset.to_bytes(8, "little"))
+        f.write(len(header).to_bytes(8, "little"))
+
+
+def _codes_typecode(column: CategoryColumn) -> str:
+    return column.codes.typecode if isinstance(column.codes, array) else column.codes.format
+
+
+def _remap_missing(live):
+    """Map slot positions to positions in the compacted (live-only) order"""
+    new_positions = {old: new for new, old in enumerate(compress(range(len(live)), live))}
+    return lambda positions: sorted(new_positions[p] for p in positions if p in new_positions)
+
+
+def load(path: str) -> ColumnStore:
+    """Memory-map a snapshot read-only and wrap it as a ColumnStore without copying row data"""
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if mm[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a CRM snapshot")
+    header_offset = int.from_bytes(mm[-16:-8], "little")
+    header = json.loads(mm[header_offset:header_offset + int.from_bytes(mm[-8:], "little")])
+    if header["byteorder"] != sys.byteorder:
+        raise ValueError(f"{path} was written on a {header['byteorder']}-endian machine")
+    view = memoryview(mm)
+
+    def block(ref, typecode="B"):
+        return view[ref["offset"]:ref["offset"] + ref["length"]].cast(typecode)
+
+    def strings(entry):
+        return StringTable(block(entry["offsets"], "q"), block(entry["blob"]), entry["missing"])
+
+    store = ColumnStore()
+    for name, meta in header["tables"].items():
+        table = ColumnTable(meta["schema"])
+        table.ids = strings(meta["ids"])
+        table.row_count = meta["rows"]
+        table.live = bytearray(b"\x01") * meta["rows"]
+        table._positions = None
+        for entry in meta["fields"]:
+            column = _COLUMN_TYPES[entry["kind"]]()
+            if isinstance(column, IntColumn):
+                column.data = block(entry["data"], column.typecode)
+                column.missing = set(entry["missing"])
+            elif isinstance(column, CategoryColumn):
+                column.codes = block(entry["data"], entry["typecode"])
+                column.values = [_MISSING] + entry["values"][1:]
+                column.lookup = {value: code for code, value in enumerate(column.values) if code}
+            elif isinstance(column, TextColumn):
+                column.data = strings(entry)
+            table.columns[entry["name"]] = column
+            table.fields.append(entry["name"])
+        store.tables[name] = table
+    store.mmap = mm
+    return store
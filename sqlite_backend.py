@@ -0,0 +1,263 @@
+"""
+SQLite storage backend for sales_db.
+
+Implements the same interface as ``sales_db.MemoryBackend`` on top of an SQLite
+file: one table per CRM table with typed columns, secondary indexes on the
+equality and date fields, WAL journaling and one connection per thread. Every
+query is a fixed, parameterized SQL string, so sqlite3's per-connection
+statement cache reuses the prepared statement on repeat calls, and filters and
+aggregates run inside SQLite instead of in Python. The account join
+(``account_index``) is answered the same way, per lookup, so it loads no table
+and sees writes from every connection.
+"""
+
+import json
+import sqlite3
+import threading
+
+from indexes import INDEXED_FIELDS, LEAD_CHILD_TABLES, company_key
+from schema import TABLE_FIELDS
+
+INTEGER_FIELDS = {"value", "probability", "revenue", "quota", "ytd_sales"}
+
+# Extra indexes beyond INDEXED_FIELDS: date ranges and join keys
+EXTRA_INDEXES = {
+    "leads": (("company",),),
+    "opportunities": (("close_date",), ("stage", "close_date")),
+    "customers": (("closed_date",), ("name",)),
+}
+
+
+class SQLiteBackend:
+    """sales_db backend storing the CRM tables in an SQLite file"""
+
+    name = "sqlite"
+
+    def __init__(self, path: str, cached_statements: int = 256):
+        self.path = path
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._version_lock = threading.Lock()
+        self._data_version = 0
+        self._account_index = SQLiteAccountIndex(self)
+        self.create_schema()
+
+    def connection(self) -> sqlite3.Connection:
+        """This thread's connection, opened on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, cached_statements=self.cached_statements)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            # Lets the account join match company names the way indexes.AccountIndex does
+            conn.create_function("company_key", 1, company_key, deterministic=True)
+            self._local.conn = conn
+        return conn
+
+    def data_version(self) -> int:
+        """Moves whenever another connection or process may have committed to the database
+
+        SQLite's ``PRAGMA data_version`` is private to each connection, so the
+        numbers of two threads cannot be compared; this counter is shared and
+        advances whenever any thread's connection reports a change (or is new).
+        """
+        seen = self.connection().execute("PRAGMA data_version").fetchone()[0]
+        with self._version_lock:
+            if getattr(self._local, "data_version", None) != seen:
+                self._local.data_version = seen
+                self._data_version += 1
+            return self._data_version
+
+    def account_index(self) -> "SQLiteAccountIndex":
+        """The company join, queried live (the in-memory AccountIndex would need every row loaded)"""
+        return self._account_index
+
+    def close(self):
+        """Close this thread's connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def create_schema(self):
+        conn = self.connection()
+        with conn:
+            for table, fields in TABLE_FIELDS.items():
+                columns = ", ".join(f'"{f}" {"INTEGER" if f in INTEGER_FIELDS else "TEXT"}' for f in fields)
+                conn.execute(f'CREATE TABLE IF NOT EXISTS "{table}" (id TEXT PRIMARY KEY, {columns}, extra TEXT)')
+                for columns in [(f,) for f in INDEXED_FIELDS.get(table, ())] + list(EXTRA_INDEXES.get(table, ())):
+                    name = f"idx_{table}_{'_'.join(columns)}"
+                    conn.execute(f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" ({", ".join(columns)})')
+
+    def load(self, data: dict):
+        """Bulk-insert a sales_data-shaped dict of dicts, one transaction per table"""
+        for table, records in data.items():
+            if table in TABLE_FIELDS:
+                self.insert_many(table, records.items())
+
+    def insert_many(self, table: str, items):
+        """Bulk-upsert ``(record_id, record)`` pairs in one transaction"""
+        with self.connection() as conn:
+            conn.executemany(self._upsert_sql(table), (self._to_row(table, rid, rec) for rid, rec in items))
+
+    # Row conversion
+    def _column(self, table: str, field: str) -> str:
+        if field not in TABLE_FIELDS[table]:
+            raise KeyError(f"Unknown field '{field}' for table '{table}'")
+        return f'"{field}"'
+
+    def _to_row(self, table: str, record_id: str, record: dict) -> tuple:
+        fields = TABLE_FIELDS[table]
+        extra = {k: v for k, v in record.items() if k not in fields}
+        return (record_id, *(record.get(f) for f in fields), json.dumps(extra) if extra else None)
+
+    def _to_record(self, table: str, row: tuple) -> dict:
+        record = {f: v for f, v in zip(TABLE_FIELDS[table], row[1:-1]) if v is not None}
+        if row[-1]:
+            record.update(json.loads(row[-1]))
+        return record
+
+    def _upsert_sql(self, table: str) -> str:
+        fields = TABLE_FIELDS[table]
+        columns = ", ".join(f'"{f}"' for f in fields)
+        updates = ", ".join(f'"{f}" = excluded."{f}"' for f in fields + ("extra",))
+        placeholders = ", ".join("?" * (len(fields) + 2))
+        return (f'INSERT INTO "{table}" (id, {columns}, extra) VALUES ({placeholders}) '
+                f'ON CONFLICT(id) DO UPDATE SET {updates}')
+
+    def _where(self, table: str, ranges=None, exclude=None, equals=None, nocase=False):
+        clauses, params = [], []
+        for field, value in (equals or {}).items():
+            if value:
+                clauses.append(f"{self._column(table, field)} = ?" + (" COLLATE NOCASE" if nocase else ""))
+                params.append(value)
+        for field, (lo, hi) in (ranges or {}).items():
+            column = self._column(table, field)
+            clauses.append(f"{column} IS NOT NULL")
+            if lo is not None:
+                clauses.append(f"{column} >= ?")
+                params.append(lo)
+            if hi is not None:
+                clauses.append(f"{column} <= ?")
+                params.append(hi)
+        for field, values in (exclude or {}).items():
+            values = list(values)
+            if values:
+                clauses.append(f"{self._column(table, field)} NOT IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    # Backend interface
+    def get(self, table: str, record_id: str):
+        row = self.connection().execute(f'SELECT * FROM "{table}" WHERE id = ?', (record_id,)).fetchone()
+        return None if row is None else self._to_record(table, row)
+
+    def save(self, table: str, record_id: str, record: dict):
+        """Insert or replace a record; returns the previous version or None"""
+        old = self.get(table, record_id)
+        with self.connection() as conn:
+            conn.execute(self._upsert_sql(table), self._to_row(table, record_id, record))
+        return old
+
+    def update(self, table: str, record_id: str, **changes):
+        """Change some fields of a record; returns ``(old, new)``"""
+        old = self.get(table, record_id)
+        if old is None:
+            raise KeyError(record_id)
+        new = {**old, **changes}
+        self.save(table, record_id, new)
+        return old, new
+
+    def delete(self, table: str, record_id: str):
+        old = self.get(table, record_id)
+        if old is None:
+            raise KeyError(record_id)
+        with self.connection() as conn:
+            conn.execute(f'DELETE FROM "{table}" WHERE id = ?', (record_id,))
+        return old
+
+    def find(self, table: str, ranges=None, exclude=None, **equals) -> list:
+        """``(record_id, record)`` pairs matching every filter, in insertion order"""
+        return list(self.iterate(table, ranges, exclude, **equals))
+
+    def iterate(self, table: str, ranges=None, exclude=None, order_by: str = None, descending: bool = False,
+                limit: int = None, offset: int = 0, **equals):
+        """Lazily yield matching ``(record_id, record)`` pairs; ordering and paging run in SQL"""
+        where, params = self._where(table, ranges, exclude, equals)
+        order = "rowid"
+        if order_by is not None:
+            column = self._column(table, order_by)
+            # Missing values last, ties in insertion order - same as the memory backend
+            order = f"{column} IS NULL, {column}{' DESC' if descending else ''}, rowid"
+        sql = f'SELECT * FROM "{table}"{where} ORDER BY {order}'
+        if limit is not None or offset:
+            sql += " LIMIT ? OFFSET ?"
+            params += [-1 if limit is None else limit, offset]
+        rows = self.connection().execute(sql, params)
+        return ((row[0], self._to_record(table, row)) for row in rows)
+
+    def count(self, table: str, ranges=None, exclude=None, **equals) -> int:
+        where, params = self._where(table, ranges, exclude, equals)
+        return self.connection().execute(f'SELECT COUNT(*) FROM "{table}"{where}', params).fetchone()[0]
+
+    def totals(self, table: str, value_field: str, weight_field: str = None, group_by: str = None,
+               ranges=None, exclude=None, **equals) -> dict:
+        """``count``, ``value`` and ``weighted`` (value * weight) sums, optionally per group"""
+        where, params = self._where(table, ranges, exclude, equals)
+        value = self._column(table, value_field)
+        weighted = f"COALESCE(SUM({value} * {self._column(table, weight_field)}), 0)" if weight_field else "0"
+        aggregates = f"COUNT(*), COALESCE(SUM({value}), 0), {weighted}"
+        conn = self.connection()
+        if group_by is None:
+            count, total, weight = conn.execute(f'SELECT {aggregates} FROM "{table}"{where}', params).fetchone()
+            return {"count": count, "value": total, "weighted": weight}
+        group = self._column(table, group_by)
+        rows = conn.execute(f'SELECT {group}, {aggregates} FROM "{table}"{where} '
+                            f'GROUP BY {group} ORDER BY MIN(rowid)', params)
+        return {key: {"count": count, "value": total, "weighted": weight} for key, count, total, weight in rows}
+
+    def explain(self, table: str, ranges=None, exclude=None, aggregate: bool = False, **equals) -> str:
+        """SQLite's query plan for these filters"""
+        where, params = self._where(table, ranges, exclude, equals)
+        rows = self.connection().execute(f'EXPLAIN QUERY PLAN SELECT * FROM "{table}"{where}', params)
+        return "; ".join(row[-1] for row in rows)
+
+    def search(self, table: str, text: str, fields, limit: int = None, **equals) -> list:
+        """Case-insensitive substring search over the concatenated ``fields``"""
+        where, params = self._where(table, equals=equals, nocase=True)
+        if text:
+            haystack = " || ' ' || ".join(f"COALESCE({self._column(table, f)}, '')" for f in fields)
+            where += (" AND " if where else " WHERE ") + f"instr(lower({haystack}), ?) > 0"
+            params.append(text.lower())
+        if limit is not None:
+            where += " ORDER BY rowid LIMIT ?"
+            params.append(limit)
+        else:
+            where += " ORDER BY rowid"
+        rows = self.connection().execute(f'SELECT * FROM "{table}"{where}', params)
+        return [(row[0], self._to_record(table, row)) for row in rows]
+
+
+class SQLiteAccountIndex:
+    """``indexes.AccountIndex`` lookups answered by SQL joins on normalized company names and lead ids"""
+
+    def __init__(self, backend: SQLiteBackend):
+        self.backend = backend
+
+    def _ids(self, sql: str, company) -> list:
+        return [row[0] for row in self.backend.connection().execute(sql, (company_key(company),))]
+
+    def customer_ids(self, company) -> list:
+        return self._ids('SELECT id FROM "customers" WHERE company_key(name) = ? ORDER BY rowid', company)
+
+    def lead_ids(self, company) -> list:
+        return self._ids('SELECT id FROM "leads" WHERE company_key(company) = ? ORDER BY rowid', company)
+
+    def related(self, company, table: str) -> list:
+        """Record ids in ``table`` belonging to the company's leads, grouped by lead"""
+        if table == "leads":
+            return self.lead_ids(company)
+        if table not in LEAD_CHILD_TABLES:
+            raise KeyError(table)
+        return self._ids(f'SELECT child.id FROM "{table}" AS child JOIN "leads" AS lead ON child.lead_id = lead.id '
+                         'WHERE company_key(lead.company) = ? ORDER BY lead.rowid, child.rowid', company)
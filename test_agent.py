@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Checks the agent's step logic against a scripted LLM client and a stub
+Cleanlab project (no network calls).
+"""
+
+import asyncio
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("openai")
+pytest.importorskip("cleanlab_codex")
+
+import backend
+from backend import AsyncSalesAgent, SalesAgent
+from validation_policy import ValidationPolicy
+
+class FakeCompletions:
+    """Plays back scripted replies: a final answer as text, a tool step as a list of (name, arguments)"""
+
+    def __init__(self, replies: list):
+        self.replies = list(replies)
+        self.requests = []
+
+    def create(self, stream=False, **kwargs):
+        self.requests.append({"stream": stream, **kwargs})
+        reply = self.replies.pop(0)
+        if stream:
+            return iter(_chunks(reply))
+        return SimpleNamespace(choices=[SimpleNamespace(message=_message(reply))])
+
+def _tool_calls(reply) -> list:
+    return [{"id": f"call{i}", "type": "function", "function": {"name": name, "arguments": arguments}}
+            for i, (name, arguments) in enumerate(reply)]
+
+def _message(reply):
+    if isinstance(reply, str):
+        return SimpleNamespace(role="assistant", content=reply, tool_calls=None)
+    calls = [SimpleNamespace(id=call["id"], type="function", function=SimpleNamespace(**call["function"]))
+             for call in _tool_calls(reply)]
+    return SimpleNamespace(role="assistant", content=None, tool_calls=calls)
+
+def _delta(content=None, tool_calls=None):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content, tool_calls=tool_calls))])
+
+def _chunks(reply) -> list:
+    """A reply as the API streams it: text in small pieces, each tool call's arguments split in two"""
+    if isinstance(reply, str):
+        return [_delta(reply[i:i + 4]) for i in range(0, len(reply), 4)]
+    chunks = []
+    for index, call in enumerate(_tool_calls(reply)):
+        arguments = call["function"]["arguments"]
+        half = len(arguments) // 2
+        chunks.append(_delta(tool_calls=[SimpleNamespace(index=index, id=call["id"], function=SimpleNamespace(
+            name=call["function"]["name"], arguments=arguments[:half]))]))
+        chunks.append(_delta(tool_calls=[SimpleNamespace(index=index, id=None, function=SimpleNamespace(
+            name=None, arguments=arguments[half:]))]))
+    return chunks
+
+class FakeAsyncCompletions(FakeCompletions):
+    """FakeCompletions behind the AsyncOpenAI interface"""
+
+    async def create(self, stream=False, **kwargs):
+        reply = super().create(stream=stream, **kwargs)
+        if not stream:
+            return reply
+
+        async def chunks():
+            for chunk in reply:
+                await asyncio.sleep(0)
+                yield chunk
+        return chunks()
+
+class StubProject:
+    """Cleanlab project stand-in: flags the responses (None for a tool step) that ``flags`` picks"""
+
+    def __init__(self, flags=lambda response: False, delay: float = 0.0):
+        self.flags = flags
+        self.delay = delay
+        self.validated = []
+
+    def validate(self, response, query, **kwargs):
+        time.sleep(self.delay)
+        self.validated.append(response)
+        flagged = self.flags(response)
+        return SimpleNamespace(should_guardrail=flagged, expert_answer="Checked answer" if flagged else None)
+
+def _call(name: str, **arguments):
+    return SimpleNamespace(id=f"call_{name}", type="function",
+                           function=SimpleNamespace(name=name, arguments=json.dumps(arguments)))
+
+def _fake_tools():
+    """Tools that sleep, fail or answer at once, with their own deadlines"""
+    def fake_sleep(seconds, value):
+        time.sleep(seconds)
+        return {"value": value}
+    def fake_fail():
+        raise ValueError("no such account")
+    return {"fake_slow": fake_sleep, "fake_quick": fake_sleep, "fake_fail": fake_fail}, \
+        {"fake_slow": 0.1, "fake_quick": 1.0}
+
+def _agent(replies: list, project=None, **policy) -> SalesAgent:
+    agent = SalesAgent("test-key", project, ValidationPolicy(**policy))
+    agent.llm_client = SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions(replies)))
+    return agent
+
+def test_gated_answer_not_streamed():
+    """An answer that must pass validation is held back; other answers stream as they arrive"""
+    project = StubProject(lambda response: "50%" in (response or ""))
+    agent = _agent(["We can offer 50% off.", "The pipeline is $1.4M."], project, sample_every=4)
+    deltas = []
+    _, _, content, result = agent.process_message("What discount can we offer TechCorp?", [], "t", deltas.append)
+    assert deltas == [] and content == "Checked answer" and result.should_guardrail
+    assert project.validated == ["We can offer 50% off."]
+
+    _, _, content, _ = agent.process_message("Show the pipeline", [], "t2", deltas.append)
+    assert "".join(deltas) == content == "The pipeline is $1.4M."
+
+    # Without Cleanlab nothing is validated, so nothing needs holding back
+    deltas.clear()
+    agent = _agent(["We can offer 10% off."])
+    agent.process_message("What discount can we offer TechCorp?", [], "t", deltas.append)
+    assert "".join(deltas) == "We can offer 10% off."
+
+def test_default_policy_streams_ordinary_answers():
+    """With Cleanlab configured and the default policy, only risky answers are held back"""
+    project = StubProject()
+    agent = _agent(["The pipeline is $1.4M.", "We can offer 10% off."], project)
+    deltas = []
+    assert not agent.holds_answer("Show the pipeline", [], "t")
+    _, _, content, result = agent.process_message("Show the pipeline", [], "t", deltas.append)
+    assert "".join(deltas) == content == "The pipeline is $1.4M." and result["validation"] == "async"
+
+    deltas.clear()
+    assert agent.holds_answer("What discount can we offer TechCorp?", [], "t")
+    _, _, content, _ = agent.process_message("What discount can we offer TechCorp?", [], "t", deltas.append)
+    assert deltas == [] and content == "We can offer 10% off."
+
+def test_stream_assembles_tool_calls():
+    """Tool-call fragments streamed interleaved and in pieces come back as whole calls, in index order"""
+    content, tool_calls = [], {}
+    deltas = []
+    fragment = lambda index, id=None, name=None, arguments=None: _delta(tool_calls=[SimpleNamespace(
+        index=index, id=id, function=SimpleNamespace(name=name, arguments=arguments))])
+    for chunk in [
+        _delta("Let me "), _delta("check."),
+        fragment(1, "call_b", "search_customers", '{"que'),
+        fragment(0, "call_a", "get_customer_", None),
+        SimpleNamespace(choices=[]),
+        fragment(0, None, "details", '{"customer_id": '),
+        fragment(1, None, None, 'ry": "tech"}'),
+        fragment(0, None, None, '"CUST001"}'),
+    ]:
+        SalesAgent._add_chunk(chunk, content, tool_calls, deltas.append)
+    message = SalesAgent._assemble_message(content, tool_calls)
+    assert message.content == "Let me check." and deltas == ["Let me ", "check."]
+    assert [(call.id, call.function.name, json.loads(call.function.arguments)) for call in message.tool_calls] == [
+        ("call_a", "get_customer_details", {"customer_id": "CUST001"}),
+        ("call_b", "search_customers", {"query": "tech"}),
+    ]
+    assert SalesAgent._assemble_message([], {}).tool_calls is None
+
+    # The same through stream_openai: the tool step is executed with the reassembled arguments
+    agent = _agent([[("get_customer_details", '{"customer_id": "CUST002"}')]])
+    result = agent.process_message("Tell me about CUST002", [], "t", on_delta=deltas.append)
+    assert result[1] and result[4][0]["arguments"] == {"customer_id": "CUST002"}
+
+def _tool_turn(agent, thread_id: str = "t"):
+    """One tool step and the final answer, the way the frontend drives a turn"""
+    history = []
+    agent.process_message("What are next steps with TechCorp?", history, thread_id)
+    _, _, content, _ = agent.process_message("What are next steps with TechCorp?", history, thread_id)
+    return history, content
+
+def test_background_validation_retracts():
+    """A tool step flagged in the background retracts the answer once the turn settles"""
+    project = StubProject(lambda response: response is None, delay=0.05)
+    agent = _agent([[("get_customer_details", '{"customer_id": "CUST001"}')], "TechCorp is ready to renew."],
+                   project, sample_every=1)
+    history, content = _tool_turn(agent)
+    assert content == "TechCorp is ready to renew."
+    retracted = agent.settle_validations(history, "t")
+    assert retracted is not None and retracted[0] == "Checked answer" and retracted[1].should_guardrail
+    # The final answer's own background validation may still be running
+    assert history[-1]["content"] == "Checked answer" and None in project.validated
+    assert agent.pending_validations.get("t") in (None, [])
+    # The flag is on record: the thread's next answers are validated before they are shown
+    assert agent.holds_answer("Show the pipeline", history, "t")
+
+def test_background_validation_settles():
+    """Unflagged validations settle quietly; slow ones stay pending past the timeout; skipped ones never run"""
+    project = StubProject(delay=0.3)
+    agent = _agent([[("get_customer_details", '{"customer_id": "CUST001"}')], "TechCorp is ready to renew."],
+                   project, sample_every=1)
+    history, content = _tool_turn(agent)
+    assert agent.settle_validations(history, "t", timeout=0.01) is None
+    assert len(agent.pending_validations["t"]) == 1
+    assert agent.settle_validations(history, "t") is None
+    assert history[-1]["content"] == content and not agent.pending_validations.get("t")
+
+    # By default the tool step is validated in the background too
+    project = StubProject()
+    agent = _agent([[("get_customer_details", '{"customer_id": "CUST001"}')], "TechCorp is ready to renew."], project)
+    history, _ = _tool_turn(agent)
+    assert agent.settle_validations(history, "t") is None and None in project.validated
+
+    # With sampling on, skipped steps never reach Cleanlab
+    project = StubProject()
+    agent = _agent([[("get_customer_details", '{"customer_id": "CUST001"}')], "TechCorp is ready to renew."],
+                   project, sample_every=2)
+    history, _ = _tool_turn(agent)
+    assert agent.settle_validations(history, "t") is None and None not in project.validated
+
+    # Without Cleanlab no background work is started for tool steps
+    agent = _agent([[("get_customer_details", '{"customer_id": "CUST001"}')], "TechCorp is ready to renew."],
+                   sample_every=1)
+    _tool_turn(agent)
+    assert not agent.pending_validations
+
+def test_execute_tools():
+    """Results keep the call order, each tool gets its own deadline, and failures become error payloads"""
+    functions, timeouts = _fake_tools()
+    backend.TOOL_FUNCTIONS.update(functions)
+    backend.TOOL_TIMEOUTS.update(timeouts)
+    try:
+        agent = _agent([])
+        started = time.monotonic()
+        results = agent.execute_tools([
+            _call("fake_quick", seconds=0.2, value="first"),
+            _call("fake_quick", seconds=0.0, value="second"),
+            _call("fake_slow", seconds=0.5, value="late"),
+            _call("fake_fail"),
+            _call("fake_missing"),
+        ])
+        elapsed = time.monotonic() - started
+        assert [name for name, _, _ in results] == ["fake_quick", "fake_quick", "fake_slow", "fake_fail", "fake_missing"]
+        assert [response for _, _, response in results[:2]] == [{"value": "first"}, {"value": "second"}]
+        assert results[0][1] == {"seconds": 0.2, "value": "first"}
+        assert results[2][2] == {"error": "Tool fake_slow timed out after 0.1s"}
+        assert results[3][2] == {"error": "Tool fake_fail failed: no such account"}
+        assert "error" in results[4][2]
+        # The tools ran side by side: the step took as long as the slowest one, not their sum
+        assert 0.2 <= elapsed < 0.45
+    finally:
+        for name in functions:
+            backend.TOOL_FUNCTIONS.pop(name)
+            backend.TOOL_TIMEOUTS.pop(name, None)
+
+def test_hung_tools_keep_their_own_threads():
+    """Tools stuck past their deadline do not use up the workers later steps need"""
+    released = threading.Event()
+    backend.TOOL_FUNCTIONS["fake_hang"] = lambda: released.wait(5) and {"value": "late"}
+    backend.TOOL_FUNCTIONS["fake_quick"] = lambda: {"value": "quick"}
+    backend.TOOL_TIMEOUTS.update({"fake_hang": 0.02, "fake_quick": 1.0})
+    try:
+        agent = _agent([])
+        for _ in range(10):
+            assert agent.execute_tools([_call("fake_hang")])[0][2] == {"error": "Tool fake_hang timed out after 0.02s"}
+        assert agent.execute_tools([_call("fake_quick")])[0][2] == {"value": "quick"}
+        results = asyncio.run(AsyncSalesAgent(agent).aexecute_tools([_call("fake_hang"), _call("fake_quick")]))
+        assert [response for _, _, response in results] == [
+            {"error": "Tool fake_hang timed out after 0.02s"}, {"value": "quick"}]
+    finally:
+        released.set()
+        for name in ("fake_hang", "fake_quick"):
+            backend.TOOL_FUNCTIONS.pop(name)
+            backend.TOOL_TIMEOUTS.pop(name)
+
+def test_async_agent_turn():
+    """The async wrapper streams the answer and runs a tool-call round trip on the event loop"""
+    project = StubProject()
+    agent = SalesAgent("test-key", project, ValidationPolicy(sample_every=1))
+    completions = FakeAsyncCompletions([
+        [("get_customer_details", '{"customer_id": "CUST001"}')],
+        "TechCorp has two open opportunities.",
+    ])
+    async_agent = AsyncSalesAgent(agent, SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+    assert not isinstance(async_agent, SalesAgent)
+    deltas = []
+    history, response, validation_result, steps = asyncio.run(
+        async_agent.run("What are next steps with TechCorp?", [agent.system_prompt], "t", on_delta=deltas.append))
+
+    assert "".join(deltas) == response == "TechCorp has two open opportunities."
+    assert [call["tool_name"] for step in steps for call in step] == ["get_customer_details"]
+    assert steps[0][0]["arguments"] == {"customer_id": "CUST001"} and steps[0][0]["response"]["customer_id"] == "CUST001"
+    assert [m["role"] for m in history] == ["system", "user", "assistant", "tool", "user", "assistant"]
+    assert history[2]["tool_calls"][0].function.name == "get_customer_details"
+    assert history[3]["tool_call_id"] == "call0" and json.loads(history[3]["content"])
+    assert all(request["stream"] for request in completions.requests)
+    # The tool step was validated in the background and settled before the turn returned
+    assert project.validated[0] is None and not async_agent.pending_validations.get("t")
+
+if __name__ == "__main__":
+    test_gated_answer_not_streamed()
+    test_default_policy_streams_ordinary_answers()
+    test_stream_assembles_tool_calls()
+    test_background_validation_retracts()
+    test_background_validation_settles()
+    test_execute_tools()
+    test_hung_tools_keep_their_own_threads()
+    test_async_agent_turn()
+    print("✅ Agent tests passed")
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Checks that the materialized pipeline totals match a backend aggregate query,
+before and after writes.
+"""
+
+import sales_db
+from sales_db import sales_data, CLOSED_STAGES
+
+def _check(aggregates, backend):
+    assert aggregates.totals() == backend.totals("opportunities", "value", "probability")
+    assert aggregates.totals(group_by="stage") == backend.totals("opportunities", "value", "probability", group_by="stage")
+    assert (aggregates.totals(group_by="stage", owner="Maria Garcia", exclude={"stage": CLOSED_STAGES})
+            == backend.totals("opportunities", "value", "probability", group_by="stage",
+                              owner="Maria Garcia", exclude={"stage": CLOSED_STAGES}))
+    assert (aggregates.totals(within={"close_month": ["2024-02", "2024-03"]})
+            == backend.totals("opportunities", "value", "probability", ranges={"close_date": ("2024-02-01", "2024-03-31")}))
+
+def test_aggregates_follow_writes():
+    """Inserts, updates and deletes through sales_db keep the totals exact"""
+    backend = sales_db.get_backend()
+    aggregates = sales_db.get_pipeline_aggregates()
+    _check(aggregates, backend)
+    try:
+        sales_db.save_record("opportunities", "OPP_TEST", {**sales_data["opportunities"]["OPP001"], "owner": "Maria Garcia"})
+        sales_db.update_record("opportunities", "OPP_TEST", stage="Closed Won", close_date="2024-03-05", value=1000)
+        _check(aggregates, backend)
+    finally:
+        sales_db.delete_record("opportunities", "OPP_TEST")
+    _check(aggregates, backend)
+    assert sales_db.get_pipeline_aggregates() is aggregates
+
+if __name__ == "__main__":
+    test_aggregates_follow_writes()
+    print("✅ Aggregate tests passed")
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Checks the store/table version counters and the bounded change log.
+"""
+
+import sales_db
+from changelog import ChangeLog
+
+def test_versions_follow_writes():
+    """Writes bump the store and table versions and are listed by changes_since"""
+    start = sales_db.get_version()
+    customers = sales_db.get_version("customers")
+    sales_db.update_record("leads", "LEAD001", notes=sales_db.sales_data["leads"]["LEAD001"]["notes"])
+    assert sales_db.get_version() == sales_db.get_version("leads") == start + 1
+    assert sales_db.get_version("customers") == customers
+    assert sales_db.changes_since(start) == [(start + 1, "leads", "LEAD001")]
+    assert sales_db.changes_since(start, ("customers",)) == []
+
+def test_log_truncation_and_reset():
+    """Callers that fell behind the ring buffer, or a wholesale reset, get None"""
+    log = ChangeLog(capacity=2)
+    for record_id in ("A", "B", "C"):
+        log.record("leads", record_id)
+    assert log.since(0) is None
+    assert log.since(1) == [(2, "leads", "B"), (3, "leads", "C")]
+    assert log.changed(2, ("leads",)) and not log.changed(3)
+
+    log.reset(("leads", "customers"))
+    assert log.since(3) is None and log.since(4) == []
+    assert log.table_version("customers") == 4
+
+if __name__ == "__main__":
+    test_versions_follow_writes()
+    test_log_truncation_and_reset()
+    print("✅ Change log tests passed")
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Checks that the columnar store reads back exactly like the dict tables
+and that its vectorized filters and sums match plain Python loops.
+"""
+
+import os
+import tempfile
+
+import pytest
+
+import snapshot
+from columnar import ColumnStore, TableView, and_masks
+from sales_db import sales_data
+
+def test_views_round_trip():
+    """Every table read through a TableView equals the original dict of dicts"""
+    store = ColumnStore.from_sales_data(sales_data)
+    for name, view in store.views().items():
+        assert isinstance(view, TableView)
+        assert dict(view) == sales_data[name]
+        assert list(view) == list(sales_data[name])
+
+def test_vectorized_filters_match_loops():
+    """Masks, sums and group totals agree with the row-by-row equivalents"""
+    table = ColumnStore.from_sales_data(sales_data).table("opportunities")
+    opps = sales_data["opportunities"]
+
+    mask = and_masks(table.mask_equals("owner", "Alex Rodriguez"), table.mask_range("value", 40000, 150000))
+    expected = [oid for oid, o in opps.items() if o["owner"] == "Alex Rodriguez" and 40000 <= o["value"] <= 150000]
+    assert table.select_ids(mask) == expected
+    assert table.sum("value", mask) == sum(opps[oid]["value"] for oid in expected)
+    assert table.dot("value", "probability") == sum(o["value"] * o["probability"] for o in opps.values())
+
+    stages = table.group_totals("stage", "value", "probability")
+    for stage, totals in stages.items():
+        rows = [o for o in opps.values() if o["stage"] == stage]
+        assert totals["count"] == len(rows)
+        assert totals["value"] == sum(o["value"] for o in rows)
+
+def test_updates_and_deletes():
+    """Writes through the view are visible to both reads and masks"""
+    store = ColumnStore.from_sales_data(sales_data)
+    view = store.views()["opportunities"]
+    table = store.table("opportunities")
+
+    view["OPP001"] = {**view["OPP001"], "stage": "Closed Won"}
+    assert view["OPP001"]["stage"] == "Closed Won"
+    assert "OPP001" in table.select_ids(table.mask_equals("stage", "Closed Won"))
+
+    del view["OPP001"]
+    assert "OPP001" not in view
+    assert len(view) == len(sales_data["opportunities"]) - 1
+    assert "OPP001" not in table.select_ids(table.mask_all())
+
+def test_typed_columns_reject_bad_values():
+    """None in a typed field is stored as missing, fractions are rejected, grouping needs a category field"""
+    table = ColumnStore().table("opportunities")
+    table.upsert("OPP1", {"stage": "Proposal", "value": None, "close_date": None, "probability": 50.0})
+    assert table.get("OPP1") == {"stage": "Proposal", "probability": 50}
+    assert table.sum("value") == 0 and table.select_ids(table.mask_range("close_date", "2024-01-01")) == []
+    for bad in ({"value": 1000.5}, {"close_date": 739000.5}):
+        with pytest.raises(ValueError):
+            table.upsert("OPP2", {"stage": "Proposal", **bad})
+        assert len(table) == 1 and table.get("OPP2") is None
+    assert table.group_totals("stage", "value") == {"Proposal": {"count": 1, "value": 0, "weighted": 0}}
+    with pytest.raises(TypeError):
+        table.group_totals("value", "probability")
+
+def test_snapshot_round_trip():
+    """A memory-mapped snapshot reads back the same records and copies columns on write"""
+    store = ColumnStore.from_sales_data(sales_data)
+    del store.views()["leads"]["LEAD002"]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "crm.snap")
+        snapshot.save(store, path)
+        views = snapshot.load(path).views()
+        assert dict(views["leads"]) == {k: v for k, v in sales_data["leads"].items() if k != "LEAD002"}
+        assert dict(views["opportunities"]) == sales_data["opportunities"]
+
+        views["opportunities"]["OPP001"] = {**views["opportunities"]["OPP001"], "value": 1}
+        views["opportunities"]["OPP_NEW"] = dict(sales_data["opportunities"]["OPP002"])
+        assert views["opportunities"]["OPP001"]["value"] == 1
+        assert views["opportunities"]["OPP_NEW"] == sales_data["opportunities"]["OPP002"]
+
+if __name__ == "__main__":
+    test_views_round_trip()
+    test_vectorized_filters_match_loops()
+    test_updates_and_deletes()
+    test_typed_columns_reject_bad_values()
+    test_snapshot_round_trip()
+    print("✅ Columnar store tests passed")
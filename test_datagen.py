@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Checks the generated dataset (determinism, referential integrity, streaming)
+and that bulk loads of it reach the tools, caches and versions.
+"""
+
+import itertools
+import os
+import tempfile
+import types
+from datetime import date
+
+import sales_db
+from datagen import build_sales_data, iter_records, load_into, read_jsonl, write_jsonl
+from tools import TOOL_FUNCTIONS
+
+AS_OF = date(2025, 6, 30)
+
+def test_same_seed_same_data():
+    """The same seed and as_of date produce identical data; another seed does not"""
+    data = build_sales_data(300, seed=7, as_of=AS_OF)
+    assert data == build_sales_data(300, seed=7, as_of=AS_OF)
+    assert data != build_sales_data(300, seed=8, as_of=AS_OF)
+    assert len(data["opportunities"]) == 300
+
+def test_referential_integrity():
+    """Every child row points at an emitted lead, owners are on the team, customers are converted leads"""
+    data = build_sales_data(500, seed=3, as_of=AS_OF)
+    companies = {lead["company"] for lead in data["leads"].values()}
+    for table in ("opportunities", "tasks", "activities"):
+        assert data[table] and all(record["lead_id"] in data["leads"] for record in data[table].values())
+    team = set(data["sales_team"])
+    assert {opp["owner"] for opp in data["opportunities"].values()} <= team
+    assert {task["assigned_to"] for task in data["tasks"].values()} <= team
+    assert {customer["account_manager"] for customer in data["customers"].values()} <= team
+    assert data["customers"] and all(customer["name"] in companies for customer in data["customers"].values())
+    won = {data["leads"][opp["lead_id"]]["company"] for opp in data["opportunities"].values()
+           if opp["stage"] == "Closed Won"}
+    assert {customer["name"] for customer in data["customers"].values()} == won
+    # History stays on or before as_of
+    assert all(opp["created"] <= AS_OF.isoformat() for opp in data["opportunities"].values())
+    assert all(customer["closed_date"] <= AS_OF.isoformat() for customer in data["customers"].values())
+
+def test_streaming_generator():
+    """Records stream lazily and survive a JSON Lines round trip unchanged"""
+    records = iter_records(1_000_000, seed=5, as_of=AS_OF)
+    assert isinstance(records, types.GeneratorType)
+    # A million opportunities, but only the head is generated: the 400-rep team, then the first leads
+    head = list(itertools.islice(records, 450))
+    assert [table for table, _, _ in head[:400]] == ["sales_team"] * 400 and head[400][0] == "leads"
+
+    records = list(iter_records(100, seed=5, as_of=AS_OF))
+    handle, path = tempfile.mkstemp(suffix=".jsonl")
+    os.close(handle)
+    try:
+        assert write_jsonl(path, iter(records)) == len(records)
+        assert list(read_jsonl(path)) == records
+    finally:
+        os.remove(path)
+
+def test_analytics_after_bulk_load():
+    """A bulk load bumps the data version, so cached and derived results see the new rows"""
+    previous = sales_db.get_backend()
+    try:
+        backend = sales_db.set_backend(sales_db.MemoryBackend({table: {} for table in sales_db.sales_data}))
+        empty = TOOL_FUNCTIONS["get_sales_analytics"]()
+        version = sales_db.get_version()
+
+        load_into(backend, iter_records(200, as_of=AS_OF), batch_size=50)
+        assert sales_db.get_version("opportunities") > version
+        analytics = TOOL_FUNCTIONS["get_sales_analytics"]()
+        assert empty["total_opportunities"] == 0
+        assert analytics["total_leads"] == backend.count("leads")
+        assert analytics["total_opportunities"] == backend.count("opportunities") == 200
+        assert analytics["total_pipeline_value"] == backend.totals("opportunities", "value")["value"]
+    finally:
+        sales_db.set_backend(previous)
+
+if __name__ == "__main__":
+    test_same_seed_same_data()
+    test_referential_integrity()
+    test_streaming_generator()
+    test_analytics_after_bulk_load()
+    print("✅ Datagen tests passed")
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Checks token-budgeted history compaction.
+"""
+
+import json
+
+from history_manager import HistoryManager, history_tokens, split_turns
+
+SYSTEM = {"role": "system", "content": "You are AgentForce."}
+
+def _turn(n: int, rows: int = 50) -> list:
+    """One agent turn: question, tool call, tool result, repeated question, answer"""
+    call = {"id": f"call{n}", "type": "function", "function": {"name": "search_customers", "arguments": "{}"}}
+    result = {"query": f"q{n}", "results": {"columns": ["id", "name"], "rows": [[i, "x" * 20] for i in range(rows)]}, "total_count": rows}
+    return [
+        {"role": "user", "content": f"question {n}"},
+        {"role": "assistant", "content": None, "tool_calls": [call]},
+        {"role": "tool", "tool_call_id": f"call{n}", "content": json.dumps(result, separators=(",", ":"))},
+        {"role": "user", "content": f"question {n}"},
+        {"role": "assistant", "content": f"answer {n}", "tool_calls": None},
+    ]
+
+def _pairing_valid(history: list) -> bool:
+    calls = {call["id"] for m in history for call in m.get("tool_calls") or ()}
+    results = {m["tool_call_id"] for m in history if m.get("role") == "tool"}
+    return calls == results
+
+def test_old_tool_results_summarized_first():
+    """Older tool results are summarized before anything is removed; recent turns stay intact"""
+    history = [SYSTEM] + [m for n in range(4) for m in _turn(n)]
+    recent = _turn(3)
+    manager = HistoryManager(budget=1500, keep_turns=1)
+    report = manager.compact(history, "t")
+    assert report["summarized"] >= 1 and report["dropped"] == 0
+    assert report["tokens_after"] <= 1500 and report["tokens_saved"] == report["tokens_before"] - report["tokens_after"]
+    assert history[0] == SYSTEM and history[-5:] == recent
+    summary = json.loads(history[3]["content"])
+    assert summary["compacted"] and summary["summary"]["results"] == "50 rows"
+    assert _pairing_valid(history) and len(split_turns(history)[1]) == 4
+
+def test_collapse_then_drop_within_budget():
+    """Under a tight budget old turns collapse to question and answer, then the oldest are dropped"""
+    history = [SYSTEM] + [m for n in range(6) for m in _turn(n, rows=100)]
+    manager = HistoryManager(budget=780, keep_turns=1)
+    report = manager.compact(history, "t")
+    assert report["tokens_after"] <= 780 and history_tokens(history) == report["tokens_after"]
+    assert report["collapsed"] == 5 and report["dropped"] == 4
+    assert _pairing_valid(history) and history[-1]["content"] == "answer 5"
+
+    again = manager.compact(history, "t")
+    assert again["tokens_saved"] == 0 and again["total_tokens_saved"] == report["tokens_saved"]
+    assert manager.report("t")["total_tokens_saved"] == report["tokens_saved"]
+
+def test_recent_turns_kept_over_budget():
+    """When the protected turns alone exceed the budget, only older turns are removed"""
+    history = [SYSTEM] + [m for n in range(4) for m in _turn(n)]
+    recent = history[-10:]
+    report = HistoryManager(budget=100, keep_turns=2).compact(history, "t")
+    assert report["dropped"] == 2 and report["tokens_after"] > 100
+    assert history == [SYSTEM] + recent and _pairing_valid(history)
+
+if __name__ == "__main__":
+    test_old_tool_results_summarized_first()
+    test_collapse_then_drop_within_budget()
+    test_recent_turns_kept_over_budget()
+    print("✅ History manager tests passed")
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Checks that the indexed sales_db helpers return exactly what a full scan
+would, and that the indexes follow inserts, updates and deletes.
+"""
+
+from datetime import date
+
+import sales_db
+from sales_db import sales_data
+
+def _scan(table, **filters):
+    return [record_id for record_id, record in sales_data[table].items()
+            if all(not value or record.get(field) == value for field, value in filters.items())]
+
+def test_helpers_match_full_scan():
+    """Single- and multi-filter lookups agree with a row-by-row scan, in table order"""
+    leads = sales_db.get_leads_by_status(status="Qualified", source="Website")
+    assert [l["lead_id"] for l in leads] == _scan("leads", status="Qualified", source="Website")
+    assert len(sales_db.get_leads_by_status()) == len(sales_data["leads"])
+
+    opps = sales_db.get_opportunities_by_stage(owner="Maria Garcia")
+    assert [o["opportunity_id"] for o in opps] == _scan("opportunities", owner="Maria Garcia")
+
+    tasks = sales_db.get_tasks_by_status(status="Pending", assigned_to="Alex Rodriguez")
+    assert [t["task_id"] for t in tasks] == _scan("tasks", status="Pending", assigned_to="Alex Rodriguez")
+
+    activities = sales_db.get_activities_by_lead(lead_id="LEAD001")
+    assert [a["activity_id"] for a in activities] == _scan("activities", lead_id="LEAD001")
+
+    assert sales_db.get_customers_by_status(status="Active", industry="No Such Industry") == []
+
+def test_indexes_follow_writes():
+    """Records written through sales_db show up in, move between and leave the indexes"""
+    sales_db.get_opportunities_by_stage()  # make sure the index is built
+    record = {**sales_data["opportunities"]["OPP001"], "stage": "Discovery"}
+    try:
+        sales_db.save_record("opportunities", "OPP_TEST", record)
+        assert "OPP_TEST" in [o["opportunity_id"] for o in sales_db.get_opportunities_by_stage("Discovery")]
+
+        sales_db.update_record("opportunities", "OPP_TEST", stage="Proposal")
+        assert "OPP_TEST" not in [o["opportunity_id"] for o in sales_db.get_opportunities_by_stage("Discovery")]
+        assert "OPP_TEST" in [o["opportunity_id"] for o in sales_db.get_opportunities_by_stage("Proposal")]
+    finally:
+        sales_db.delete_record("opportunities", "OPP_TEST")
+    assert "OPP_TEST" not in [o["opportunity_id"] for o in sales_db.get_opportunities_by_stage()]
+
+def test_date_ranges_and_timeframes():
+    """Date-index range lookups match string comparisons; named timeframes resolve to calendar periods"""
+    backend = sales_db.get_backend()
+    found = [oid for oid, _ in backend.find("opportunities", ranges={"close_date": ("2024-02-01", "2024-03-15")})]
+    assert found == [oid for oid, o in sales_data["opportunities"].items() if "2024-02-01" <= o["close_date"] <= "2024-03-15"]
+
+    today = date(2025, 2, 14)
+    assert sales_db.resolve_timeframe("last_month", today=today) == ("2025-01-01", "2025-01-31")
+    assert sales_db.resolve_timeframe("next_month", today=today) == ("2025-03-01", "2025-03-31")
+    assert sales_db.resolve_timeframe("last_quarter", today=today) == ("2024-10-01", "2024-12-31")
+    assert sales_db.resolve_timeframe("last_month", start_date="2024-01-01") == ("2024-01-01", None)
+    assert sales_db.resolve_timeframe("someday") is None
+
+def test_account_index():
+    """The join index finds an account's records regardless of case, punctuation and legal suffix"""
+    leads = sales_data["leads"]
+    for customer in sales_data["customers"].values():
+        expected = [oid for oid, opp in sales_data["opportunities"].items() if leads[opp["lead_id"]]["company"] == customer["name"]]
+        assert sales_db.get_account_index().related(customer["name"], "opportunities") == expected
+
+    account = sales_db.get_account_records("financial services, INC.")
+    assert [l["company"] for l in account["leads"]] == ["Financial Services Inc"]
+    assert all(t["lead_id"] == account["leads"][0]["lead_id"] for t in account["tasks"])
+
+    record = {**sales_data["opportunities"]["OPP001"], "lead_id": account["leads"][0]["lead_id"]}
+    try:
+        sales_db.save_record("opportunities", "OPP_TEST", record)
+        assert "OPP_TEST" in sales_db.get_account_index().related("Financial Services", "opportunities")
+    finally:
+        sales_db.delete_record("opportunities", "OPP_TEST")
+    assert "OPP_TEST" not in sales_db.get_account_index().related("Financial Services", "opportunities")
+
+def test_customer_search_index():
+    """Token, prefix and infix matches are found and ranked; writes update the index"""
+    index = sales_db.get_customer_search_index()
+    assert index.search("tech") == ["CUST003", "CUST009"]  # exact token before infix
+    assert index.search("manufact solutions") == ["CUST005"]
+    assert index.search("emma@futuretech") == ["CUST003"]
+    assert index.search("solutions", limit=2) == ["CUST001", "CUST005"]
+
+    try:
+        sales_db.save_record("customers", "CUST_TEST", {**sales_data["customers"]["CUST001"], "name": "Zyxwv Labs"})
+        assert index.search("yxw") == ["CUST_TEST"]
+        sales_db.update_record("customers", "CUST_TEST", name="Other Labs")
+        assert index.search("zyxwv") == []
+    finally:
+        sales_db.delete_record("customers", "CUST_TEST")
+    assert index.search("labs") == []
+
+def test_customer_resolver():
+    """Names, contacts and misspellings resolve to customer ids and follow writes"""
+    assert sales_db.resolve_customers("CUST002") == ["CUST002"]
+    assert sales_db.resolve_customers("futur tek")[0] == "CUST003"
+    assert sales_db.resolve_customers("Innovaton Corporation")[0] == "CUST002"
+    assert sales_db.resolve_customers("qqqqqq") == []
+
+    try:
+        sales_db.save_record("customers", "CUST_TEST", {**sales_data["customers"]["CUST001"], "name": "Zyxwv Labs"})
+        assert sales_db.resolve_customers("zyxwv lab") == ["CUST_TEST"]
+    finally:
+        sales_db.delete_record("customers", "CUST_TEST")
+    assert sales_db.resolve_customers("zyxwv lab") == []
+
+def test_confident_resolution():
+    """Only close, unambiguous matches are substituted; the rest come back as candidates"""
+    assert sales_db.resolve_customer("Healthcare System") == "CUST004"
+    assert sales_db.resolve_customer("Enterprise Solutions Ltd") == "CUST001"
+    assert sales_db.resolve_customer("Future Systems") is None
+    assert sales_db.resolve_customer("Global Systems") is None
+    # The best key for "Global Systems" belongs to a lead; the customer behind the next one is still found
+    assert [customer_id for customer_id, _ in sales_db.match_customers("Global Systems", limit=1)] == ["CUST004"]
+
+    from tools import RAW_TOOL_FUNCTIONS
+    details = RAW_TOOL_FUNCTIONS["get_customer_details"]("Future Systems")
+    assert "customer" not in details
+    assert {"CUST003", "CUST004"} <= {candidate["customer_id"] for candidate in details["candidates"]}
+    batch = RAW_TOOL_FUNCTIONS["get_customer_details"](customer_ids=["Healthcare System", "Future Systems"])
+    assert batch["resolved"] == {"Healthcare System": "CUST004"} and "Future Systems" in batch["unresolved"]
+
+if __name__ == "__main__":
+    test_helpers_match_full_scan()
+    test_indexes_follow_writes()
+    test_date_ranges_and_timeframes()
+    test_account_index()
+    test_customer_search_index()
+    test_customer_resolver()
+    test_confident_resolution()
+    print("✅ Index tests passed")
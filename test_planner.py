@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Checks that Query results match the backend and that the planner picks the
+materialized aggregates, the indexes or a scan as expected.
+"""
+
+from planner import Query
+from sales_db import sales_data, get_backend, CLOSED_STAGES
+
+def test_query_results():
+    """Chained predicates, ranges and exclusions return what a row-by-row filter would"""
+    base = Query("opportunities").where(owner="Maria Garcia")
+    active = base.excluding("stage", CLOSED_STAGES).between("value", 50000)
+    expected = [o for o in sales_data["opportunities"].values()
+                if o["owner"] == "Maria Garcia" and o["stage"] not in CLOSED_STAGES and o["value"] >= 50000]
+    assert active.records() == expected
+    assert active.count() == len(expected)
+    assert base.ranges == {} and base.excluded == {}  # chaining never mutates
+
+    narrowed = Query("opportunities").between("close_date", "2024-01-01", "2024-06-30").between("close_date", "2024-03-01")
+    assert narrowed.ranges["close_date"] == ("2024-03-01", "2024-06-30")
+
+    top = Query("opportunities").order_by("value", descending=True).limit(3).views("opportunity_id")
+    assert [o["value"] for o in top] == sorted((o["value"] for o in sales_data["opportunities"].values()), reverse=True)[:3]
+
+def test_planner_choices():
+    """Whole-month opportunity totals come from the aggregates; other queries go to the backend"""
+    backend = get_backend()
+    quarter = Query("opportunities").between("close_date", "2024-01-01", "2024-03-31").group_by("stage")
+    assert quarter.explain("value", "probability") == "materialized pipeline aggregates"
+    assert quarter.totals("value", "probability") == backend.totals(
+        "opportunities", "value", "probability", group_by="stage", ranges={"close_date": ("2024-01-01", "2024-03-31")})
+
+    mid_month = Query("opportunities").between("close_date", "2024-01-15", "2024-03-31")
+    assert mid_month.explain("value", "probability") != "materialized pipeline aggregates"
+    assert Query("leads").where(status="Qualified").between("value", 10000).explain().startswith("index lookup on leads(status)")
+
+def test_cube():
+    """Multi-dimensional cubes match a hand-rolled group-by, from the aggregates or a single pass"""
+    opps, leads = sales_data["opportunities"], sales_data["leads"]
+
+    def expected(key_of):
+        cells = {}
+        for o in opps.values():
+            cell = cells.setdefault(key_of(o), {"count": 0, "value": 0, "weighted": 0})
+            cell["count"] += 1
+            cell["value"] += o["value"]
+            cell["weighted"] += o["value"] * o["probability"]
+        return cells
+
+    query = Query("opportunities")
+    assert query.cube(("owner", "close_month"), "value", "probability") == expected(lambda o: (o["owner"], o["close_date"][:7]))
+    assert query.cube(("industry", "stage"), "value", "probability") == expected(lambda o: (leads[o["lead_id"]]["industry"], o["stage"]))
+    bands = query.cube(("value_band",), "value", "probability")
+    assert sum(cell["count"] for cell in bands.values()) == len(opps)
+
+def test_cube_fetches_referenced_leads():
+    """A lead-attribute cube reads only the leads its matching rows point at, never the whole table"""
+    backend = get_backend()
+    fetched, scanned = [], []
+    get, find = backend.get, backend.find
+    backend.get = lambda table, record_id: fetched.append((table, record_id)) or get(table, record_id)
+    backend.find = lambda table, *args, **kwargs: scanned.append(table) or find(table, *args, **kwargs)
+    try:
+        owner = "Maria Garcia"
+        cells = Query("opportunities").where(owner=owner).cube(("source",), "value")
+    finally:
+        del backend.get, backend.find
+    referenced = {o["lead_id"] for o in sales_data["opportunities"].values() if o["owner"] == owner}
+    assert "leads" not in scanned
+    assert sorted(fetched) == sorted(("leads", lead_id) for lead_id in referenced)
+    assert sum(cell["count"] for cell in cells.values()) == Query("opportunities").where(owner=owner).count()
+
+if __name__ == "__main__":
+    test_query_results()
+    test_planner_choices()
+    test_cube()
+    test_cube_fetches_referenced_leads()
+    print("✅ Query planner tests passed")
@@ -77,5 +77,31 @@ def test_core_functionality():
     print("🎉 All core functionality tests completed successfully!")
     print("The simplified tool set is working correctly for the main query types.")
 
+def test_batch_tools():
+    """Batch lookups match the single calls and fold duplicate customers together"""
+    single = TOOL_FUNCTIONS["get_customer_details"]("CUST002")
+    batch = TOOL_FUNCTIONS["get_customer_details"](customer_ids=["CUST001", "Enterprise Solutions Ltd", "CUST002"])
+    assert [c["customer_id"] for c in batch["customers"]] == ["CUST001", "CUST002"]
+    assert batch["resolved"]["Enterprise Solutions Ltd"] == "CUST001"
+    assert batch["customers"][1]["total_value"] == single["total_value"]
+    assert batch["total_value"] == sum(c["total_value"] for c in batch["customers"])
+
+    batch = TOOL_FUNCTIONS["search_customers"](queries=["tech", "healthcare"])
+    assert [c["customer_id"] for c in batch["results"]["tech"]] == \
+        [c["customer_id"] for c in TOOL_FUNCTIONS["search_customers"](query="tech")["results"]]
+    assert batch["total_count"] == sum(len(hits) for hits in batch["results"].values())
+
+def test_batch_arguments():
+    """A bare string is one id or query, not a list of characters; no id at all is an error"""
+    batch = TOOL_FUNCTIONS["get_customer_details"](customer_ids="CUST001")
+    assert [c["customer_id"] for c in batch["customers"]] == ["CUST001"]
+    assert "error" in TOOL_FUNCTIONS["get_customer_details"]()
+    assert "error" in TOOL_FUNCTIONS["get_customer_details"](customer_ids=[])
+
+    batch = TOOL_FUNCTIONS["search_customers"](queries="tech")
+    assert batch["queries"] == ["tech"] and list(batch["results"]) == ["tech"]
+
 if __name__ == "__main__":
     test_core_functionality()
+    test_batch_tools()
+    test_batch_arguments()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Checks that helper results are read-only views that behave like the old dicts.
+"""
+
+import json
+
+import sales_db
+from records import RecordView, Opportunity, compact, to_json
+from sales_db import sales_data
+
+def test_helper_results_are_views():
+    """Views read through to the stored record, compare equal to dicts and serialize"""
+    leads = sales_db.get_leads_by_status(status="Qualified")
+    lead = leads[0]
+    assert isinstance(lead, RecordView)
+    assert lead.record is sales_data["leads"][lead["lead_id"]]
+    assert dict(lead) == {"lead_id": lead["lead_id"], **sales_data["leads"][lead["lead_id"]]}
+    assert list(lead)[0] == "lead_id" and len(lead) == len(lead.record) + 1
+    assert lead == lead.to_dict() and repr(lead) == repr(lead.to_dict())
+    assert json.loads(json.dumps(leads, default=to_json)) == [view.to_dict() for view in leads]
+
+    try:
+        lead["status"] = "Lost"
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("record views must be read-only")
+
+def test_compact_records():
+    """Slotted records read back exactly like the dicts they replace"""
+    for table, records in sales_data.items():
+        for record in records.values():
+            compacted = compact(table, record)
+            assert compacted == record and list(compacted) == list(record)
+
+    opp = compact("opportunities", {**sales_data["opportunities"]["OPP001"], "custom": 1})
+    assert isinstance(opp, Opportunity) and not hasattr(opp, "__dict__")
+    assert opp["close_date"] == sales_data["opportunities"]["OPP001"]["close_date"]
+    assert isinstance(opp.close_date, int) and opp.get("custom") == 1 and opp.get("missing") is None
+    assert {**opp}["stage"] == sales_data["opportunities"]["OPP001"]["stage"]
+
+if __name__ == "__main__":
+    test_helper_results_are_views()
+    test_compact_records()
+    print("✅ Record view tests passed")
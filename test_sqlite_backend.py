@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Checks that the SQLite backend answers the sales_db helpers and the
+pipeline/analytics tools exactly like the default in-memory backend.
+"""
+
+import os
+import sqlite3
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import sales_db
+from planner import Query
+from tools import TOOL_FUNCTIONS
+
+def _snapshot():
+    results = {
+        "leads": sales_db.get_leads_by_status(status="Qualified"),
+        "opportunities": sales_db.get_opportunities_by_stage(owner="Alex Rodriguez"),
+        "tasks": sales_db.get_tasks_by_status(status="Pending"),
+        "customers": sales_db.get_customers_by_status(status="Active"),
+        "activities": sales_db.get_activities_by_lead(lead_id="LEAD001"),
+        "top_deals": list(sales_db.iter_opportunities_by_stage(order_by="value", descending=True, limit=5)),
+        "lead_page": list(sales_db.iter_leads_by_status(order_by="created", limit=3, offset=2)),
+        "tasks_by_due": list(sales_db.iter_tasks_by_status(status="Pending", order_by="due_date")),
+        "pipeline": TOOL_FUNCTIONS["get_pipeline_report"](min_value=50000, close_date_filter="active"),
+        "analytics": TOOL_FUNCTIONS["get_sales_analytics"](),
+        "search": TOOL_FUNCTIONS["search_customers"](query="tech"),
+    }
+    for name in ("pipeline", "analytics", "search"):
+        results[name].pop("timestamp")
+    return results
+
+def test_sqlite_matches_memory_backend():
+    """Helpers, cursors and tools return the same data from SQLite as from the dicts"""
+    expected = _snapshot()
+    previous = sales_db.get_backend()
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            backend = sales_db.use_sqlite(os.path.join(tmp, "crm.db"), load_sample_data=True)
+            assert _snapshot() == expected
+
+            sales_db.update_record("opportunities", "OPP001", stage="Closed Lost")
+            assert backend.get("opportunities", "OPP001")["stage"] == "Closed Lost"
+            assert "OPP001" not in [o["opportunity_id"] for o in sales_db.get_opportunities_by_stage("Negotiation")]
+            backend.close()
+        finally:
+            sales_db.set_backend(previous)
+
+def test_external_writes_visible():
+    """Totals come from SQL, not in-process aggregates, and cached tool results see other connections' writes"""
+    previous = sales_db.get_backend()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "crm.db")
+        try:
+            backend = sales_db.use_sqlite(path, load_sample_data=True)
+            assert Query("opportunities").explain("value", "probability") != "materialized pipeline aggregates"
+            before = TOOL_FUNCTIONS["get_sales_analytics"]()["total_opportunities"]
+
+            other = sqlite3.connect(path)
+            with other:
+                other.execute('DELETE FROM "opportunities" WHERE id = ?', ("OPP001",))
+            other.close()
+            after = TOOL_FUNCTIONS["get_sales_analytics"]()["total_opportunities"]
+            assert after == before - 1 == backend.count("opportunities")
+            backend.close()
+        finally:
+            sales_db.set_backend(previous)
+
+def test_account_join_sees_external_writes():
+    """Customer details join leads and opportunities in SQL: nothing is loaded, other connections' writes count"""
+    previous = sales_db.get_backend()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "crm.db")
+        try:
+            backend = sales_db.use_sqlite(path, load_sample_data=True)
+            scanned = []
+            find = backend.find
+            backend.find = lambda table, *args, **kwargs: scanned.append(table) or find(table, *args, **kwargs)
+            before = TOOL_FUNCTIONS["get_customer_details"]("CUST009")
+            assert before["total_opportunities"] == 1
+
+            other = sqlite3.connect(path)
+            with other:
+                other.execute('INSERT INTO "opportunities" (id, lead_id, name, stage, value, probability, close_date, owner) '
+                              'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                              ("OPP_EXT", "LEAD009", "CloudTech Expansion", "Proposal", 40000, 50, "2030-01-15", "Maria Garcia"))
+            other.close()
+            after = TOOL_FUNCTIONS["get_customer_details"]("CUST009")
+            assert after["total_opportunities"] == 2
+            assert "OPP_EXT" in sales_db.get_account_index().related("CloudTech Solutions, Inc.", "opportunities")
+            assert not set(scanned) & set(sales_db.ACCOUNT_TABLES)
+            del backend.find
+            backend.close()
+        finally:
+            sales_db.set_backend(previous)
+
+def test_customer_lookups_see_external_writes():
+    """Customer search and fuzzy resolution follow renames made through another connection"""
+    previous = sales_db.get_backend()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "crm.db")
+        try:
+            backend = sales_db.use_sqlite(path, load_sample_data=True)
+            search = lambda query: [c["customer_id"] for c in TOOL_FUNCTIONS["search_customers"](query=query)["results"]]
+            assert "CUST009" in search("CloudTech")
+
+            other = sqlite3.connect(path)
+            with other:
+                other.execute('UPDATE "customers" SET name = ?, email = ? WHERE id = ?',
+                              ("Renamed Corp", "nicole@renamed.com", "CUST009"))
+            other.close()
+            assert "CUST009" not in search("CloudTech")
+            assert search("Renamed") == ["CUST009"]
+            # Fuzzy resolution follows the rename too
+            assert sales_db.resolve_customer("Renamed Corporation") == "CUST009"
+            assert "CUST009" not in sales_db.resolve_customers("Cloudtech Solution")
+            backend.close()
+        finally:
+            sales_db.set_backend(previous)
+
+def test_data_version_shared_across_threads():
+    """Data versions read on different threads' connections never repeat across an external write"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "crm.db")
+        backend = sales_db.SQLiteBackend(path)
+        with ThreadPoolExecutor(max_workers=1) as worker:
+            first = backend.data_version()
+            assert backend.data_version() == first
+            other = sqlite3.connect(path)
+            with other:
+                other.execute('INSERT INTO "leads" (id, company) VALUES (?, ?)', ("LEAD_EXT", "External Co"))
+            other.close()
+            # A thread opening its connection after the write must not report the version seen before it
+            assert worker.submit(backend.data_version).result() > first
+            assert backend.data_version() > first
+        backend.close()
+
+if __name__ == "__main__":
+    test_sqlite_matches_memory_backend()
+    test_external_writes_visible()
+    test_account_join_sees_external_writes()
+    test_customer_lookups_see_external_writes()
+    test_data_version_shared_across_threads()
+    print("✅ SQLite backend tests passed")
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Checks the tool result cache: hits, invalidation on writes, LRU and TTL.
+"""
+
+import sales_db
+from tool_cache import ToolCache
+from tools import TOOL_FUNCTIONS, tool_cache
+
+def test_tool_results_cached_until_write():
+    """Equivalent calls share an entry; a write to the store invalidates it"""
+    tool_cache.clear()
+    before = tool_cache.stats()
+    first = TOOL_FUNCTIONS["get_pipeline_report"]()
+    stamped = first.pop("timestamp")
+    first["stage_breakdown"].clear()
+    second = TOOL_FUNCTIONS["get_pipeline_report"](owner=None)
+    # The caller's changes, nested ones included, did not reach the cached result
+    assert second["stage_breakdown"] and second["timestamp"] >= stamped
+    stats = tool_cache.stats()
+    assert stats["misses"] == before["misses"] + 1 and stats["hits"] == before["hits"] + 1
+
+    sales_db.update_record("leads", "LEAD001", notes=sales_db.sales_data["leads"]["LEAD001"]["notes"])
+    TOOL_FUNCTIONS["get_pipeline_report"]()
+    assert tool_cache.stats()["misses"] == before["misses"] + 2
+
+def test_lru_and_ttl():
+    """Least recently used entries are evicted first; expired entries miss"""
+    now = [0.0]
+    cache = ToolCache(maxsize=2, ttl=10, clock=lambda: now[0])
+    calls = []
+    square = cache.wrap("square", lambda x: calls.append(x) or {"value": x * x})
+    square(1), square(2), square(1), square(3)
+    square(1)
+    assert calls == [1, 2, 3]
+    square(2)
+    assert calls == [1, 2, 3, 2] and cache.stats()["evictions"] == 2
+
+    now[0] = 11
+    square(2)
+    assert calls == [1, 2, 3, 2, 2]
+
+if __name__ == "__main__":
+    test_tool_results_cached_until_write()
+    test_lru_and_ttl()
+    print("✅ Tool cache tests passed")
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Checks the compact tool-result encoding used in the conversation history.
+"""
+
+import json
+
+from tool_encoding import encode_tool_result, estimate_tokens
+from tools import TOOL_FUNCTIONS
+
+def test_records_become_tables():
+    """Record lists are tabulated, constant columns hoisted and redundant fields dropped"""
+    result = TOOL_FUNCTIONS["search_customers"](query="tech")
+    encoded = json.loads(encode_tool_result("search_customers", result))
+    assert "timestamp" not in encoded and "filters" not in encoded
+    table = encoded["results"]
+    assert table["columns"][0] == "customer_id"
+    assert [row[0] for row in table["rows"]] == [r["customer_id"] for r in result["results"]]
+
+    rows = [{"id": i, "stage": "Proposal", "owner": None} for i in range(3)]
+    encoded = json.loads(encode_tool_result("any_tool", {"rows": rows}))
+    assert encoded["rows"] == {"columns": ["id"], "rows": [[0], [1], [2]], "same": {"stage": "Proposal"}}
+
+def test_budget_truncation_is_deterministic():
+    """Oversized tables are cut to their leading rows, with the original row count noted"""
+    result = {"total": 500, "items": [{"id": f"ITEM{i:03d}", "notes": "x" * 40} for i in range(500)]}
+    text = encode_tool_result("any_tool", result, budget=300)
+    assert estimate_tokens(text) <= 300
+    assert text == encode_tool_result("any_tool", result, budget=300)
+    items = json.loads(text)["items"]
+    assert items["total_rows"] == 500 and items["rows"][0][0] == "ITEM000"
+
+def test_oversized_result_still_parses():
+    """Results too large even with every table cut are trimmed structurally and stay valid JSON"""
+    result = {"owner": "Maria Garcia", "notes": "n" * 4000, "tags": [f"tag{i}" for i in range(400)],
+              "items": [{"id": f"ITEM{i:03d}", "notes": "x" * 400} for i in range(50)]}
+    for budget in (300, 100, 30):
+        text = encode_tool_result("any_tool", result, budget=budget)
+        assert estimate_tokens(text) <= budget
+        assert text == encode_tool_result("any_tool", result, budget=budget)
+        encoded = json.loads(text)
+        assert encoded["truncated"] > 0
+    encoded = json.loads(encode_tool_result("any_tool", result, budget=300))
+    assert encoded["owner"] == "Maria Garcia" and encoded["notes"].endswith("…")
+    assert encoded["tags"] == result["tags"][:len(encoded["tags"])]
+    assert json.loads(encode_tool_result("any_tool", ["x" * 100] * 300, budget=50))["truncated"] > 0
+
+if __name__ == "__main__":
+    test_records_become_tables()
+    test_budget_truncation_is_deterministic()
+    test_oversized_result_still_parses()
+    print("✅ Tool encoding tests passed")
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Checks the risk-based validation policy's decisions and counters.
+"""
+
+from validation_policy import ASYNC, SKIP, SYNC, ValidationPolicy
+
+def test_decisions_follow_risk():
+    """Risky questions and ungrounded long answers are validated; grounded answers are sampled"""
+    policy = ValidationPolicy(sample_every=2, long_response=100)
+    assert policy.decide("t1", "What discount can we offer TechCorp?", "10%", ["get_customer_details"]) == SYNC
+    assert policy.decide("t1", "Summarize our approach", "x" * 200) == SYNC
+    assert policy.decide("t1", "Show the pipeline", "Total is $1.4M", ["get_pipeline_report"]) == SKIP
+    assert policy.decide("t1", "Show the pipeline", "Total is $1.4M", ["get_pipeline_report"]) == ASYNC
+    assert policy.decide("t1", "Show the pipeline", "", final=False) == SKIP
+    assert policy.decide("t1", "Show the pipeline", "Total", ["send_email"]) == SYNC
+
+def test_default_validates_risky_answers_first():
+    """By default only risky answers are validated first; everything else is validated in the background"""
+    policy = ValidationPolicy(long_response=100)
+    assert policy.decide("t1", "Show the pipeline", "Total is $1.4M", ["get_pipeline_report"]) == ASYNC
+    assert policy.decide("t1", "Hi", "Hello!") == ASYNC
+    assert policy.decide("t1", "Show the pipeline", "", final=False) == ASYNC
+    assert policy.decide("t1", "Summarize our approach", "x" * 200) == SYNC
+    assert not policy.gates_answer("t1", "Show the pipeline", ["get_pipeline_report"])
+    assert policy.gates_answer("t1", "What discount can we offer TechCorp?")
+    assert policy.stats()["decisions"] == {SYNC: 1, ASYNC: 3, SKIP: 0}
+
+def test_gated_before_answer():
+    """What forces a synchronous check is known before the answer is written"""
+    policy = ValidationPolicy(sample_every=4)
+    assert policy.gates_answer("t1", "What discount can we offer TechCorp?")
+    assert policy.gates_answer("t1", "Show the pipeline", ["get_pipeline_report", "send_email"])
+    assert not policy.gates_answer("t1", "Show the pipeline", ["get_pipeline_report"])
+    assert policy.stats()["decisions"] == {SYNC: 0, ASYNC: 0, SKIP: 0}
+
+def test_flagged_threads_and_counters():
+    """A thread with recent guardrail hits is always validated; savings are estimated from measured latency"""
+    policy = ValidationPolicy(sample_every=3, risky_rate=0.5, window=2)
+    policy.record("risky", True, 1.0)
+    policy.record("risky", False, 3.0)
+    assert policy.guardrail_rate("risky") == 0.5
+    assert policy.decide("risky", "Show the pipeline", "ok", ["get_pipeline_report"]) == SYNC
+    assert policy.decide("risky", "Show the pipeline", "", final=False) == ASYNC
+    assert policy.decide("calm", "Show the pipeline", "ok", ["get_pipeline_report"]) == SKIP
+
+    policy.record("risky", False, 2.0)
+    assert policy.guardrail_rate("risky") == 0.0  # the flag fell out of the window
+    stats = policy.stats()
+    assert stats["decisions"] == {SYNC: 1, ASYNC: 1, SKIP: 1}
+    assert stats["average_validation_seconds"] == 2.0 and stats["estimated_seconds_saved"] == 2.0
+
+if __name__ == "__main__":
+    test_decisions_follow_risk()
+    test_default_validates_risky_answers_first()
+    test_gated_before_answer()
+    test_flagged_threads_and_counters()
+    print("✅ Validation policy tests passed")
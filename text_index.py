@@ -0,0 +1,216 @@
+"""
+Inverted text index for CRM search.
+
+Every indexed field is split into lower-case alphanumeric tokens. ``postings``
+maps a token to the records containing it (with the best weight of the fields
+it appears in), a sorted token list answers prefix matches with two bisects,
+and a trigram -> tokens map narrows infix matches to the few tokens that can
+contain the query term. A search therefore touches only the tokens and records
+that match, never the whole table.
+
+``FuzzyIndex`` resolves misspelled or partial names to the closest known
+aliases by trigram similarity.
+"""
+
+import math
+import re
+from bisect import bisect_left, insort
+from heapq import nsmallest
+
+_TOKEN = re.compile(r"[^\W_]+")
+
+# Score multipliers per kind of token match
+EXACT, PREFIX, INFIX = 3, 2, 1
+
+
+def tokenize(text) -> list:
+    """Lower-case alphanumeric tokens of a string"""
+    return _TOKEN.findall(str(text or "").lower())
+
+
+def trigrams(token: str) -> set:
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+
+class TextIndex:
+    """Token, prefix and trigram index over some text fields of one table
+
+    ``fields`` maps a field name to its weight; a match in a heavier field
+    (say the company name) ranks above one in a lighter field (the email).
+    """
+
+    def __init__(self, fields: dict, records=None):
+        self.fields = dict(fields)
+        self.postings = {}
+        self.tokens = []
+        self.grams = {}
+        self.documents = {}
+        self.order = {}
+        self._next = 0
+        for record_id, record in (records or {}).items():
+            self.add(record_id, record)
+
+    def __len__(self):
+        return len(self.documents)
+
+    def _weights(self, record: dict) -> dict:
+        weights = {}
+        for field, weight in self.fields.items():
+            for token in tokenize(record.get(field)):
+                if weights.get(token, 0) < weight:
+                    weights[token] = weight
+        return weights
+
+    def add(self, record_id: str, record: dict):
+        """Index a record (replacing any previous version of it)"""
+        if record_id in self.documents:
+            self.remove(record_id)
+        else:
+            self.order[record_id] = self._next
+            self._next += 1
+        weights = self.documents[record_id] = self._weights(record)
+        for token, weight in weights.items():
+            postings = self.postings.get(token)
+            if postings is None:
+                postings = self.postings[token] = {}
+                insort(self.tokens, token)
+                for gram in trigrams(token):
+                    self.grams.setdefault(gram, set()).add(token)
+            postings[record_id] = weight
+
+    def remove(self, record_id: str):
+        """Drop a record from the index"""
+        for token in self.documents.pop(record_id, ()):
+            postings = self.postings[token]
+            del postings[record_id]
+            if not postings:
+                del self.postings[token]
+                del self.tokens[bisect_left(self.tokens, token)]
+                for gram in trigrams(token):
+                    tokens = self.grams[gram]
+                    tokens.discard(token)
+                    if not tokens:
+                        del self.grams[gram]
+
+    def apply(self, record_id: str, old: dict, new: dict):
+        """Account for one write: ``old`` is None for inserts, ``new`` is None for deletes"""
+        if new is None:
+            self.remove(record_id)
+            self.order.pop(record_id, None)
+        else:
+            self.add(record_id, new)
+
+    def _term_matches(self, term: str) -> dict:
+        """Tokens matching one query term, with the kind of match (exact, prefix or infix)"""
+        tokens = self.tokens
+        start = bisect_left(tokens, term)
+        end = bisect_left(tokens, term + "\uffff", start)
+        matches = {token: PREFIX for token in tokens[start:end]}
+        if term in self.postings:
+            matches[term] = EXACT
+        if len(term) >= 3:
+            grams = sorted((self.grams.get(gram, set()) for gram in trigrams(term)), key=len)
+            candidates = set.intersection(*grams) if grams[0] else set()
+            for token in candidates:
+                if token not in matches and term in token:
+                    matches[token] = INFIX
+        return matches
+
+    def search(self, text: str, limit: int = None) -> list:
+        """Record ids matching every term of ``text`` as a token, prefix or infix, best first
+
+        Each term scores its best match kind times the weight of the field it
+        matched in; ties keep insertion order.
+        """
+        scores = None
+        for term in dict.fromkeys(tokenize(text)):
+            term_scores = {}
+            for token, kind in self._term_matches(term).items():
+                for record_id, weight in self.postings[token].items():
+                    score = kind * weight
+                    if term_scores.get(record_id, 0) < score:
+                        term_scores[record_id] = score
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {record_id: score + term_scores[record_id]
+                          for record_id, score in scores.items() if record_id in term_scores}
+            if not scores:
+                return []
+        if not scores:
+            return []
+        order = self.order
+        rank = lambda record_id: (-scores[record_id], order[record_id])
+        return sorted(scores, key=rank) if limit is None else nsmallest(limit, scores, key=rank)
+
+
+def padded_trigrams(text: str) -> frozenset:
+    """Trigrams of a normalized string padded with spaces, so short words still have some"""
+    return frozenset(trigrams(f"  {text} "))
+
+
+class FuzzyIndex:
+    """Approximate lookup of free text against a set of aliases by trigram similarity
+
+    Each alias points at one or more targets (reference counted, so the same
+    alias can come from several records). ``lookup`` scores aliases by the Dice
+    coefficient of their trigram sets and only scans the postings of the query's
+    rarest trigrams: any alias similar enough must share at least one of them.
+    """
+
+    def __init__(self):
+        self.targets = {}
+        self.alias_grams = {}
+        self.grams = {}
+
+    def __len__(self):
+        return len(self.targets)
+
+    def add(self, alias: str, target):
+        if not alias:
+            return
+        targets = self.targets.get(alias)
+        if targets is None:
+            targets = self.targets[alias] = {}
+            grams = self.alias_grams[alias] = padded_trigrams(alias)
+            for gram in grams:
+                self.grams.setdefault(gram, set()).add(alias)
+        targets[target] = targets.get(target, 0) + 1
+
+    def remove(self, alias: str, target):
+        targets = self.targets.get(alias)
+        if targets is None or target not in targets:
+            return
+        targets[target] -= 1
+        if targets[target]:
+            return
+        del targets[target]
+        if not targets:
+            del self.targets[alias]
+            for gram in self.alias_grams.pop(alias):
+                aliases = self.grams[gram]
+                aliases.discard(alias)
+                if not aliases:
+                    del self.grams[gram]
+
+    def lookup(self, text: str, limit: int = 5, threshold: float = 0.4) -> list:
+        """Best ``(target, score)`` pairs for ``text``, highest similarity first"""
+        query = padded_trigrams(text)
+        if not query:
+            return []
+        # Dice >= threshold needs an overlap of at least t*|q|/(2-t) trigrams
+        min_overlap = max(1, math.ceil(threshold * len(query) / (2 - threshold)))
+        rarest = sorted(query, key=lambda gram: len(self.grams.get(gram, ())))
+        candidates = set()
+        for gram in rarest[:len(query) - min_overlap + 1]:
+            candidates.update(self.grams.get(gram, ()))
+        best = {}
+        for alias in candidates:
+            grams = self.alias_grams[alias]
+            score = 2 * len(query & grams) / (len(query) + len(grams))
+            if score < threshold:
+                continue
+            for target in self.targets[alias]:
+                if best.get(target, 0) < score:
+                    best[target] = score
+        return nsmallest(limit, best.items(), key=lambda item: (-item[1], str(item[0])))
@@ -0,0 +1,113 @@
+"""
+Result cache for the agent's tool functions.
+
+Entries are keyed on the tool name, its arguments bound to the function
+signature (so omitted defaults and explicit defaults share an entry), and a
+context value - in ``tools.py`` the data-store version plus today's date, so a
+write or a new day (which moves "last month" and friends) invalidates
+everything at once. The cache is a bounded LRU with a TTL, guarded by a lock
+so Streamlit sessions in one process can share it, and counts hits, misses
+and evictions.
+
+Every caller gets its own deep copy of the result, so mutating it never
+reaches the cache, and a hit carries a fresh ``timestamp``.
+"""
+
+import inspect
+import json
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+from datetime import datetime
+from functools import wraps
+
+DEFAULT_MAXSIZE = 256
+DEFAULT_TTL = 300.0
+# Result field stamped with the time of the call, refreshed on a hit
+TIMESTAMP_FIELD = "timestamp"
+
+
+def _copy(value):
+    """Deep copy of a result: mappings (record views included) become dicts, lists are copied"""
+    if isinstance(value, Mapping):
+        return {key: _copy(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy(item) for item in value]
+    return value
+
+
+class ToolCache:
+    """Thread-safe LRU + TTL cache of tool results"""
+
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE, ttl: float = DEFAULT_TTL, context=None, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.context = context or (lambda: None)
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def key(self, name: str, function, args: tuple, kwargs: dict):
+        """Cache key for a call, or None when the arguments do not bind (let the call raise)"""
+        try:
+            bound = inspect.signature(function).bind(*args, **kwargs)
+        except TypeError:
+            return None
+        bound.apply_defaults()
+        arguments = json.dumps(bound.arguments, sort_keys=True, default=str)
+        return name, arguments, self.context()
+
+    def get(self, key):
+        """Cached value for ``key`` or None; expired entries are dropped"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > self.clock():
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self.entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = (self.clock() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"size": len(self.entries), "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    def wrap(self, name: str, function):
+        """Cached version of a tool function (every call returns its own deep copy)"""
+        @wraps(function)
+        def cached(*args, **kwargs):
+            key = self.key(name, function, args, kwargs)
+            if key is None:
+                return function(*args, **kwargs)
+            result = self.get(key)
+            if result is None:
+                result = function(*args, **kwargs)
+                if isinstance(result, dict) and "error" not in result:
+                    self.put(key, _copy(result))
+                return result
+            result = _copy(result)
+            if TIMESTAMP_FIELD in result:
+                result[TIMESTAMP_FIELD] = datetime.now().isoformat()
+            return result
+        cached.uncached = function
+        return cached
+
+    def wrap_all(self, functions: dict) -> dict:
+        return {name: self.wrap(name, function) for name, function in functions.items()}
@@ -0,0 +1,182 @@
+"""
+Compact encoding of tool results for the LLM conversation history.
+
+``str(result)`` put the Python repr of the whole result into every later
+prompt. ``encode_tool_result`` instead emits minified JSON where:
+
+- ``timestamp``, ``None`` values, empty filter dicts and per-tool duplicates
+  (e.g. ``revenue_breakdown``, which repeats the rows' revenue) are dropped;
+- lists of records become tables, ``{"columns": [...], "rows": [[...]]}``,
+  with columns that hold the same value on every row hoisted into ``"same"``;
+- the text is kept within a per-tool token budget by halving the longest
+  table until it fits, noting ``"total_rows"`` on every table it cut. The
+  leading rows are kept in the order the tool returned them: ranked for
+  ``search_customers``, table order for the others (e.g. closed customers
+  or next month's opportunities), so ``total_rows`` is what tells the model
+  rows are missing. If that is not enough, the largest remaining list or
+  text is halved (list tails dropped, text shortened, and only then whole
+  fields dropped) until it fits, with the number of items cut in
+  ``"truncated"``. The output is always valid JSON, and the same result
+  always encodes to the same text.
+"""
+
+import json
+from collections.abc import Mapping
+
+# Approximate tokens per character of minified JSON
+CHARS_PER_TOKEN = 4
+DEFAULT_TOKEN_BUDGET = 1500
+# Text fields are never cut below this many characters
+MIN_TEXT = 16
+TOOL_TOKEN_BUDGETS = {
+    "get_customers_closed_summary": 2000,
+    "get_customer_details": 2000,
+    "get_pipeline_report": 2000,
+    "search_customers": 1500,
+    "get_sales_analytics": 500,
+}
+
+# Top-level fields that only repeat information found elsewhere in the result
+DROPPED_FIELDS = ("timestamp",)
+REDUNDANT_FIELDS = {
+    "get_customers_closed_summary": ("revenue_breakdown",),
+    "get_customer_details": ("account_manager", "last_activity"),
+}
+
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def _is_table(value) -> bool:
+    return isinstance(value, list) and len(value) > 1 and all(isinstance(item, Mapping) for item in value)
+
+
+def _table(records: list) -> dict:
+    """Column/row form of a list of records, hoisting columns that never vary"""
+    columns = {}
+    for record in records:
+        for key in record:
+            columns.setdefault(key, None)
+    rows = [[_compact(record.get(column)) for column in columns] for record in records]
+    same = {}
+    for i, column in enumerate(columns):
+        first = rows[0][i]
+        if all(row[i] == first for row in rows):
+            same[column] = first
+    if same:
+        keep = [i for i, column in enumerate(columns) if column not in same]
+        columns = [column for column in columns if column not in same]
+        rows = [[row[i] for i in keep] for row in rows]
+    table = {"columns": list(columns), "rows": rows}
+    same = {column: value for column, value in same.items() if value is not None}
+    if same:
+        table["same"] = same
+    return table
+
+
+def _compact(value):
+    """Plain JSON-ready copy of a result value with empty values dropped and record lists tabulated"""
+    if isinstance(value, Mapping):
+        compact = {}
+        for key, item in value.items():
+            item = _compact(item)
+            if item is None or item == {}:
+                continue
+            compact[key] = item
+        return compact
+    if _is_table(value):
+        return _table(value)
+    if isinstance(value, (list, tuple)):
+        return [_compact(item) for item in value]
+    return value
+
+
+def _tables(value, found=None) -> list:
+    """Every table in a compacted result, in document order"""
+    found = [] if found is None else found
+    if isinstance(value, dict):
+        if "columns" in value and "rows" in value:
+            found.append(value)
+        else:
+            for item in value.values():
+                _tables(item, found)
+    elif isinstance(value, list):
+        for item in value:
+            _tables(item, found)
+    return found
+
+
+def _shrinkable(value, found=None) -> list:
+    """``(size, container, key)`` of every list and long text in a compacted result"""
+    found = [] if found is None else found
+    items = value.items() if isinstance(value, dict) else enumerate(value) if isinstance(value, list) else ()
+    for key, item in items:
+        if key == "columns" and isinstance(value, dict) and "rows" in value:
+            continue
+        if (isinstance(item, list) and item) or (isinstance(item, str) and len(item) >= 2 * MIN_TEXT):
+            found.append((len(_dumps(item)), value, key))
+        _shrinkable(item, found)
+    return found
+
+
+def _shrink(compact):
+    """Halve the largest list or text in the result (or drop a field); the number of items cut, or None when nothing is left
+
+    Rows cut from a table are counted in its ``total_rows`` instead.
+    """
+    candidates = _shrinkable(compact)
+    if not candidates:
+        # Only short scalars left: drop the largest field
+        fields = [(len(_dumps(value)), key) for key, value in compact.items() if key != "truncated"]
+        if not fields:
+            return None
+        del compact[max(fields)[1]]
+        return 1
+    _, container, key = max(candidates, key=lambda candidate: candidate[0])
+    item = container[key]
+    if isinstance(item, str):
+        container[key] = item[:len(item) // 2] + "…"
+        return 1
+    keep = len(item) // 2
+    cut = len(item) - keep
+    del item[keep:]
+    if isinstance(container, dict) and key == "rows" and "columns" in container:
+        container.setdefault("total_rows", keep + cut)
+        return 0
+    return cut
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def encode_tool_result(name: str, result, budget: int = None) -> str:
+    """Minified, budgeted JSON text of a tool result for the model"""
+    budget = budget or TOOL_TOKEN_BUDGETS.get(name, DEFAULT_TOKEN_BUDGET)
+    if isinstance(result, Mapping):
+        dropped = DROPPED_FIELDS + REDUNDANT_FIELDS.get(name, ())
+        result = {key: value for key, value in result.items() if key not in dropped}
+    compact = _compact(result)
+    text = _dumps(compact)
+    tables = _tables(compact)
+    while estimate_tokens(text) > budget:
+        longest = max(tables, key=lambda table: len(table["rows"]), default=None)
+        if longest is None or len(longest["rows"]) <= 1:
+            break
+        longest.setdefault("total_rows", len(longest["rows"]))
+        del longest["rows"][(len(longest["rows"]) + 1) // 2:]
+        text = _dumps(compact)
+    if estimate_tokens(text) > budget:
+        # Still too large: cut the largest lists and texts, keeping the JSON whole
+        if not isinstance(compact, dict):
+            compact = {"result": compact}
+        truncated = 0
+        while estimate_tokens(text) > budget:
+            cut = _shrink(compact)
+            if cut is None:
+                break
+            truncated += cut
+            compact["truncated"] = truncated
+            text = _dumps(compact)
+    return text
@@ -5,7 +5,10 @@ import uuid
 from datetime import datetime, timedelta
 
 # Import from the separate sales database
-from sales_db import sales_data, get_leads_by_status, get_opportunities_by_stage, get_tasks_by_status, get_customers_by_status, get_activities_by_lead, get_customers_by_close_date
+from sales_db import get_backend, CLOSED_STAGES, get_customers_by_close_date, resolve_timeframe, get_account_index, get_customer_search_index, resolve_customers, resolve_customer, match_customers, get_version
+from planner import Query, VALUE_BAND_ORDER
+from records import RecordView, view_rows
+from tool_cache import ToolCache
 
 # SIMPLIFIED SALES TOOLS - Focused on core functionality
 tools = [
@@ -18,8 +21,10 @@ tools = [
             "parameters": {
                 "type": "object",
                 "properties": {
-                    "timeframe": {"type": "string", "description": "Timeframe for closed customers (this_month, last_month, last_quarter)"},
-                    "include_revenue_breakdown": {"type": "boolean", "description": "Include revenue breakdown by customer"}
+                    "timeframe": {"type": "string", "description": "Timeframe for closed customers (this_month, last_month, last_quarter, this_quarter, this_year, last_year)"},
+                    "include_revenue_breakdown": {"type": "boolean", "description": "Include revenue breakdown by customer"},
+                    "start_date": {"type": "string", "description": "Custom range start date (YYYY-MM-DD), overrides timeframe"},
+                    "end_date": {"type": "string", "description": "Custom range end date (YYYY-MM-DD), overrides timeframe"}
                 },
                 "required": []
             }
@@ -35,9 +40,10 @@ tools = [
             "parameters": {
                 "type": "object",
                 "properties": {
-                    "customer_id": {"type": "string", "description": "Customer ID or name to look up"}
+                    "customer_id": {"type": "string", "description": "Customer ID or name to look up"},
+                    "customer_ids": {"type": "array", "items": {"type": "string"}, "description": "Several customer IDs or names to look up in one call (e.g. for top accounts)"}
                 },
-                "required": ["customer_id"]
+                "required": []
             }
         }
     },
@@ -54,7 +60,14 @@ tools = [
                     "owner": {"type": "string", "description": "Filter by sales rep (optional)"},
                     "min_value": {"type": "integer", "description": "Minimum deal value filter"},
                     "max_value": {"type": "integer", "description": "Maximum deal value filter"},
-                    "close_date_filter": {"type": "string", "description": "Filter by close date (next_month, this_month, etc.)"}
+                    "close_date_filter": {"type": "string", "description": "Filter by close date (next_month, this_month, last_month, this_quarter, next_quarter, etc.) or 'active' for open deals"},
+                    "start_date": {"type": "string", "description": "Custom close date range start (YYYY-MM-DD)"},
+                    "end_date": {"type": "string", "description": "Custom close date range end (YYYY-MM-DD)"},
+                    "group_by": {
+                        "type": "array",
+                        "items": {"type": "string", "enum": ["stage", "owner", "close_month", "industry", "source", "value_band"]},
+                        "description": "Break the filtered pipeline down by any combination of dimensions, nested in the order given (e.g. ['owner', 'close_month'])"
+                    }
                 },
                 "required": []
             }
@@ -71,7 +84,9 @@ tools = [
                 "type": "object",
                 "properties": {
                     "query": {"type": "string", "description": "Search query for company name or contact"},
-                    "status": {"type": "string", "description": "Filter by customer status (Active, Inactive, Churned)"}
+                    "status": {"type": "string", "description": "Filter by customer status (Active, Inactive, Churned)"},
+                    "limit": {"type": "integer", "description": "Maximum number of results, best matches first (default 20)"},
+                    "queries": {"type": "array", "items": {"type": "string"}, "description": "Several search queries to run in one call; results are returned per query"}
                 },
                 "required": []
             }
@@ -96,14 +111,17 @@ tools = [
 ]
 
 # SIMPLIFIED TOOL IMPLEMENTATIONS
-def get_customers_closed_summary(timeframe: str = "last_month", include_revenue_breakdown: bool = True) -> dict:
+def get_customers_closed_summary(timeframe: str = "last_month", include_revenue_breakdown: bool = True, start_date: str = None, end_date: str = None) -> dict:
     """Get summary of customers closed within a specific timeframe with total revenue"""
     
     # Get customers closed in the specified timeframe
-    closed_customers = get_customers_by_close_date(timeframe)
+    try:
+        closed_customers = get_customers_by_close_date(timeframe, start_date, end_date)
+    except ValueError as e:
+        return {"error": f"Invalid date range: {e}"}
     
     # If no customers found for the timeframe, try to be flexible
-    if not closed_customers:
+    if not closed_customers and not (start_date or end_date):
         # Try different timeframes or return some sample data
         if timeframe == "last_month":
             # Try this month instead
@@ -163,7 +181,7 @@ def get_customers_closed_summary(timeframe: str = "last_month", include_revenue_
             revenue_breakdown[customer_name] = customer["revenue"]
     
     return {
-        "timeframe": timeframe,
+        "timeframe": timeframe if not (start_date or end_date) else {"start_date": start_date, "end_date": end_date},
         "closed_customers": closed_customers,
         "total_customers": len(closed_customers),
         "total_revenue": total_revenue,
@@ -172,16 +190,75 @@ def get_customers_closed_summary(timeframe: str = "last_month", include_revenue_
         "timestamp": datetime.now().isoformat()
     }
 
-def get_customer_details(customer_id: str) -> dict:
-    """Get detailed customer information, opportunities, and next steps"""
+def _resolve_customer_ids(backend, identifiers: list) -> list:
+    """``(customer_id, customer or None)`` per identifier: exact ids first, then names and close, unambiguous near-misses"""
+    resolved = [(identifier, backend.get("customers", identifier)) for identifier in identifiers]
+    for i, (identifier, customer) in enumerate(resolved):
+        if customer is None:
+            match = resolve_customer(identifier)
+            if match:
+                resolved[i] = (match, backend.get("customers", match))
+    return resolved
+
+def _customer_candidates(backend, identifier: str) -> list:
+    """Possible customers for a name that did not resolve confidently, for the model to confirm"""
+    return [{"customer_id": customer_id, "name": backend.get("customers", customer_id)["name"], "score": round(score, 2)}
+            for customer_id, score in match_customers(identifier, limit=3)]
+
+def get_customer_details(customer_id: str = None, customer_ids: list = None) -> dict:
+    """Get detailed customer information, opportunities, and next steps (for one customer or several)"""
+    backend = get_backend()
+    if isinstance(customer_ids, str):
+        customer_ids = [customer_ids]
+    if not customer_id and not customer_ids:
+        return {"error": "Provide a customer_id or a list of customer_ids"}
+    if not customer_ids:
+        (resolved_id, customer), = _resolve_customer_ids(backend, [customer_id])
+        candidates = _customer_candidates(backend, customer_id) if customer is None else None
+        if candidates:
+            return {
+                "customer_id": customer_id,
+                "candidates": candidates,
+                "message": f"No customer matches '{customer_id}' exactly; confirm which of these is meant",
+                "timestamp": datetime.now().isoformat()
+            }
+        return _customer_details(backend, customer_id, resolved_id, customer)
+    
+    # Batch: resolve every identifier up front, then build each distinct customer's details once
+    requested = list(dict.fromkeys(([customer_id] if customer_id else []) + list(customer_ids)))
+    customers = []
+    resolved = {}
+    unresolved = {}
+    for requested_id, (resolved_id, customer) in zip(requested, _resolve_customer_ids(backend, requested)):
+        candidates = _customer_candidates(backend, requested_id) if customer is None else None
+        if candidates:
+            unresolved[requested_id] = candidates
+            continue
+        seen = resolved_id in resolved.values()
+        resolved[requested_id] = resolved_id
+        if seen:
+            continue
+        details = _customer_details(backend, requested_id, resolved_id, customer)
+        del details["timestamp"]
+        customers.append(details)
+    return {
+        "customers": customers,
+        "resolved": resolved,
+        "unresolved": unresolved,
+        "total_customers": len(customers),
+        "total_opportunities": sum(details["total_opportunities"] for details in customers),
+        "total_value": sum(details["total_value"] for details in customers),
+        "timestamp": datetime.now().isoformat()
+    }
+
+def _customer_details(backend, requested_id: str, customer_id: str, customer) -> dict:
+    """Details, opportunities and next steps for one resolved customer (generated when unknown)"""
     import random
     
-    # Check if customer exists in database first
-    if customer_id in sales_data["customers"]:
-        customer = sales_data["customers"][customer_id]
-        # Get associated opportunities
-        opportunities = [opp for opp in sales_data["opportunities"].values() 
-                        if opp.get("lead_id") and sales_data["leads"][opp["lead_id"]].get("company") == customer["name"]]
+    if customer is not None:
+        # Get associated opportunities through the account join index
+        opportunities = [backend.get("opportunities", opp_id)
+                         for opp_id in get_account_index().related(customer["name"], "opportunities")]
     else:
         # Generate realistic customer data for any customer name provided
         customer_name = customer_id.replace("_", " ").title()
@@ -251,7 +328,7 @@ def get_customer_details(customer_id: str) -> dict:
         f"Check in on customer satisfaction"
     ])
     
-    return {
+    result = {
         "customer_id": customer_id,
         "customer": customer,
         "opportunities": opportunities,
@@ -262,84 +339,72 @@ def get_customer_details(customer_id: str) -> dict:
         "last_activity": customer["last_activity"],
         "timestamp": datetime.now().isoformat()
     }
+    if customer_id != requested_id:
+        result["resolved_from"] = requested_id
+    return result
+
+# Dimensions get_pipeline_report can group by
+PIPELINE_DIMENSIONS = ("stage", "owner", "close_month", "industry", "source", "value_band")
+
+def _nest_breakdown(cells: dict, dimensions: tuple) -> dict:
+    """Turn tuple-keyed cube cells into nested {value: {value: totals}} dicts, each level sorted"""
+    def sort_key(key):
+        return tuple((VALUE_BAND_ORDER.get(value, 0), "") if dimension == "value_band" else (value in (None, ""), str(value))
+                     for dimension, value in zip(dimensions, key))
+    breakdown = {}
+    for key in sorted(cells, key=sort_key):
+        node = breakdown
+        labels = ["Unknown" if value in (None, "") else str(value) for value in key]
+        for label in labels[:-1]:
+            node = node.setdefault(label, {})
+        totals = cells[key]
+        node[labels[-1]] = {"count": totals["count"], "value": totals["value"], "weighted_value": totals["weighted"] / 100}
+    return breakdown
 
-def get_pipeline_report(owner: str = None, min_value: int = None, max_value: int = None, close_date_filter: str = None) -> dict:
+def get_pipeline_report(owner: str = None, min_value: int = None, max_value: int = None, close_date_filter: str = None, start_date: str = None, end_date: str = None, group_by: list = None) -> dict:
     """Get detailed pipeline report with stage breakdown and close date filtering"""
-    opportunities = list(sales_data["opportunities"].values())
-    
-    # Apply filters
-    if owner:
-        opportunities = [opp for opp in opportunities if opp["owner"] == owner]
-    if min_value:
-        opportunities = [opp for opp in opportunities if opp["value"] >= min_value]
-    if max_value:
-        opportunities = [opp for opp in opportunities if opp["value"] <= max_value]
-    
-    # Apply close date filter
-    if close_date_filter:
-        current_date = datetime.now()
-        filtered_opportunities = []
-        
-        for opp in opportunities:
-            try:
-                close_date = datetime.strptime(opp["close_date"], "%Y-%m-%d")
-                
-                if close_date_filter == "next_month":
-                    next_month_start = current_date.replace(day=1) + timedelta(days=32)
-                    next_month_start = next_month_start.replace(day=1)
-                    next_month_end = next_month_start.replace(day=1) + timedelta(days=32)
-                    next_month_end = next_month_end.replace(day=1)
-                    
-                    if close_date >= next_month_start and close_date < next_month_end:
-                        filtered_opportunities.append(opp)
-                elif close_date_filter == "this_month":
-                    month_start = current_date.replace(day=1)
-                    month_end = month_start.replace(day=1) + timedelta(days=32)
-                    month_end = month_end.replace(day=1)
-                    
-                    if close_date >= month_start and close_date < month_end:
-                        filtered_opportunities.append(opp)
-                elif close_date_filter == "active":
-                    # Active opportunities (not closed)
-                    if opp["stage"] not in ["Closed Won", "Closed Lost"]:
-                        filtered_opportunities.append(opp)
-            except:
-                # If date parsing fails, include the opportunity
-                filtered_opportunities.append(opp)
-        
-        opportunities = filtered_opportunities
+    if isinstance(group_by, str):
+        group_by = group_by.split(",")
+    dimensions = tuple(dict.fromkeys(dimension.strip() for dimension in group_by or ()))
+    unknown = [dimension for dimension in dimensions if dimension not in PIPELINE_DIMENSIONS]
+    if unknown:
+        return {"error": f"Unknown group_by dimension(s): {', '.join(unknown)}. Use any of: {', '.join(PIPELINE_DIMENSIONS)}"}
     
-    # Group by stage
-    stage_breakdown = {}
-    for opp in opportunities:
-        stage = opp["stage"]
-        if stage not in stage_breakdown:
-            stage_breakdown[stage] = {"count": 0, "value": 0, "weighted_value": 0}
-        stage_breakdown[stage]["count"] += 1
-        stage_breakdown[stage]["value"] += opp["value"]
-        stage_breakdown[stage]["weighted_value"] += opp["value"] * opp["probability"] / 100
+    # One query for the whole report; the planner picks aggregates, indexes or a fused scan
+    pipeline = Query("opportunities").where(owner=owner)
+    if min_value or max_value:
+        pipeline = pipeline.between("value", min_value or None, max_value or None)
+    if close_date_filter == "active":
+        pipeline = pipeline.excluding("stage", CLOSED_STAGES)
+    try:
+        close_window = resolve_timeframe(None if close_date_filter == "active" else close_date_filter, start_date, end_date)
+    except ValueError as e:
+        return {"error": f"Invalid date range: {e}"}
+    if close_window:
+        pipeline = pipeline.between("close_date", *close_window)
     
-    # Get opportunities closing next month specifically
-    next_month_opportunities = []
-    current_date = datetime.now()
-    next_month_start = current_date.replace(day=1) + timedelta(days=32)
-    next_month_start = next_month_start.replace(day=1)
-    next_month_end = next_month_start.replace(day=1) + timedelta(days=32)
-    next_month_end = next_month_end.replace(day=1)
+    if close_date_filter and close_date_filter != "active" and not close_window:
+        # Unknown close date filter matches nothing
+        stage_totals = {}
+        cells = {}
+        next_month_opportunities = []
+    else:
+        stage_totals = pipeline.group_by("stage").totals("value", "probability")
+        # Every requested breakdown comes from one cube over the same filtered pipeline
+        cells = pipeline.cube(dimensions, "value", "probability") if dimensions else {}
+        # Next-month slice of the filtered pipeline
+        next_month_opportunities = pipeline.between("close_date", *resolve_timeframe("next_month")).records()
     
-    for opp in opportunities:
-        try:
-            close_date = datetime.strptime(opp["close_date"], "%Y-%m-%d")
-            if close_date >= next_month_start and close_date < next_month_end:
-                next_month_opportunities.append(opp)
-        except:
-            pass
+    stage_breakdown = {
+        stage: {"count": totals["count"], "value": totals["value"], "weighted_value": totals["weighted"] / 100}
+        for stage, totals in stage_totals.items()
+    }
     
-    return {
-        "filters": {"owner": owner, "min_value": min_value, "max_value": max_value, "close_date_filter": close_date_filter},
-        "total_opportunities": len(opportunities),
-        "total_value": sum(opp["value"] for opp in opportunities),
-        "weighted_value": sum(opp["value"] * opp["probability"] / 100 for opp in opportunities),
+    report = {
+        "filters": {"owner": owner, "min_value": min_value, "max_value": max_value, "close_date_filter": close_date_filter, "start_date": start_date, "end_date": end_date},
+        "total_opportunities": sum(totals["count"] for totals in stage_totals.values()),
+        "total_value": sum(totals["value"] for totals in stage_totals.values()),
+        "weighted_value": sum(totals["weighted"] for totals in stage_totals.values()) / 100,
         "stage_breakdown": stage_breakdown,
         "next_month_opportunities": next_month_opportunities,
         "next_month_count": len(next_month_opportunities),
@@ -347,24 +412,60 @@ def get_pipeline_report(owner: str = None, min_value: int = None, max_value: int
         "next_month_weighted_value": sum(opp["value"] * opp["probability"] / 100 for opp in next_month_opportunities),
         "timestamp": datetime.now().isoformat()
     }
+    if dimensions:
+        report["group_by"] = list(dimensions)
+        report["breakdown"] = _nest_breakdown(cells, dimensions)
+    return report
+
+def search_customers(query: str = None, status: str = None, limit: int = 20, queries: list = None) -> dict:
+    """Search for existing customers in the CRM by name or company (one query or several)"""
+    backend = get_backend()
+    if isinstance(queries, str):
+        queries = [queries]
+    if not queries:
+        results = _search_customers(backend, query, status, limit)
+        return {
+            "query": query,
+            "filters": {"status": status},
+            "results": results,
+            "total_count": len(results),
+            "timestamp": datetime.now().isoformat()
+        }
+    
+    # Batch: one result list per distinct query, counted once per distinct customer
+    queries = list(dict.fromkeys(([query] if query else []) + list(queries)))
+    results = {text: _search_customers(backend, text, status, limit) for text in queries}
+    return {
+        "queries": queries,
+        "filters": {"status": status},
+        "results": results,
+        "total_count": len({customer["customer_id"] for hits in results.values() for customer in hits}),
+        "timestamp": datetime.now().isoformat()
+    }
 
-def search_customers(query: str = None, status: str = None) -> dict:
-    """Search for existing customers in the CRM by name or company"""
+def _search_customers(backend, query: str, status: str, limit: int) -> list:
+    """Matching customers for one search (generated when a query matches nothing)"""
     import random
     
     results = []
     
-    # First try to find real customers that match criteria
-    for customer_id, customer in sales_data["customers"].items():
-        if query and query.lower() not in f"{customer['name']} {customer['contact']} {customer['email']}".lower():
-            continue
-        if status and customer['status'].lower() != status.lower():
-            continue
-        
-        results.append({
-            "customer_id": customer_id,
-            **customer
-        })
+    # First try to find real customers that match criteria, ranked through the search index
+    if query:
+        for customer_id in get_customer_search_index().search(query, None if status else limit):
+            customer = backend.get("customers", customer_id)
+            if status and str(customer.get("status", "")).lower() != status.lower():
+                continue
+            results.append(RecordView("customer_id", customer_id, customer))
+            if len(results) == limit:
+                break
+        # Nothing matched token for token - fall back to approximate name matching
+        if not results:
+            for customer_id in resolve_customers(query, limit):
+                customer = backend.get("customers", customer_id)
+                if not status or str(customer.get("status", "")).lower() == status.lower():
+                    results.append(RecordView("customer_id", customer_id, customer))
+    else:
+        results = view_rows("customer_id", backend.search("customers", query, (), limit=limit, status=status))
     
     # If no results found, generate some realistic customers based on the query
     if not results and query:
@@ -403,26 +504,25 @@ def search_customers(query: str = None, status: str = None) -> dict:
                 **generated_customer
             })
     
-    return {
-        "query": query,
-        "filters": {"status": status},
-        "results": results,
-        "total_count": len(results),
-        "timestamp": datetime.now().isoformat()
-    }
+    return results
 
 def get_sales_analytics(timeframe: str = "month") -> dict:
     """Get basic sales analytics and KPIs"""
-    total_leads = len(sales_data["leads"])
-    qualified_leads = len([l for l in sales_data["leads"].values() if l["status"] == "Qualified"])
-    total_opportunities = len(sales_data["opportunities"])
-    total_value = sum(opp["value"] for opp in sales_data["opportunities"].values())
-    weighted_value = sum(opp["value"] * opp["probability"] / 100 for opp in sales_data["opportunities"].values())
+    leads = Query("leads")
+    total_leads = leads.count()
+    qualified_leads = leads.where(status="Qualified").count()
+    
+    # Opportunity totals come from the materialized pipeline aggregates
+    opportunities = Query("opportunities")
+    pipeline = opportunities.totals("value", "probability")
+    total_opportunities = pipeline["count"]
+    total_value = pipeline["value"]
+    weighted_value = pipeline["weighted"] / 100
     
     # Get active opportunities (not closed)
-    active_opportunities = [opp for opp in sales_data["opportunities"].values() 
-                          if opp["stage"] not in ["Closed Won", "Closed Lost"]]
-    active_value = sum(opp["value"] for opp in active_opportunities)
+    active = opportunities.excluding("stage", CLOSED_STAGES).totals("value")
+    active_count = active["count"]
+    active_value = active["value"]
     
     return {
         "timeframe": timeframe,
@@ -430,7 +530,7 @@ def get_sales_analytics(timeframe: str = "month") -> dict:
         "qualified_leads": qualified_leads,
         "qualification_rate": round(qualified_leads / total_leads * 100, 2) if total_leads > 0 else 0,
         "total_opportunities": total_opportunities,
-        "active_opportunities": len(active_opportunities),
+        "active_opportunities": active_count,
         "total_pipeline_value": total_value,
         "active_pipeline_value": active_value,
         "weighted_pipeline_value": round(weighted_value, 2),
@@ -439,10 +539,21 @@ def get_sales_analytics(timeframe: str = "month") -> dict:
     }
 
 # Tool function registry for easy access
-TOOL_FUNCTIONS = {
+RAW_TOOL_FUNCTIONS = {
     "get_customers_closed_summary": get_customers_closed_summary,
     "get_customer_details": get_customer_details,
     "get_pipeline_report": get_pipeline_report,
     "search_customers": search_customers,
     "get_sales_analytics": get_sales_analytics
 }
+
+
+def _cache_context():
+    """Data versions and today's date: a write (here or, for SQLite, from another process or connection),
+    or a new day moving the relative timeframes, invalidates results"""
+    return get_version(), get_backend().data_version(), datetime.now().date().isoformat()
+
+
+# Shared by every session in the process; the raw functions stay in RAW_TOOL_FUNCTIONS
+tool_cache = ToolCache(context=_cache_context)
+TOOL_FUNCTIONS = tool_cache.wrap_all(RAW_TOOL_FUNCTIONS)
@@ -0,0 +1,121 @@
+"""
+Risk-based choice of how to validate each agent response.
+
+Every step used to pay for a synchronous Cleanlab ``validate`` call. A
+``ValidationPolicy`` decides per step instead:
+
+- ``sync``: validate before the answer is shown (the guardrail can replace it);
+- ``async``: validate in the background and only record the outcome;
+- ``skip``: do not validate.
+
+Final answers are validated synchronously when the thread has been flagged
+recently, when the question asks for advice or commitments (pricing,
+discounts, contracts, ...), when a tool outside the read-only CRM set was
+used, or when the answer is long. Every other step - ordinary answers and
+tool selection, which shows the user no text - is validated in the
+background. Skipping validation is opt-in: with ``sample_every`` set to N,
+only every N-th of those background validations runs (flagged threads are
+always watched). Counters report how often each decision was taken and how
+much validation time the background ones kept off the critical path.
+
+Most of what makes a final answer risky is known before the LLM is called
+(the question, the thread's flags, the tools already used this turn);
+``gates_answer`` reports it so the agent can hold the answer back instead of
+streaming text the guardrail may still replace.
+"""
+
+import re
+import threading
+from collections import deque
+
+SYNC, ASYNC, SKIP = "sync", "async", "skip"
+
+# Read-only CRM lookups: answers built from them are grounded in our own data
+GROUNDED_TOOLS = frozenset({
+    "get_customers_closed_summary",
+    "get_customer_details",
+    "get_pipeline_report",
+    "search_customers",
+    "get_sales_analytics",
+})
+# Questions where a wrong answer costs more than a validation round trip
+RISKY_QUERY = re.compile(
+    r"\b(price|pricing|discount|refund|contract|legal|compliance|guarantee|promise|commit|"
+    r"competitor|password|personal|ssn|medical)\w*",
+    re.IGNORECASE,
+)
+
+
+class ValidationPolicy:
+    """Decides sync / async / skip validation per step and counts the outcomes"""
+
+    def __init__(self, sample_every: int = 0, long_response: int = 1200, risky_rate: float = 0.2,
+                 window: int = 20, risky_query=RISKY_QUERY, grounded_tools=GROUNDED_TOOLS):
+        self.sample_every = sample_every
+        self.long_response = long_response
+        self.risky_rate = risky_rate
+        self.risky_query = risky_query
+        self.grounded_tools = frozenset(grounded_tools)
+        self.window = window
+        self.lock = threading.Lock()
+        self.recent = {}
+        self.sampled = 0
+        self.decisions = {SYNC: 0, ASYNC: 0, SKIP: 0}
+        self.validations = 0
+        self.validation_seconds = 0.0
+
+    def guardrail_rate(self, thread_id: str) -> float:
+        """Share of the thread's recent validations that were flagged"""
+        with self.lock:
+            recent = self.recent.get(thread_id)
+            return sum(recent) / len(recent) if recent else 0.0
+
+    def _sample(self) -> str:
+        """``async``, or with sampling on, ``skip`` for all but every ``sample_every``-th call"""
+        with self.lock:
+            self.sampled += 1
+            return SKIP if self.sample_every and self.sampled % self.sample_every else ASYNC
+
+    def _risky_thread(self, thread_id: str) -> bool:
+        return self.guardrail_rate(thread_id) >= self.risky_rate > 0
+
+    def gates_answer(self, thread_id: str, query: str, tools_used=()) -> bool:
+        """Whether a final answer at this point is validated synchronously whatever its text"""
+        if self._risky_thread(thread_id) or (query and self.risky_query.search(query)):
+            return True
+        tools_used = set(tools_used or ())
+        return bool(tools_used) and not tools_used <= self.grounded_tools
+
+    def _choose(self, thread_id: str, query: str, response_text: str, tools_used, final: bool) -> str:
+        if not final:
+            # Tool selection shows the user nothing: checked in the background, flagged threads always
+            return ASYNC if self._risky_thread(thread_id) else self._sample()
+        if self.gates_answer(thread_id, query, tools_used):
+            return SYNC
+        # Short answers, ungrounded or from the read-only tools, are checked in the background; long ones first
+        return SYNC if len(response_text or "") >= self.long_response else self._sample()
+
+    def decide(self, thread_id: str, query: str, response_text: str, tools_used=(), final: bool = True) -> str:
+        """``sync``, ``async`` or ``skip`` for one agent step"""
+        decision = self._choose(thread_id, query, response_text, tools_used, final)
+        with self.lock:
+            self.decisions[decision] += 1
+        return decision
+
+    def record(self, thread_id: str, flagged: bool, seconds: float):
+        """Note a finished validation (sync or async): its outcome and how long it took"""
+        with self.lock:
+            self.recent.setdefault(thread_id, deque(maxlen=self.window)).append(bool(flagged))
+            self.validations += 1
+            self.validation_seconds += seconds
+
+    def stats(self) -> dict:
+        """Decision counts, average validation time and the time background validations kept off the critical path"""
+        with self.lock:
+            average = self.validation_seconds / self.validations if self.validations else 0.0
+            return {
+                "decisions": dict(self.decisions),
+                "validations": self.validations,
+                "average_validation_seconds": round(average, 3),
+                "estimated_seconds_saved": round(average * self.decisions[ASYNC], 3),
+            }